@@ -0,0 +1,2 @@
+from .bench import run_benchmark, sweep, BenchOptions, BenchResult, MumbleSink
+from .load import run_load
@@ -0,0 +1,77 @@
+from .bench import (
+    BenchOptions,
+    run_benchmark,
+    sweep,
+    DEFAULT_DURATION_SECS,
+    DEFAULT_PORT_BASE
+)
+from .load import SOURCES
+
+import argparse
+import logging
+import os
+import sys
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="measure how many channels this node sustains: replays "
+                    "WAV files or generated audio as RTLSDR-Airband datagrams "
+                    "at real-time pace into a RadioChannelManager (no "
+                    "rtl_airband, Mumble outputs into a local sink)")
+    parser.add_argument('-n', '--channels', type=int, default=8,
+                        help='channels to run (default 8); the sweep start')
+    parser.add_argument('--sweep', action='store_true',
+                        help='find the most channels that keep up')
+    parser.add_argument('--max-channels', type=int, default=256)
+    parser.add_argument('-d', '--duration', type=float, default=DEFAULT_DURATION_SECS,
+                        help='seconds of load per run')
+    parser.add_argument('-s', '--source', default="voice",
+                        help=f"{'|'.join(SOURCES)} or a WAV file")
+    parser.add_argument('--talk', type=float, default=5.,
+                        help='mean transmission length (secs)')
+    parser.add_argument('--gap', type=float, default=2.,
+                        help='mean silence between transmissions (secs)')
+    parser.add_argument('--deadline-ms', type=float, default=125.,
+                        help='p99 receipt -> mumble latency allowed')
+    parser.add_argument('-c', '--config',
+                        help='config file for the pipeline options')
+    parser.add_argument('--data-path',
+                        help='keep captures here (default: temporary)')
+    parser.add_argument('--port-base', type=int, default=DEFAULT_PORT_BASE)
+    parser.add_argument('--tone-detection', action='store_true')
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig()
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    if args.source not in SOURCES and not os.path.isfile(args.source):
+        print(f"'{args.source}' is not a source or a file!", file=sys.stderr)
+        sys.exit(1)
+
+    options = BenchOptions(
+        duration=args.duration,
+        source=args.source,
+        talk_secs=args.talk,
+        gap_secs=args.gap,
+        deadline=args.deadline_ms / 1000.,
+        config_file=args.config,
+        data_path=args.data_path,
+        port_base=args.port_base,
+        tone_detection=args.tone_detection
+    )
+
+    if not args.sweep:
+        result = run_benchmark(args.channels, options)
+        print(result)
+        for error in result.errors:
+            print(f"error: {error}", file=sys.stderr)
+        sys.exit(0 if result.passed else 1)
+
+    capacity, _ = sweep(options, start=args.channels, max_channels=args.max_channels)
+    if capacity is None:
+        print(f"no channel count passed (starting at {args.channels})")
+        sys.exit(1)
+    print(f"capacity: {capacity} channels")
@@ -0,0 +1,290 @@
+"""
+Channel capacity benchmark.
+
+Runs a RadioChannelManager without rtl_airband: N channels listen on
+local UDP ports as usual and a load generator in a separate process (so
+its CPU is not counted) feeds them RTLSDR-Airband style datagrams at
+real-time pace. Each channel's Mumble output is a sink that takes pcm
+exactly where pymumble would, so the whole pipeline runs: receive,
+PTT detection, filtering, capture writes, catalog, resampling/encoding
+and the Mumble queues.
+
+A run passes when no datagram is lost, no frame is dropped and the p99
+time from datagram receipt to the Mumble sink is within the deadline
+(one 125 ms frame by default, ie. the node keeps up with real time).
+A sweep runs increasing channel counts, each in a fresh process, to find
+the most channels that pass.
+"""
+from .load import run_load, FRAME_SECS
+from app.channel_manager import RadioChannelManager
+from app.config import ConfigManager, AppConfig
+from app.dsp.frame import Stage
+from app.mumble.channel import MumbleChannel
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing import get_context
+from time import perf_counter, process_time
+from typing import Optional
+import asyncio
+import logging
+import shutil
+import tempfile
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_PORT_BASE: int = 16100
+DEFAULT_DURATION_SECS: float = 30.
+
+# time allowed for frames in flight to reach the sinks after the load stops
+DRAIN_SECS: float = 1.
+
+
+@dataclass
+class BenchOptions:
+    duration: float = DEFAULT_DURATION_SECS
+    source: str = "voice"
+    talk_secs: float = 5.
+    gap_secs: float = 2.
+    deadline: float = FRAME_SECS
+    # base config (pipeline tuning); its channels and mumble are replaced
+    config_file: Optional[str] = None
+    # captures are written here; a temporary folder (removed) by default
+    data_path: Optional[str] = None
+    port_base: int = DEFAULT_PORT_BASE
+    tone_detection: bool = False
+    seed: int = 0
+
+
+@dataclass
+class BenchResult:
+    channels: int
+    wall_secs: float
+    cpu_secs: float
+    datagrams_sent: int
+    datagrams_received: int
+    frames_dropped: int
+    # datagram receipt -> mumble sink [secs]
+    latency_p50: float
+    latency_p99: float
+    latency_max: float
+    loop_lag_max: Optional[float]
+    deadline: float
+    sink_bytes: int = 0
+    sessions: int = 0
+    errors: list[str] = field(default_factory=list)
+
+    @property
+    def cpu_per_channel(self) -> float:
+        """ fraction of one core per channel """
+        return self.cpu_secs / self.wall_secs / self.channels
+
+    @property
+    def datagrams_lost(self) -> int:
+        return self.datagrams_sent - self.datagrams_received
+
+    @property
+    def passed(self) -> bool:
+        return (not self.errors and self.datagrams_lost == 0
+                and self.frames_dropped == 0
+                and self.latency_p99 <= self.deadline)
+
+    def __str__(self) -> str:
+        lag = f"{self.loop_lag_max * 1000:.0f}" if self.loop_lag_max is not None else "-"
+        return (f"{self.channels:4d} ch  cpu/ch {self.cpu_per_channel * 100:5.1f}%  "
+                f"latency p50/p99/max {self.latency_p50 * 1000:6.1f}/"
+                f"{self.latency_p99 * 1000:6.1f}/{self.latency_max * 1000:6.1f} ms  "
+                f"lost {self.datagrams_lost}  dropped {self.frames_dropped}  "
+                f"loop lag max {lag} ms  {'PASS' if self.passed else 'FAIL'}")
+
+
+class _NullSoundOutput:
+
+    bytes_sent: int
+
+    def __init__(self):
+        self.bytes_sent = 0
+
+    def add_sound(self, pcm: bytes):
+        self.bytes_sent += len(pcm)
+
+
+class _NullMumble:
+
+    def __init__(self):
+        self.sound_output = _NullSoundOutput()
+
+
+class MumbleSink(MumbleChannel):
+    """ a MumbleChannel that hands its audio to a null pymumble """
+
+    def __init__(self, username: str):
+        super().__init__("localhost", 0, username)
+
+    async def start(self):
+        self.mumble = _NullMumble()
+        self.running = True
+        await self.stream_audio()
+
+    @property
+    def bytes_sent(self) -> int:
+        return self.mumble.sound_output.bytes_sent if self.mumble else 0
+
+
+def bench_config(num_channels: int, options: BenchOptions,
+                 data_path: str) -> AppConfig:
+    config_manager = ConfigManager()
+    if options.config_file:
+        config_manager.add_yaml(options.config_file)
+
+    config_manager.config_dict.update({
+        'config_file': options.config_file or "bench",
+        'mumble': None,
+        'devices': [],
+        'data_path': data_path,
+        'listen_address': "127.0.0.1",
+        'listen_port_base': options.port_base,
+        'metrics_port': 0,
+        'channels': [{
+            'id': f"bench{i:03d}",
+            'freq': 150. + i * 0.0125,
+            'label': f"Bench {i:03d}",
+            'designator': "11K0F3E",
+            'tone_detection': options.tone_detection
+        } for i in range(num_channels)]
+    })
+    return config_manager.process_config()
+
+
+async def _bench(num_channels: int, options: BenchOptions) -> BenchResult:
+
+    data_path = options.data_path or tempfile.mkdtemp(prefix="radio-bench-")
+    config = bench_config(num_channels, options, data_path)
+
+    manager = RadioChannelManager(config)
+    manager.configure_channels()
+
+    sinks = []
+    for channel in manager.channels:
+        sink = MumbleSink(channel.id)
+        channel.add_output(sink)
+        sinks.append(sink)
+
+    loop = asyncio.get_running_loop()
+    node = asyncio.create_task(manager.start())
+
+    # the generator gets its own (spawned) process, started before the
+    # measurement
+    load_pool = ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn"))
+    errors = []
+    try:
+        await loop.run_in_executor(load_pool, int)
+        await asyncio.sleep(0.1)
+        if node.done():
+            node.result()
+
+        ports = [channel.listen_port for channel in manager.channels]
+        started, cpu_started = perf_counter(), process_time()
+        sent = await loop.run_in_executor(
+            load_pool, run_load, "127.0.0.1", ports, options.source,
+            options.duration, options.talk_secs, options.gap_secs, options.seed)
+        await asyncio.sleep(DRAIN_SECS)
+        wall, cpu = perf_counter() - started, process_time() - cpu_started
+    except Exception as e:
+        errors.append(f"{type(e).__name__}: {e}")
+        sent, wall, cpu = 0, 1., 0.
+    finally:
+        load_pool.shutdown()
+        node.cancel()
+        try:
+            await node
+        except (asyncio.CancelledError, Exception):
+            pass
+
+    latencies = np.concatenate([channel.latency.latencies(Stage.SENT)
+                                for channel in manager.channels])
+    if latencies.size == 0:
+        latencies = np.array([np.inf])
+    p50, p99 = np.quantile(latencies, (0.5, 0.99))
+
+    result = BenchResult(
+        channels=num_channels,
+        wall_secs=wall,
+        cpu_secs=cpu,
+        datagrams_sent=sent,
+        datagrams_received=int(sum(channel.metrics.datagrams.value
+                                   for channel in manager.channels)),
+        frames_dropped=manager.disk_io.frames_dropped + sum(
+            channel.dsp_frames_dropped + channel.memory_cap_drops
+            for channel in manager.channels),
+        latency_p50=float(p50),
+        latency_p99=float(p99),
+        latency_max=float(latencies.max()),
+        loop_lag_max=manager.loop_monitor.lag_max if manager.loop_monitor else None,
+        deadline=options.deadline,
+        sink_bytes=sum(sink.bytes_sent for sink in sinks),
+        sessions=sum(channel.last_session_id for channel in manager.channels),
+        errors=errors
+    )
+
+    manager.disk_io.shutdown()
+    if manager.dsp_executor is not None:
+        manager.dsp_executor.shutdown()
+    if options.data_path is None:
+        shutil.rmtree(data_path, ignore_errors=True)
+
+    return result
+
+
+def run_benchmark(num_channels: int, options: BenchOptions) -> BenchResult:
+    """ one run at `num_channels`, in this process """
+    return asyncio.run(_bench(num_channels, options))
+
+
+def _run_isolated(num_channels: int, options: BenchOptions) -> BenchResult:
+    # a fresh process per run: sockets, metrics and threads start clean
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+        return pool.submit(run_benchmark, num_channels, options).result()
+
+
+def sweep(options: BenchOptions, start: int = 4,
+          max_channels: int = 256) -> tuple[Optional[int], list[BenchResult]]:
+    """
+    double the channel count until a run fails, then bisect; returns the
+    most channels that passed and every run
+    """
+    results = []
+
+    def attempt(num_channels: int) -> bool:
+        result = _run_isolated(num_channels, options)
+        results.append(result)
+        print(result, flush=True)
+        return result.passed
+
+    passed, failed = None, None
+    num_channels = start
+    while num_channels <= max_channels:
+        if not attempt(num_channels):
+            failed = num_channels
+            break
+        passed = num_channels
+        num_channels *= 2
+
+    if failed is None:
+        return passed, results
+
+    low = passed or 0
+    high = failed
+    # resolve to ~1/8 of the capacity
+    while high - low > max(1, low // 8):
+        middle = (low + high) // 2
+        if attempt(middle):
+            low = middle
+        else:
+            high = middle
+
+    return (low or None), results
@@ -0,0 +1,186 @@
+"""
+Synthetic RTLSDR-Airband load.
+
+Each channel gets a looped programme (a WAV file, or generated voice,
+tone or noise) and alternates transmissions of `talk_secs` with
+`gap_secs` of silence, so sessions open and close as on air. Audio is
+sent as RTLSDR-Airband does: 8,000-byte datagrams of 2,000 float32
+samples at 16 kHz, one per channel every 125 ms, the last datagram of a
+transmission zero padded. Pacing uses absolute deadlines so a late tick
+does not drift the stream.
+"""
+from app.rtlsdr_airband.literals import UDP_DATAGRAM_SAMPLES
+from app.radio.tone_coding.two_tone_sequential import FREQ_TABLE
+
+from time import monotonic, sleep
+from typing import Optional
+import logging
+import socket
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+SAMPLE_RATE: int = 16000
+FRAME_SECS: float = UDP_DATAGRAM_SAMPLES / SAMPLE_RATE
+
+SOURCES: tuple[str, ...] = ("voice", "tone", "noise")
+
+# length of a generated programme; looped
+PROGRAMME_SECS: float = 30.
+
+
+def generate_voice(secs: float, rng: np.random.Generator,
+                   fs: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    speech-like: harmonics of a wandering 100-250 Hz pitch with a 1/k
+    roll-off, a ~4 Hz syllabic envelope and some breath noise
+    """
+    n = int(secs * fs)
+    t = np.arange(n) / fs
+
+    f0 = 170. + 60. * np.sin(2 * np.pi * 0.3 * t + rng.uniform(0, 2 * np.pi))
+    phase = 2 * np.pi * np.cumsum(f0) / fs
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 16) if k * 250 < 3400)
+
+    envelope = np.clip(np.sin(2 * np.pi * rng.uniform(3., 5.) * t), 0, None) ** 0.5
+    samples = 0.15 * voiced * envelope + 0.01 * rng.standard_normal(n)
+    return samples.astype(np.float32)
+
+
+def generate_tone(secs: float, rng: np.random.Generator,
+                  fs: int = SAMPLE_RATE) -> np.ndarray:
+    """ two-tone sequential pages (1 s A, 3 s B) separated by 1 s of hiss """
+    samples = []
+    while sum(map(len, samples)) < secs * fs:
+        row = rng.integers(FREQ_TABLE.shape[0])
+        tone_a, tone_b = rng.choice(FREQ_TABLE[row], 2, replace=False)
+        for freq, length in ((tone_a, 1.), (tone_b, 3.)):
+            t = np.arange(int(length * fs)) / fs
+            samples.append(0.3 * np.sin(2 * np.pi * freq * t))
+        samples.append(0.005 * rng.standard_normal(fs))
+    return np.concatenate(samples)[:int(secs * fs)].astype(np.float32)
+
+
+def generate_noise(secs: float, rng: np.random.Generator,
+                   fs: int = SAMPLE_RATE) -> np.ndarray:
+    """ white noise at -20 dBFS RMS (open squelch) """
+    return (0.1 * rng.standard_normal(int(secs * fs))).astype(np.float32)
+
+
+def load_wav(path: str, fs: int = SAMPLE_RATE) -> np.ndarray:
+    """ mono float32 at `fs` """
+    import soundfile as sf
+    from scipy.signal import resample_poly
+
+    samples, file_fs = sf.read(path, dtype='float32', always_2d=True)
+    samples = samples.mean(axis=1)
+    if file_fs != fs:
+        divisor = np.gcd(int(file_fs), fs)
+        samples = resample_poly(samples, fs // divisor, int(file_fs) // divisor)
+    return samples.astype(np.float32)
+
+
+def programme(source: str, rng: np.random.Generator) -> np.ndarray:
+    if source == "voice":
+        return generate_voice(PROGRAMME_SECS, rng)
+    if source == "tone":
+        return generate_tone(PROGRAMME_SECS, rng)
+    if source == "noise":
+        return generate_noise(PROGRAMME_SECS, rng)
+    return load_wav(source)
+
+
+class ChannelLoad:
+    """ transmission pattern and position in the programme of one port """
+
+    port: int
+    samples: np.ndarray
+    position: int
+
+    # frames left in the current transmission / gap
+    talk_frames: int
+    gap_frames: int
+
+    def __init__(self, port: int, samples: np.ndarray, rng: np.random.Generator,
+                 talk_secs: float, gap_secs: float):
+        self.port = port
+        self.samples = samples
+        self.position = int(rng.integers(samples.size))
+        self._rng = rng
+        self._talk_secs = talk_secs
+        self._gap_secs = gap_secs
+
+        # stagger channels so transmissions do not all start together
+        self.talk_frames = 0
+        self.gap_frames = int(rng.uniform(0, gap_secs) / FRAME_SECS)
+
+    def next_datagram(self) -> Optional[bytes]:
+        """ the datagram of this tick, or None when not transmitting """
+        if self.gap_frames > 0:
+            self.gap_frames -= 1
+            if self.gap_frames == 0:
+                self.talk_frames = self._frames(self._talk_secs)
+            return None
+
+        if self.talk_frames == 0:
+            self.talk_frames = self._frames(self._talk_secs)
+
+        end = self.position + UDP_DATAGRAM_SAMPLES
+        block = np.take(self.samples, np.arange(self.position, end), mode='wrap')
+        self.position = end % self.samples.size
+
+        self.talk_frames -= 1
+        if self.talk_frames == 0:
+            # rtl_airband pads the tail of a transmission with zeros
+            block[int(self._rng.integers(1, UDP_DATAGRAM_SAMPLES)):] = 0.
+            self.gap_frames = max(self._frames(self._gap_secs), 1)
+
+        return block.astype('<f4').tobytes()
+
+    def _frames(self, secs: float) -> int:
+        # +/- 50 % around the configured length
+        return max(int(self._rng.uniform(0.5, 1.5) * secs / FRAME_SECS), 1)
+
+
+def run_load(host: str, ports: list[int], source: str, duration: float,
+             talk_secs: float, gap_secs: float, seed: int = 0) -> int:
+    """ send at real-time pace for `duration` secs; returns datagrams sent """
+    rng = np.random.default_rng(seed)
+
+    # one programme per source is shared; channels start at random offsets
+    samples = programme(source, rng)
+    channels = [ChannelLoad(port, samples, np.random.default_rng(seed + port),
+                            talk_secs, gap_secs) for port in ports]
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4 * 1024 * 1024)
+
+    sent = 0
+    late_ticks = 0
+    started = monotonic()
+    num_ticks = int(duration / FRAME_SECS)
+    for tick in range(num_ticks):
+        deadline = started + tick * FRAME_SECS
+        delay = deadline - monotonic()
+        if delay > 0:
+            sleep(delay)
+        elif delay < -FRAME_SECS:
+            late_ticks += 1
+
+        for channel in channels:
+            datagram = channel.next_datagram()
+            if datagram is None:
+                continue
+            try:
+                sock.sendto(datagram, (host, channel.port))
+                sent += 1
+            except OSError as e:
+                logger.error(f"load send to udp/{channel.port} failed: {e}")
+
+    sock.close()
+    if late_ticks:
+        logger.warning(f"load generator fell behind on {late_ticks} ticks")
+    return sent
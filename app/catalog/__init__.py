@@ -0,0 +1,2 @@
+from .schema import CaptureRecord
+from .catalog import CaptureCatalog, CatalogWriter
@@ -0,0 +1,33 @@
+from .catalog import CaptureCatalog
+
+from datetime import datetime
+import argparse
+import sys
+import os
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="query the capture catalog, eg. all traffic on a "
+                    "channel between two times")
+    parser.add_argument('db', help='catalog database (data_path/catalog.sqlite3)')
+    parser.add_argument('-c', '--channel', help='channel id')
+    parser.add_argument('-s', '--start', type=datetime.fromisoformat,
+                        help='start time (ISO-8601, local)')
+    parser.add_argument('-e', '--end', type=datetime.fromisoformat,
+                        help='end time (ISO-8601, local)')
+    parser.add_argument('-n', '--limit', type=int)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"catalog '{args.db}' not found!", file=sys.stderr)
+        sys.exit(1)
+
+    catalog = CaptureCatalog(args.db)
+    for record in catalog.query(args.channel, args.start, args.end, args.limit):
+        rms = f"{record.rms:.1f}" if record.rms is not None else "-"
+        dropped = f" dropped={record.frames_dropped}" if record.frames_dropped else ""
+        print(f"{record.start_time.isoformat(timespec='seconds')} "
+              f"{record.channel_id} {record.duration:7.2f}s "
+              f"rms={rms}{dropped} {record.path}")
@@ -0,0 +1,192 @@
+"""
+SQLite catalog of finished captures.
+
+One row per capture, indexed by (channel_id, start_time) and start_time,
+so "all traffic on channel X between T1 and T2" is an index range scan
+instead of a walk of data_path/<channel>/YYYY/M/D. Start times are stored
+as POSIX timestamps, and paths relative to the catalog's root (the node's
+data_path) when it has one.
+"""
+from .schema import CaptureRecord
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional
+import asyncio
+import logging
+import os
+import sqlite3
+
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS captures (
+    id INTEGER PRIMARY KEY,
+    channel_id TEXT NOT NULL,
+    freq REAL,
+    start_time REAL NOT NULL,
+    duration REAL NOT NULL,
+    sample_count INTEGER NOT NULL,
+    sample_rate INTEGER NOT NULL,
+    rms REAL,
+    peak REAL,
+    path TEXT NOT NULL,
+    format TEXT NOT NULL,
+    preroll_secs REAL NOT NULL DEFAULT 0,
+    frames_dropped INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS captures_channel_time ON captures (channel_id, start_time);
+CREATE INDEX IF NOT EXISTS captures_time ON captures (start_time);
+"""
+
+COLUMNS = ("channel_id", "freq", "start_time", "duration", "sample_count",
+           "sample_rate", "rms", "peak", "path", "format", "preroll_secs",
+           "frames_dropped")
+
+# columns added since the first schema; added to older catalogs on open
+ADDED_COLUMNS = {
+    "preroll_secs": "REAL NOT NULL DEFAULT 0",
+    "frames_dropped": "INTEGER NOT NULL DEFAULT 0",
+}
+
+# rows are flushed when this many are queued or after the flush interval
+DEFAULT_BATCH_SIZE: int = 256
+DEFAULT_FLUSH_INTERVAL_SECS: float = 2.0
+
+
+class CaptureCatalog:
+
+    path: str
+    # capture paths are stored relative to this folder
+    root: Optional[str]
+    _conn: sqlite3.Connection
+
+    def __init__(self, path: str, root: Optional[str] = None):
+        self.path = path
+        self.root = root
+        # used from one writer thread at a time (see CatalogWriter)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(captures)")}
+        for name, definition in ADDED_COLUMNS.items():
+            if name not in existing:
+                self._conn.execute(f"ALTER TABLE captures ADD COLUMN {name} {definition}")
+
+    def insert_many(self, records: list[CaptureRecord]):
+        rows = [(r.channel_id, r.freq, r.start_time.timestamp(), r.duration,
+                 r.sample_count, r.sample_rate, r.rms, r.peak, self._relative(r.path), r.format,
+                 r.preroll_secs, r.frames_dropped)
+                for r in records]
+        with self._conn:
+            self._conn.executemany(
+                f"INSERT INTO captures ({', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(COLUMNS))})", rows)
+
+    def _relative(self, path: str) -> str:
+        if self.root is None:
+            return path
+        return os.path.relpath(path, self.root)
+
+    def query(self, channel_id: Optional[str] = None,
+              start: Optional[datetime] = None,
+              end: Optional[datetime] = None,
+              limit: Optional[int] = None) -> list[CaptureRecord]:
+        """ captures starting within [start, end), oldest first """
+
+        clauses = []
+        args = []
+        if channel_id is not None:
+            clauses.append("channel_id = ?")
+            args.append(channel_id)
+        if start is not None:
+            clauses.append("start_time >= ?")
+            args.append(start.timestamp())
+        if end is not None:
+            clauses.append("start_time < ?")
+            args.append(end.timestamp())
+
+        sql = f"SELECT {', '.join(COLUMNS)} FROM captures"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY start_time"
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(limit)
+
+        records = []
+        for row in self._conn.execute(sql, args):
+            values = dict(zip(COLUMNS, row))
+            values['start_time'] = datetime.fromtimestamp(values['start_time'])
+            records.append(CaptureRecord(**values))
+        return records
+
+    def close(self):
+        self._conn.close()
+
+
+class CatalogWriter:
+    """
+    Queue capture records from the event loop and insert them in batches
+    on a dedicated thread.
+    """
+
+    catalog: CaptureCatalog
+    batch_size: int
+    flush_interval: float
+
+    _queue: asyncio.Queue
+    _executor: ThreadPoolExecutor
+
+    # statistics
+    records_written: int
+
+    def __init__(self, catalog: CaptureCatalog,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL_SECS):
+        self.catalog = catalog
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1,
+                                            thread_name_prefix="catalog")
+        self.records_written = 0
+
+    def add(self, record: CaptureRecord):
+        self._queue.put_nowait(record)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+
+            # give the batch a chance to fill before writing
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(),
+                                                        remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await loop.run_in_executor(self._executor,
+                                           self.catalog.insert_many, batch)
+                self.records_written += len(batch)
+            except Exception as e:
+                logger.error(f"catalog insert of {len(batch)} failed: {type(e)} {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def join(self):
+        """ wait until every record added so far has been written """
+        await self._queue.join()
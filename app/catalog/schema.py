@@ -0,0 +1,22 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+
+@dataclass
+class CaptureRecord:
+    channel_id: str
+    start_time: datetime
+    duration: float
+    sample_count: int
+    sample_rate: int
+    path: str
+    format: str
+
+    freq: Optional[float] = None
+    rms: Optional[float] = None  # dBFS
+    peak: Optional[float] = None  # dBFS
+    # secs of pre-roll ahead of start_time at the head of the file
+    preroll_secs: float = 0.
+    # frames dropped on a full disk backlog; the audio is spliced across them
+    frames_dropped: int = 0
@@ -5,22 +5,35 @@ from .rtlsdr_airband.config_generator import (
     RtlAirbandConfigurationException
 )
 from .literals import DEFAULT_UDP_PORT_BASE
+from .rtlsdr_airband.literals import DEFAULT_STREAM_TIMEOUT_SECS
 from .config import AppConfig
 from .channel_processor import RadioChannelProcessor
+from .datagram_receiver import SharedDatagramReceiver
+from .ptt_timeout import PttTimeoutMonitor
+from .loop_monitor import LoopLagMonitor
 from .rtlsdr_airband.rtl_airband import (
     RtlSdrAirbandInstance,
     ProcessEvent,
     ProcessEventType
 )
 from app.common.utils import filename_from_path
+from app.common.clock import Clock, SYSTEM_CLOCK
 from .config import ConfigurationException
 from .dsp.schema import DiskWriterConfig
+from .dsp.filter_engine import BatchedFilterEngine
+from .dsp.disk_io import DiskIoPool
+from .dsp.archive import ArchiveEncoder
+from .dsp.schema import StreamFormat
+from .catalog import CaptureCatalog, CatalogWriter
+from .metrics import MetricsServer, REGISTRY
 
 import asyncio
 import logging
 import sys
 import traceback
 import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 
 
 logger = logging.getLogger(__name__)
@@ -37,14 +50,86 @@ class RadioChannelManager:
 
     channels: list[RadioChannelProcessor]
 
-    def __init__(self, config: AppConfig):
+    ptt_monitor: PttTimeoutMonitor
+    filter_engine: Optional[BatchedFilterEngine]
+    dsp_executor: Optional[ThreadPoolExecutor]
+    disk_io: DiskIoPool
+    archive_encoder: Optional[ArchiveEncoder]
+    catalog: Optional[CatalogWriter]
+    metrics_server: Optional[MetricsServer]
+    loop_monitor: Optional[LoopLagMonitor]
+    clock: Clock
+
+    def __init__(self, config: AppConfig, clock: Clock = SYSTEM_CLOCK):
 
         self.config = config
+        self.clock = clock
 
         self.tasks = []
         self.rtlsdr_airband_instances = []
         self.rtlsdr_airband_configs = []
         self.channels = []
+        self.ptt_monitor = PttTimeoutMonitor()
+
+        # the pre-roll only ever holds audio newer than the end-of-PTT timeout
+        if 0 < config.preroll_ms <= DEFAULT_STREAM_TIMEOUT_SECS * 1000:
+            logger.warning(f"preroll_ms={config.preroll_ms} does not exceed the "
+                           f"{DEFAULT_STREAM_TIMEOUT_SECS * 1000:.0f} ms end-of-PTT "
+                           f"timeout; no pre-roll will ever be kept")
+
+        # per-frame DSP off the event loop; numpy/scipy release the GIL
+        self.dsp_executor = None
+        if config.dsp_workers > 0:
+            self.dsp_executor = ThreadPoolExecutor(
+                max_workers=config.dsp_workers, thread_name_prefix="dsp")
+
+        # capture file I/O off the event loop
+        self.disk_io = DiskIoPool(workers=config.disk_io_workers,
+                                  max_pending=config.disk_io_max_pending)
+
+        # compress finished captures in a background process pool
+        self.archive_encoder = None
+        archive_format = StreamFormat(config.archive_format)
+        if archive_format != StreamFormat.WAV_PCM_16LE:
+            self.archive_encoder = ArchiveEncoder(
+                archive_format, workers=config.archive_encoder_workers)
+
+        # index of finished captures; rows inserted in batches by a task
+        self.catalog = None
+        if config.catalog_path:
+            os.makedirs(os.path.dirname(config.catalog_path) or ".", exist_ok=True)
+            self.catalog = CatalogWriter(
+                CaptureCatalog(config.catalog_path, root=config.data_path))
+
+        self.filter_engine = None
+        if config.batched_filtering:
+            self.filter_engine = BatchedFilterEngine(self.dsp_executor)
+
+        # one loop carries every channel; watch for anything blocking it
+        self.loop_monitor = None
+        if config.loop_monitor_interval_ms > 0:
+            self.loop_monitor = LoopLagMonitor(
+                interval=config.loop_monitor_interval_ms / 1000.,
+                slow_callback=config.loop_slow_callback_ms / 1000.)
+
+        self.metrics_server = None
+        if config.metrics_port:
+            self.metrics_server = MetricsServer(config.metrics_address,
+                                                config.metrics_port)
+            self._register_metrics()
+
+    def _register_metrics(self):
+        """ node-wide statistics, read when scraped """
+        REGISTRY.gauge("radio_disk_io_pending",
+                       "capture file operations queued across all channels"
+                       ).labels().set_function(lambda: self.disk_io.pending)
+        REGISTRY.counter("radio_disk_io_frames_dropped_total",
+                         "capture frames dropped on a full write backlog"
+                         ).labels().set_function(lambda: self.disk_io.frames_dropped)
+        if self.catalog is not None:
+            REGISTRY.counter("radio_catalog_records_written_total",
+                             "captures recorded in the catalog"
+                             ).labels().set_function(lambda: self.catalog.records_written)
 
     def configure_channels(self):
 
@@ -62,14 +147,25 @@ class RadioChannelManager:
             writer_path: str = os.path.join(self.config.data_path, config.id)
             disk_writer_config: DiskWriterConfig = DiskWriterConfig(
                 minimum_length_secs=self.config.minimum_voice_record_secs,
-                base_path=writer_path
+                base_path=writer_path,
+                max_segment_secs=self.config.max_segment_secs
             )
 
             channel = RadioChannelProcessor(
                 config,
                 self.config.listen_address,
                 listen_port,
-                disk_writer_config=disk_writer_config
+                disk_writer_config=disk_writer_config,
+                filter_engine=self.filter_engine,
+                dsp_executor=self.dsp_executor,
+                disk_io=self.disk_io,
+                archive_encoder=self.archive_encoder,
+                catalog=self.catalog,
+                preroll_ms=self.config.preroll_ms,
+                preroll_outputs=self.config.preroll_outputs,
+                max_pending_bytes=self.config.channel_max_pending_bytes,
+                latency_trace_interval=self.config.latency_trace_interval,
+                clock=self.clock
             )
 
             channel.add_disk_writer(disk_writer_config)
@@ -87,7 +183,8 @@ class RadioChannelManager:
                     password=self.config.mumble.password,
                     sanitize_usernames=self.config.mumble.sanitize_usernames,
                     channel=join_channel,
-                    certs_store=certs_store
+                    certs_store=certs_store,
+                    resample_quality=self.config.mumble.resample_quality
                 )
 
             self.channels.append(channel)
@@ -198,7 +295,24 @@ class RadioChannelManager:
                 # an rtl_airband instance has failed -- we will not proceed
                 return
 
-        self.tasks.extend([listener.start_listener() for listener in self.channels])
+        receiver = None
+        if self.config.shared_receiver:
+            receiver = SharedDatagramReceiver(self.config.listen_address)
+
+        # one end-of-PTT sweep shared by every channel
+        self.tasks.append(self.ptt_monitor.run())
+
+        if self.catalog is not None:
+            self.tasks.append(self.catalog.run())
+
+        if self.metrics_server is not None:
+            self.tasks.append(self.metrics_server.run())
+
+        if self.loop_monitor is not None:
+            self.tasks.append(self.loop_monitor.run())
+
+        self.tasks.extend([listener.start_listener(receiver, self.ptt_monitor)
+                           for listener in self.channels])
 
         await asyncio.gather(*self.tasks)
 
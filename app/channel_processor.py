@@ -1,10 +1,16 @@
-from .rtlsdr_airband.literals import DEFAULT_STREAM_TIMEOUT_SECS
+from .rtlsdr_airband.literals import (
+    DEFAULT_STREAM_TIMEOUT_SECS,
+    UDP_DATAGRAM_BYTES,
+    UDP_DATAGRAM_SAMPLES
+)
 # from .dsp.filters import iir_notch, iir_highpass
 from .dsp.filters import StreamingFilter, FilterType
+from .dsp.filter_engine import BatchedFilterEngine, FilterEngineChannel
 
 
 from .literals import (
     DEFAULT_MINIMUM_VOICE_ACTIVE_SECS,
+    DEFAULT_CHANNEL_MAX_PENDING_BYTES,
     SAMPLE_SECS_PER_FRAME
 )
 from .mumble.channel import MumbleChannel
@@ -13,20 +19,42 @@ from app.config import RadioChannelConfig
 # from app.radio.channel import RadioChannel, RadioChannelSession, Frame, StreamLogger
 
 from app.radio.schema import RadioChannel, RadioChannelSession
+from app.radio.tones import TwoTonePagingDetector, TwoTonePage
 from app.dsp.disk_writer import StreamDiskWriter, ChannelDiskWriter
-from app.dsp.frame import Frame
-from app.dsp.schema import DiskWriterConfig
+from app.dsp.disk_io import DiskIoPool
+from app.dsp.archive import ArchiveEncoder
+from app.catalog import CatalogWriter
+from app.dsp.frame import Frame, FrameTrace, Stage
+from app.dsp.ring_buffer import BlockRing, SampleHistory
+from app.dsp.resampling import ResampleQuality
+from app.dsp.rendition import PcmRendition, OutputFormat
+from app.dsp.schema import DiskWriterConfig, SamplesSequenceSummary
+from app.dsp.analysis import LevelAccumulator
+from app.datagram_receiver import SharedDatagramReceiver
+from app.ptt_timeout import PttTimeoutMonitor, PttStream
+from app.common.executor import OrderedExecutorLane
+from app.common.clock import Clock, SYSTEM_CLOCK
+from app.metrics import ChannelMetrics, LatencyTracker
 
 # experiment to test if we are getting jitter from the 8,000 byte frames..
 # 8k/4 = 2k samples
 BUFFER_FRAMES_NUM: int = 15
 
+# frames waiting on the DSP lane still reference receive ring blocks, so
+# the backlog must stay below the ring size
+DSP_MAX_PENDING_FRAMES: int = BUFFER_FRAMES_NUM - 2
+
+# finished sessions kept for inspection
+SESSION_HISTORY_NUM: int = 32
+
 import os
 import asyncio
 import logging
+from collections import deque
+from concurrent.futures import Executor
+from datetime import timedelta
+from time import perf_counter
 from typing import Callable, Union, Optional
-from queue import Queue
-import struct
 
 import numpy as np
 
@@ -36,15 +64,12 @@ logger = logging.getLogger(__name__)
 
 class PttVoiceDatagramProtocol(asyncio.DatagramProtocol):
 
-    def __init__(self, on_data: Callable, on_done: Callable,
-                 timeout: float = DEFAULT_STREAM_TIMEOUT_SECS):
+    def __init__(self, on_data: Callable, ptt: PttStream):
 
         self.on_data = on_data
-        self.on_done = on_done
-        self.timeout = timeout
+        self.ptt = ptt
 
         self.transport = None
-        self.timeout_handle = None
 
     def connection_made(self, transport):
         self.transport = transport
@@ -52,14 +77,8 @@ class PttVoiceDatagramProtocol(asyncio.DatagramProtocol):
     def datagram_received(self, data, addr):
         self.on_data(data, addr)
 
-        # Reset the timeout timer
-        if self.timeout_handle:
-            self.timeout_handle.cancel()
-        self.timeout_handle = asyncio.get_event_loop().call_later(
-            self.timeout, self.timeout_reached)
-
-    def timeout_reached(self):
-        self.on_done()
+        # end-of-PTT is detected by the shared PttTimeoutMonitor sweep
+        self.ptt.touch()
 
     def error_received(self, exc):
         logger.error(f'Error received: {exc}')
@@ -68,6 +87,10 @@ class PttVoiceDatagramProtocol(asyncio.DatagramProtocol):
         logger.error('Connection closed')
 
 
+def _noop():
+    pass
+
+
 def count_trailing_zeros(byte_array):
     count = 0
     for byte in reversed(byte_array):
@@ -94,21 +117,55 @@ class RadioChannelProcessor:
     data_store: Optional[str]
 
     # receive_buffer: bytearray
-    frames: Queue[Frame]
+    receive_ring: BlockRing
 
     # Filters
     filters_notch: list[StreamingFilter]
-    filter_highpass: StreamingFilter
-    filter_lowpass: StreamingFilter
+    filter_bandpass: StreamingFilter
+
+    # when set, bandpass filtering is batched with other channels
+    filter_engine: Optional[BatchedFilterEngine]
+    filter_engine_channel: Optional[FilterEngineChannel]
+
+    # per-frame DSP (filter, gain, resample, encode); inline or on a worker
+    dsp_lane: OrderedExecutorLane
+    dsp_frames_dropped: int
+
+    preroll: Optional[SampleHistory]
+    preroll_secs: float
+    preroll_outputs: bool
+
+    # running levels of the filtered audio of the active session; owned by
+    # the DSP lane
+    levels: LevelAccumulator
+
+    # live two-tone paging decoder; owned by the tone lane
+    tone_detector: Optional[TwoTonePagingDetector]
+    tone_lane: Optional[OrderedExecutorLane]
+    tone_listeners: list[Callable[[TwoTonePage], None]]
+
+    metrics: ChannelMetrics
+    # datagram -> mumble latency of each frame
+    latency: LatencyTracker
+
+    # cap on pcm queued per mumble output; each output drops its own
+    # oldest audio beyond it (the disk writer has its own bounded lane)
+    max_pending_bytes: int
+    pending_bytes_max: int
 
     # Move this all to the Mumble channel class
     mumble_outputs: list[MumbleChannel]
+    # one rendition per distinct output format, shared by the outputs
+    renditions: dict[OutputFormat, PcmRendition]
     mumble_tasks: list
     mumble_buffering: bool
 
     # Session
+    clock: Clock
+    session_listeners: list[Callable[[RadioChannelSession], None]]
+    ptt: Optional[PttStream]
     last_session_id: int
-    sessions: list[RadioChannelSession]
+    sessions: deque[RadioChannelSession]
     active_session: Union[RadioChannelSession, None]
 
     # DataLoggers
@@ -124,7 +181,17 @@ class RadioChannelProcessor:
             listen_addr: str,
             listen_port: int,
             sample_rate: int = 16000,
-            disk_writer_config: Optional[DiskWriterConfig] = None
+            disk_writer_config: Optional[DiskWriterConfig] = None,
+            filter_engine: Optional[BatchedFilterEngine] = None,
+            dsp_executor: Optional[Executor] = None,
+            disk_io: Optional[DiskIoPool] = None,
+            archive_encoder: Optional[ArchiveEncoder] = None,
+            catalog: Optional[CatalogWriter] = None,
+            preroll_ms: int = 0,
+            preroll_outputs: bool = False,
+            max_pending_bytes: int = DEFAULT_CHANNEL_MAX_PENDING_BYTES,
+            latency_trace_interval: int = 0,
+            clock: Clock = SYSTEM_CLOCK
         ):
 
         self.config = config
@@ -142,10 +209,14 @@ class RadioChannelProcessor:
         if config.designator:
             self.channel.set_emissions_designator(config.designator)
 
-        self.frames = Queue()
+        # raw datagram samples are copied once into preallocated blocks
+        self.receive_ring = BlockRing(BUFFER_FRAMES_NUM, UDP_DATAGRAM_SAMPLES)
 
+        self.clock = clock
+        self.session_listeners = []
+        self.ptt = None
         self.last_session_id = 0
-        self.sessions = []
+        self.sessions = deque(maxlen=SESSION_HISTORY_NUM)
         self.active_session = None
         self.disk_writer = None
 
@@ -168,15 +239,48 @@ class RadioChannelProcessor:
 
         # Filters
         self.filters_notch = []
-        self.filter_highpass = StreamingFilter(FilterType.HIGHPASS,
+        # 275 Hz highpass and 3500 Hz lowpass fused into one cascade
+        self.filter_bandpass = StreamingFilter(FilterType.BANDPASS,
                                                sampling_freq=self.sample_rate,
-                                               order=40, freq=275)
-
-        self.filter_lowpass = StreamingFilter(FilterType.LOWPASS,
-                                              sampling_freq=self.sample_rate,
-                                              order=40, freq=3500)
+                                               order=40, freq=(275, 3500))
+
+        self.filter_engine = filter_engine
+        self.filter_engine_channel = None
+        if filter_engine is not None:
+            self.filter_engine_channel = filter_engine.register(
+                self.filter_bandpass.design, self._on_filtered)
+
+        self.dsp_lane = OrderedExecutorLane(dsp_executor, name=f"dsp:{self.id}")
+        self.dsp_frames_dropped = 0
+
+        # recent processed samples, prepended to the next session; owned
+        # by the DSP lane
+        self.preroll_secs = preroll_ms / 1000.
+        self.preroll_outputs = preroll_outputs
+        self.preroll = None
+        if preroll_ms > 0:
+            self.preroll = SampleHistory(int(self.preroll_secs * self.sample_rate),
+                                         self.sample_rate)
+
+        self.levels = LevelAccumulator(self.sample_rate)
+
+        # tone decoding runs behind audio delivery on its own lane
+        self.tone_detector = None
+        self.tone_lane = None
+        self.tone_listeners = []
+        if config.tone_detection:
+            self.tone_detector = TwoTonePagingDetector(self.sample_rate)
+            self.tone_lane = OrderedExecutorLane(dsp_executor, name=f"tones:{self.id}")
+
+        self.metrics = ChannelMetrics(self.id)
+        self.latency = LatencyTracker(self.id, trace_interval=latency_trace_interval)
+        self._register_metrics()
+
+        self.max_pending_bytes = max_pending_bytes
+        self.pending_bytes_max = 0
 
         self.mumble_outputs = []
+        self.renditions = {}
         self.mumble_tasks = []
         self.mumble_buffering = False
 
@@ -185,7 +289,13 @@ class RadioChannelProcessor:
                 channel_id=self.id,
                 data_store=disk_writer_config.base_path,
                 sample_rate=self.sample_rate,
-                minimum_record_secs=disk_writer_config.minimum_length_secs
+                minimum_record_secs=disk_writer_config.minimum_length_secs,
+                io=disk_io,
+                archive=archive_encoder,
+                catalog=catalog,
+                freq=config.freq,
+                max_segment_secs=disk_writer_config.max_segment_secs,
+                metrics=self.metrics
             )
 
         # default of unity gain on output
@@ -197,6 +307,29 @@ class RadioChannelProcessor:
             elif self.channel.designator.bandwidth >= 11000 and self.channel.designator.bandwidth < 12000:
                 self.output_gain = 2
 
+    def _register_metrics(self):
+        """ existing statistics, read when scraped """
+        m = self.metrics
+        m.gauge("radio_channel_mumble_queue_depth",
+                "pcm chunks queued for the mumble outputs",
+                lambda: sum(output.audio_buffer.qsize() for output in self.mumble_outputs))
+        m.gauge("radio_channel_pending_bytes",
+                "audio buffered for the disk writer and mumble outputs",
+                lambda: self.pending_bytes)
+        m.gauge("radio_channel_dsp_queue_depth",
+                "frames queued or in flight on the DSP lane",
+                lambda: self.dsp_lane.depth)
+        m.gauge("radio_channel_level_dbfs",
+                "RMS level of the most recent frame",
+                lambda: self.level_dbfs)
+        m.counter("radio_channel_dsp_frames_dropped_total",
+                  "frames dropped on a full DSP backlog",
+                  lambda: self.dsp_frames_dropped)
+        m.counter("radio_channel_memory_cap_drops_total",
+                  "pcm frames dropped by mumble outputs over the pending bytes cap",
+                  lambda: self.memory_cap_drops)
+        self.latency.register()
+
     def add_disk_writer(self, config: DiskWriterConfig, id: Optional[str] = None) -> None:
         if self.disk_writer is None:
             raise Exception("disk writer is not configured!")
@@ -217,6 +350,8 @@ class RadioChannelProcessor:
         passed_args['cert_cn'] = self.id
         if "channel" in kwargs:
             passed_args['channel'] = kwargs.get('channel')
+        if kwargs.get('resample_quality'):
+            passed_args['resample_quality'] = ResampleQuality(kwargs.get('resample_quality'))
 
         username = self.label
 
@@ -231,7 +366,17 @@ class RadioChannelProcessor:
                 password=password,
                 certs_store=certs_store, **passed_args
             )
-        self.mumble_outputs.append(mumble_channel)
+        self.add_output(mumble_channel)
+
+    def add_output(self, output: MumbleChannel):
+        """ attach an output; pcm is rendered once per distinct output format """
+        output.on_sent = self.latency.record
+        output.max_pending_bytes = self.max_pending_bytes
+        self.mumble_outputs.append(output)
+
+        output_format = output.output_format
+        if output_format not in self.renditions:
+            self.renditions[output_format] = PcmRendition(*output_format)
 
     def set_label(self, value: str):
         self.label = value
@@ -239,24 +384,79 @@ class RadioChannelProcessor:
     def _start_stream(self):
 
         self.last_session_id += 1
-        session = RadioChannelSession(self.last_session_id)
+        self.metrics.sessions.inc()
+        session = RadioChannelSession(self.last_session_id, self.clock.now())
         self.active_session = session
         self.sessions.append(session)
 
         logger.debug(f"channel id={self.id} PTT stream udp/{self.listen_port}"
                      f" started; session_id = {self.active_session.id}")
 
-        self.disk_writer.start_event(session.start_time)
+        # frames of a previous session may still be in flight; the pre-roll
+        # is taken once they have passed through the DSP lane
+        started = self.clock.monotonic()
+        self._in_order(lambda result: self._open_session(session, result),
+                       job=lambda: self._take_preroll(session.id, started),
+                       fallback=lambda: None)
+
+    def _take_preroll(self, session_id: int, started: float
+                      ) -> Optional[tuple[Frame, dict[OutputFormat, bytes]]]:
+        """
+        DSP lane; samples from just before `started`, followed by silence
+        for the gap since they were received, so positions in the capture
+        stay true
+        """
+        if self.preroll is None:
+            return None
+
+        samples = self.preroll.recent(self.preroll_secs, started)
+        if samples.size == 0:
+            return None
+
+        gap = max(started - self.preroll.last_write, 0.)
+        samples = np.concatenate(
+            (samples, np.zeros(int(round(gap * self.sample_rate)), dtype=samples.dtype)))
+
+        frame = Frame(session_id, self.sample_rate, samples)
+        pcm_outputs = self._render(frame) if self.preroll_outputs else {}
+        return frame, pcm_outputs
+
+    def _open_session(self, session: RadioChannelSession,
+                      preroll: Optional[tuple[Frame, dict[OutputFormat, bytes]]]):
+
+        # captures keep the real start time; the pre-roll ahead of it is
+        # recorded as an offset
+        preroll_secs = 0.
+        if preroll is not None:
+            frame, _ = preroll
+            preroll_secs = frame.num_samples / self.sample_rate
+            logger.debug(f"channel id={self.id} pre-roll of {preroll_secs:.3f} secs"
+                         f" (silent gap included)")
+
+        if self.disk_writer is not None:
+            self.disk_writer.start_event(session.start_time, preroll_secs)
+
+        # tone positions count from the first sample fed, pre-roll included
+        if self.tone_lane is not None:
+            self.tone_lane.submit(self.tone_detector.reset,
+                                  (session.start_time - timedelta(seconds=preroll_secs),))
+
+        if preroll is not None:
+            self._deliver_frame(preroll)
 
     def _stop_stream(self):
 
         if self.active_session is None:
             logger.warning("trying to stop a stream where no stream exists!")
 
-        if self.active_session:
-            self.active_session.set_finished()
+        session = self.active_session
+        if session:
+            session.set_finished()
             self.active_session = None
 
+        # filter state must not carry into the next session
+        self._reset_filters()
+
         # null_tail = count_trailing_zeros(self.receive_buffer)
         # print(f"null_tail = {null_tail:,}/{len(self.receive_buffer):,} ({round((null_tail/len(self.receive_buffer))*100,1)})")
 
@@ -271,55 +471,122 @@ class RadioChannelProcessor:
         #     logger.debug(f"{self.label} - PTT ended; [{round(duration_voice, 2)} sec]")
         #     samples = np.frombuffer(self.receive_buffer.copy(), dtype=np.float32)
 
-        self.disk_writer.finish_event()
+        self._in_order(lambda summary: self._close_session(session, summary),
+                       job=self._take_levels,
+                       fallback=self._empty_levels)
 
         # Clear the buffer and reset the start time
         # self.receive_buffer.clear()
         self.start_time = None
 
+    def _take_levels(self) -> SamplesSequenceSummary:
+        """ DSP lane; levels of the session that just ended """
+        summary = self.levels.summary()
+        self.levels.reset()
+        return summary
+
+    def _empty_levels(self) -> SamplesSequenceSummary:
+        self.levels.reset()
+        return LevelAccumulator(self.sample_rate).summary()
+
+    def _close_session(self, session: Optional[RadioChannelSession],
+                       summary: SamplesSequenceSummary):
+        if session is not None:
+            session.summary = summary
+            self.metrics.session_duration.observe(summary.length)
+            logger.debug(f"channel id={self.id} latency p50/p99 (ms): "
+                         f"{self.latency.summary()}")
+
+            for listener in self.session_listeners:
+                try:
+                    listener(session)
+                except Exception as e:
+                    logger.error(f"session listener error: {type(e)} {e}")
+
+        if self.disk_writer is not None:
+            self.disk_writer.finish_event()
+
+        for mumble_output in self.mumble_outputs:
+            mumble_output.end_transmission()
+
+        if self.tone_lane is not None:
+            self.tone_lane.submit(self.tone_detector.finalize, (),
+                                  self._on_pages)
+
+    def _on_pages(self, pages: list[TwoTonePage]):
+        """ decoded pages from the tone lane; runs on the event loop """
+        for page in pages:
+            page.channel_id = self.id
+            sequence = page.sequence
+            logger.info(f"channel id={self.id} two-tone page: group {sequence.group} "
+                        f"id {sequence.id:02d} ({sequence.tone_1.freq}/{sequence.tone_2.freq} Hz)"
+                        f" at {page.start_time}")
+
+            for listener in self.tone_listeners:
+                try:
+                    listener(page)
+                except Exception as e:
+                    logger.error(f"tone listener error: {type(e)} {e}")
+
+    def add_session_listener(self, listener: Callable[[RadioChannelSession], None]):
+        """ `listener(session)` is called on the event loop once a session closes """
+        self.session_listeners.append(listener)
+
+    def add_tone_listener(self, listener: Callable[[TwoTonePage], None]):
+        """ `listener(page)` is called on the event loop per decoded page """
+        self.tone_listeners.append(listener)
+
     def _on_data(self, data, addr):
         """
         assuming incoming data type is 32-bit floats
         this method is being called by the datagram receiver so do not block
         """
 
+        trace = FrameTrace()
+        trace.mark(Stage.RECEIVED)
+        self.metrics.datagrams.inc()
+
         if not self.active_session:
             self._start_stream()
 
         # only if we are expecting an 8k block from RTLSDR-Airband UDP_OUTPUT
-        if len(data) != 8000:
+        if len(data) != UDP_DATAGRAM_BYTES:
+            self.metrics.datagrams_malformed.inc()
             logger.warning(f"received datagarm of size {len(data):,} bytes")
 
-        # self.receive_buffer.extend(data)
-
         # There is no turning back with this Exception!
         if len(data) % 4 != 0:
             raise ValueError("The length of byte_array is not a multiple of 4")
 
-        # Build, populate, and enqueue a frame
-        unpacked_data = struct.unpack(f'<{len(data) // 4}f', data)
-        frame = Frame(self.active_session.id, self.sample_rate,
-                             np.array(unpacked_data, dtype=np.float32))
-        self.frames.put_nowait(frame)
+        # view the datagram as float32 (no unpacking) and copy it straight
+        # into the next ring block; the frame carries a view of that block
+        samples = self.receive_ring.write(np.frombuffer(data, dtype='<f4'))
+        frame = Frame(self.active_session.id, self.sample_rate, samples,
+                      trace=trace)
 
-        self._process_samples()
+        self._process_samples(frame)
 
 
     def _reset_filters(self):
 
+        if self.filter_engine is not None:
+            self.filter_engine.reset(self.filter_engine_channel)
+
+        # filter state is owned by the DSP lane; reset in order with frames
+        self.dsp_lane.submit(self._reset_filter_state)
+
+    def _reset_filter_state(self):
+
         for filter_notch in self.filters_notch:
             filter_notch.reset()
 
-        if self.filter_highpass:
-            self.filter_highpass.reset()
-
-        if self.filter_lowpass:
-            self.filter_lowpass.reset()
+        if self.filter_bandpass:
+            self.filter_bandpass.reset()
 
 
-    def _process_samples(self):
+    def _process_samples(self, frame: Frame):
         """
-        Attempt processing on arrival of new data
+        Process a newly arrived frame
         """
         samples_per_frame = int(SAMPLE_SECS_PER_FRAME * 16000)  # match incoming sample rate to outgoing
 
@@ -337,39 +604,198 @@ class RadioChannelProcessor:
         # we have not addressed frame padding yet!
 
 
-        while self.frames.qsize() > 0:
+        # disabling raw logger for now
+        # self.stream_logger_raw.add_frame(frame)
 
-            frame = self.frames.get()
+        # apply filter stages
+        if self.filter_engine is not None:
+            self.filter_engine.submit(self.filter_engine_channel, frame)
+            return
 
-            # disabling raw logger for now
-            # self.stream_logger_raw.add_frame(frame)
+        self._submit_dsp(frame, True)
 
-            # apply filter stages
-            frame.samples = self.filter_highpass.filter(frame.samples)
-            frame.samples = self.filter_lowpass.filter(frame.samples)
+    def _on_filtered(self, frame: Frame):
+        """
+        Continue processing of a frame filtered by the filter engine
+        """
+        if frame.trace is not None:
+            frame.trace.mark(Stage.FILTERED)
+        self._submit_dsp(frame, False)
 
-            if self.disk_writer is not None:
-                self.disk_writer.add_frame(frame)
+    def _submit_dsp(self, frame: Frame, apply_filter: bool):
 
-            # level normalization / fixed gain
-            frame.samples = frame.samples * self.output_gain
+        # a worker that cannot keep up must not grow the backlog unbounded
+        if self.dsp_lane.depth >= DSP_MAX_PENDING_FRAMES:
+            self.dsp_frames_dropped += 1
+            logger.warning(f"channel id={self.id} DSP backlog full; "
+                           f"dropped frame ({self.dsp_frames_dropped} total)")
+            return
+
+        self.dsp_lane.submit(self._dsp_frame, (frame, apply_filter),
+                             self._deliver_frame)
+
+    def _dsp_frame(self, frame: Frame, apply_filter: bool
+                   ) -> tuple[Frame, dict[OutputFormat, bytes]]:
+        """
+        Filter, gain, resample and encode a frame. Runs on a DSP worker when
+        one is configured, so it must not touch the event loop.
+        """
+        if apply_filter:
+            started = perf_counter()
+            frame.samples = self.filter_bandpass.filter(frame.samples)
+            filtered = perf_counter()
+            self.metrics.filter_time.observe(filtered - started)
+            if frame.trace is not None:
+                frame.trace.mark(Stage.FILTERED, filtered)
+
+        self.levels.update(frame.samples)
+
+        if self.preroll is not None:
+            self.preroll.write(frame.samples, self.clock.monotonic())
 
-            # forward samples to respective mumble outputs
-            for mumble_output in self.mumble_outputs:
-                mumble_output.add_frame(frame)
+        return frame, self._render(frame)
+
+    def _render(self, frame: Frame) -> dict[OutputFormat, bytes]:
+        """ gain, resample and encode for the outputs; DSP lane """
+        pcm_outputs = {}
+        if self.renditions:
+            # level normalization / fixed gain
+            output = Frame(frame.session_id, frame.sample_rate,
+                           frame.samples * self.output_gain)
+
+            # resample and encode once per format, not once per output
+            for output_format, rendition in self.renditions.items():
+                pcm_outputs[output_format] = rendition.render(output)
+                if frame.trace is not None:
+                    encoded = perf_counter()
+                    frame.trace.mark(Stage.RESAMPLED, encoded - rendition.encode_secs)
+                    frame.trace.mark(Stage.ENCODED, encoded)
+                self.metrics.resample_time.observe(rendition.resample_secs)
+                self.metrics.encode_time.observe(rendition.encode_secs)
+
+        return pcm_outputs
+
+    def _deliver_frame(self, result: tuple[Frame, dict[OutputFormat, bytes]]):
+        """
+        Hand a processed frame to the sinks; runs on the event loop
+        """
+        frame, pcm_outputs = result
+
+        # each sink bounds its own backlog: the disk writer drops on a full
+        # I/O lane, a stalled mumble output drops its oldest pcm
+        pending_bytes = self.pending_bytes
+        if pending_bytes > self.pending_bytes_max:
+            self.pending_bytes_max = pending_bytes
+
+        trace = frame.trace
+        if self.disk_writer is not None:
+            self.disk_writer.add_frame(frame)
+            if trace is not None:
+                trace.mark(Stage.DISK)
+
+        # forward the shared (immutable) renditions to the mumble outputs;
+        # each output completes its own copy of the trace once sent
+        sent = False
+        for mumble_output in self.mumble_outputs:
+            pcm = pcm_outputs.get(mumble_output.output_format)
+            if pcm is not None:
+                output_trace = None
+                if trace is not None:
+                    output_trace = trace.copy()
+                    output_trace.mark(Stage.QUEUED)
+                mumble_output.add_samples(pcm, output_trace)
+                sent = True
+
+        if trace is not None and not sent:
+            self.latency.record(trace)
+
+        # filtered samples are not modified after delivery
+        if self.tone_lane is not None:
+            self.tone_lane.submit(self.tone_detector.process_block,
+                                  (frame.samples,), self._on_pages)
+
+    def _in_order(self, callback: Callable, job: Optional[Callable] = None,
+                  fallback: Optional[Callable] = None):
+        """
+        Run `callback` on the event loop once every frame received so far
+        has been delivered to the sinks. With a `job`, the job runs on the
+        DSP lane at that point and `callback` receives its result; if the
+        job fails, the result of `fallback()` instead, so sessions are
+        still opened and closed.
+        """
+        def guarded_job():
+            try:
+                return job()
+            except Exception as e:
+                logger.error(f"channel id={self.id} {getattr(job, '__name__', 'job')}"
+                             f" failed: {type(e)} {e}")
+                return fallback() if fallback is not None else None
+
+        def after_dsp(_):
+            if job is None:
+                self.dsp_lane.submit(_noop, (), lambda _: callback())
+            else:
+                self.dsp_lane.submit(guarded_job, (), callback)
+
+        if self.filter_engine is not None:
+            self.filter_engine.flush()
+            self.filter_engine.lane.submit(_noop, (), after_dsp)
+        else:
+            after_dsp(None)
+
+    @property
+    def level_dbfs(self) -> Optional[float]:
+        """ RMS (dBFS) of the most recent frame; None between sessions """
+        return self.levels.last_level
+
+    @property
+    def memory_cap_drops(self) -> int:
+        """ pcm frames dropped by the mumble outputs over their cap """
+        return sum(output.frames_dropped for output in self.mumble_outputs)
+
+    @property
+    def pending_bytes(self) -> int:
+        """ audio queued for the disk writer and mumble outputs """
+        pending = sum(output.pending_bytes for output in self.mumble_outputs)
+        if self.disk_writer is not None:
+            pending += self.disk_writer.pending_bytes
+        return pending
+
+    @property
+    def dsp_queue_depth(self) -> int:
+        """ frames waiting for (or in) DSP on this channel """
+        return self.dsp_lane.depth
 
     def _on_done(self):
         self._stop_stream()
 
 
-    async def start_listener(self):
+    def attach_ptt(self, ptt_monitor: PttTimeoutMonitor):
+        """ end-of-PTT detection by `ptt_monitor`; datagrams must touch self.ptt """
+        self.ptt = ptt_monitor.register(self._on_done,
+                                        timeout=DEFAULT_STREAM_TIMEOUT_SECS,
+                                        name=self.id)
+
+    async def start_listener(self, receiver: Optional[SharedDatagramReceiver] = None,
+                             ptt_monitor: Optional[PttTimeoutMonitor] = None):
 
         loop = asyncio.get_running_loop()
 
-        transport, protocol = await loop.create_datagram_endpoint(
-            lambda: PttVoiceDatagramProtocol(self._on_data, self._on_done),
-            local_addr=(self.listen_addr, self.listen_port)
-        )
+        # run our own sweep if we are not sharing the manager's
+        ptt_task = None
+        if ptt_monitor is None:
+            ptt_monitor = PttTimeoutMonitor()
+            ptt_task = asyncio.create_task(ptt_monitor.run(), name="PTT Sweep")
+
+        self.attach_ptt(ptt_monitor)
+
+        if receiver is not None:
+            receiver.add_channel(self.listen_port, self._on_data, self.ptt)
+        else:
+            transport, protocol = await loop.create_datagram_endpoint(
+                lambda: PttVoiceDatagramProtocol(self._on_data, self.ptt),
+                local_addr=(self.listen_addr, self.listen_port)
+            )
 
         logger.info(f"{self.__class__.__name__} id={self.id}; listening on udp/{self.listen_port}")
 
@@ -384,6 +810,8 @@ class RadioChannelProcessor:
         finally:
             for mumble_channel in self.mumble_outputs:
                 mumble_channel.stop()
+            if ptt_task:
+                ptt_task.cancel()
             try:
                 # Wait for the task to be cancelled
                 for mumble_task in self.mumble_tasks:
@@ -0,0 +1,43 @@
+"""
+Time source of the pipeline.
+
+Live, this is the system clock. Replay drives the pipeline with a
+VirtualClock instead, so session start times, capture filenames, PTT
+timeouts and the pre-roll follow the recorded traffic rather than the
+wall clock.
+"""
+from datetime import datetime
+from time import monotonic
+from typing import Optional
+
+
+class Clock:
+
+    def now(self) -> datetime:
+        return datetime.now()
+
+    def monotonic(self) -> float:
+        return monotonic()
+
+
+class VirtualClock(Clock):
+    """ set by the replay driver; both readings are the POSIX time """
+
+    time: float
+
+    def __init__(self, time: Optional[float] = None):
+        self.time = time or 0.
+
+    def now(self) -> datetime:
+        return datetime.fromtimestamp(self.time)
+
+    def monotonic(self) -> float:
+        return self.time
+
+    def set(self, time: float):
+        # never runs backwards
+        if time > self.time:
+            self.time = time
+
+
+SYSTEM_CLOCK = Clock()
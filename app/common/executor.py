@@ -0,0 +1,92 @@
+from concurrent.futures import Executor
+from collections import deque
+import asyncio
+import logging
+from typing import Callable, Optional, Any
+
+
+logger = logging.getLogger(__name__)
+
+
+class OrderedExecutorLane:
+    """
+    Run the jobs of one stream on a (shared) executor strictly in order.
+
+    At most one job of a lane is in flight, so state owned by the stream
+    (filter state, resamplers, open files) is only ever touched by one
+    worker at a time. Job results are passed to their callback on the
+    event loop thread. Without an executor, jobs and callbacks run inline.
+    """
+
+    name: str
+    executor: Optional[Executor]
+
+    _pending: deque
+    _busy: bool
+
+    # statistics
+    jobs: int
+    depth_max: int
+
+    def __init__(self, executor: Optional[Executor] = None,
+                 name: str = "lane"):
+        self.name = name
+        self.executor = executor
+
+        self._pending = deque()
+        self._busy = False
+
+        self.jobs = 0
+        self.depth_max = 0
+
+    @property
+    def depth(self) -> int:
+        """ jobs queued or in flight """
+        return len(self._pending) + (1 if self._busy else 0)
+
+    def submit(self, fn: Callable, args: tuple = (),
+               callback: Optional[Callable[[Any], None]] = None):
+
+        if self.executor is None:
+            self._complete(callback, fn(*args))
+            return
+
+        self._pending.append((fn, args, callback))
+        depth = self.depth
+        if depth > self.depth_max:
+            self.depth_max = depth
+
+        if not self._busy:
+            self._next()
+
+    def _next(self):
+        if not self._pending:
+            self._busy = False
+            return
+
+        fn, args, callback = self._pending.popleft()
+        self._busy = True
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, fn, *args)
+        future.add_done_callback(
+            lambda f: self._on_done(f, callback))
+
+    def _on_done(self, future: asyncio.Future, callback: Optional[Callable]):
+        try:
+            result = future.result()
+        except Exception as e:
+            logger.error(f"{self.name}: job failed: {type(e)} {e}")
+        else:
+            self._complete(callback, result)
+
+        self._next()
+
+    def _complete(self, callback: Optional[Callable], result: Any):
+        self.jobs += 1
+        if callback is None:
+            return
+        try:
+            callback(result)
+        except Exception as e:
+            logger.error(f"{self.name}: callback failed: {type(e)} {e}")
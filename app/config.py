@@ -5,7 +5,16 @@ from .literals import (
     DEFAULT_UDP_LISTEN_ADDR,
     DEFAULT_DATA_STORE_PATH,
     DEFAULT_UDP_PORT_BASE,
-    DEFAULT_MINIMUM_VOICE_ACTIVE_SECS
+    DEFAULT_MINIMUM_VOICE_ACTIVE_SECS,
+    DEFAULT_DISK_IO_WORKERS,
+    DEFAULT_DISK_IO_MAX_PENDING,
+    DEFAULT_PREROLL_MS,
+    DEFAULT_MAX_SEGMENT_SECS,
+    DEFAULT_CHANNEL_MAX_PENDING_BYTES,
+    DEFAULT_METRICS_LISTEN_ADDR,
+    DEFAULT_METRICS_PORT,
+    DEFAULT_LOOP_MONITOR_INTERVAL_MS,
+    DEFAULT_LOOP_SLOW_CALLBACK_MS
 )
 
 # system libs
@@ -54,6 +63,9 @@ class RadioChannelConfig:
 
     udp_port: Optional[int] = None
 
+    # decode two-tone sequential (Quick Call II) pages live
+    tone_detection: bool = False
+
     mumble: Optional[MumbleChannelConfig] = None
 
     rtlsdr_airband_overrides: list[str] = field(default_factory=list)
@@ -71,6 +83,8 @@ class MumbleConfig:
     sanitize_usernames: Optional[bool] = False
     password: Optional[str] = None
     default_channel: Optional[str] = None
+    # polyphase | sinc_fastest | sinc_medium | sinc_best
+    resample_quality: Optional[str] = None
 
 
 @dataclass
@@ -88,9 +102,45 @@ class AppConfig:
     listen_address: str = DEFAULT_UDP_LISTEN_ADDR
     listen_port_base: int = DEFAULT_UDP_PORT_BASE
 
+    # receive all channel ports on one batched receiver
+    shared_receiver: bool = False
+
+    # filter frames of all channels together in one 2-D pass
+    batched_filtering: bool = False
+
+    # DSP worker threads; 0 processes frames inline on the event loop
+    dsp_workers: int = 0
+
     # stream recording
     data_path: Optional[str] = DEFAULT_DATA_STORE_PATH
     minimum_voice_record_secs: float = DEFAULT_MINIMUM_VOICE_ACTIVE_SECS
+    # recent processed audio prepended to each capture (and optionally the
+    # outputs) when a session opens
+    preroll_ms: int = DEFAULT_PREROLL_MS
+    preroll_outputs: bool = False
+    # roll captures into numbered segments; 0 disables
+    max_segment_secs: float = DEFAULT_MAX_SEGMENT_SECS
+    # audio buffered per channel for the sinks before frames are dropped
+    channel_max_pending_bytes: int = DEFAULT_CHANNEL_MAX_PENDING_BYTES
+    # capture writes run on dedicated I/O threads; 0 writes on the event loop
+    disk_io_workers: int = DEFAULT_DISK_IO_WORKERS
+    # per-stream write backlog (frames) before frames are dropped
+    disk_io_max_pending: int = DEFAULT_DISK_IO_MAX_PENDING
+    # wav.pcm_16le | flac | ogg.opus; non-wav captures are encoded after
+    # the session closes by a background process pool
+    archive_format: str = "wav.pcm_16le"
+    archive_encoder_workers: int = 1
+    # sqlite index of finished captures; defaults to data_path/catalog.sqlite3
+    catalog_path: Optional[str] = None
+
+    # prometheus /metrics endpoint; 0 disables
+    metrics_address: str = DEFAULT_METRICS_LISTEN_ADDR
+    metrics_port: int = DEFAULT_METRICS_PORT
+    # log the full latency trace of one frame in N per channel; 0 disables
+    latency_trace_interval: int = 0
+    # event loop lag heartbeat (0 disables) and blocked-loop threshold
+    loop_monitor_interval_ms: int = DEFAULT_LOOP_MONITOR_INTERVAL_MS
+    loop_slow_callback_ms: int = DEFAULT_LOOP_SLOW_CALLBACK_MS
 
     cache_path: Optional[str] = None
     devices: list[SdrDeviceConfig] = field(default_factory=list)
@@ -125,6 +175,8 @@ class ConfigManager:
         # build paths
         if not config.cache_path:
             config.cache_path = os.path.join(config.data_path, "cache/")
+        if not config.catalog_path and config.data_path:
+            config.catalog_path = os.path.join(config.data_path, "catalog.sqlite3")
 
         self.config = config
         return config
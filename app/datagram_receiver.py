@@ -0,0 +1,123 @@
+"""
+Shared UDP receiver for many RTLSDR-Airband channel streams.
+
+Instead of one asyncio DatagramProtocol per channel (one callback per
+datagram), every channel port is bound to a plain non-blocking socket
+watched by the event loop. When a socket becomes readable it is drained
+in a batch with `recvfrom_into` into a reusable buffer, so a single loop
+wakeup services every datagram that is queued on every ready port.
+
+Python does not expose recvmmsg(2); the drain loop is the portable
+equivalent and keeps the per-datagram cost to one syscall and no
+allocations.
+"""
+from .literals import DEFAULT_RECEIVE_BATCH_MAX
+from .ptt_timeout import PttStream
+
+import asyncio
+import logging
+import socket
+from typing import Callable
+
+
+logger = logging.getLogger(__name__)
+
+# larger than any datagram RTLSDR-Airband will send us
+RECEIVE_BUFFER_BYTES: int = 65536
+
+
+class ReceiverEndpoint:
+
+    port: int
+    sock: socket.socket
+    on_data: Callable
+    ptt: PttStream
+
+    buffer: bytearray
+    view: memoryview
+
+    datagrams: int
+    batches: int
+
+    def __init__(self, port: int, sock: socket.socket, on_data: Callable,
+                 ptt: PttStream):
+
+        self.port = port
+        self.sock = sock
+        self.on_data = on_data
+        self.ptt = ptt
+
+        self.buffer = bytearray(RECEIVE_BUFFER_BYTES)
+        self.view = memoryview(self.buffer)
+
+        self.datagrams = 0
+        self.batches = 0
+
+
+class SharedDatagramReceiver:
+
+    listen_addr: str
+    batch_max: int
+    endpoints: dict[int, ReceiverEndpoint]
+
+    def __init__(self, listen_addr: str,
+                 batch_max: int = DEFAULT_RECEIVE_BATCH_MAX):
+
+        self.listen_addr = listen_addr
+        self.batch_max = batch_max
+        self.endpoints = {}
+
+    def add_channel(self, port: int, on_data: Callable,
+                    ptt: PttStream) -> ReceiverEndpoint:
+        """
+        bind `port` and route its datagrams to `on_data(data, addr)`;
+        must be called from within the running event loop
+        """
+        if port in self.endpoints:
+            raise ValueError(f"udp/{port} is already registered!")
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        sock.bind((self.listen_addr, port))
+
+        endpoint = ReceiverEndpoint(port, sock, on_data, ptt)
+        self.endpoints[port] = endpoint
+
+        loop = asyncio.get_running_loop()
+        loop.add_reader(sock.fileno(), self._on_readable, endpoint)
+
+        logger.info(f"{self.__class__.__name__}; listening on udp/{port}")
+        return endpoint
+
+    def close(self):
+        loop = asyncio.get_running_loop()
+        for endpoint in self.endpoints.values():
+            loop.remove_reader(endpoint.sock.fileno())
+            endpoint.sock.close()
+        self.endpoints.clear()
+
+    def _on_readable(self, endpoint: ReceiverEndpoint):
+
+        received = 0
+        while received < self.batch_max:
+            try:
+                num_bytes, addr = endpoint.sock.recvfrom_into(endpoint.buffer)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as e:
+                logger.error(f"udp/{endpoint.port} receive error: {e}")
+                break
+
+            # the buffer is reused for the next datagram; consumers must
+            # copy what they keep (RadioChannelProcessor does)
+            endpoint.on_data(endpoint.view[:num_bytes], addr)
+            received += 1
+
+        if received == 0:
+            return
+
+        endpoint.datagrams += received
+        endpoint.batches += 1
+
+        # end-of-PTT is detected by the shared PttTimeoutMonitor sweep
+        endpoint.ptt.touch()
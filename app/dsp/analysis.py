@@ -1,7 +1,8 @@
 from .schema import SamplesSequenceSummary
 from .utils import dbfs, linear
 
-from typing import Union, Any
+from collections import deque
+from typing import Union, Any, Optional
 import logging
 
 import numpy as np
@@ -67,27 +68,115 @@ def calculate_peak_amplitude(samples: NDArray[np.float32]) -> float:
     return np.max(np.abs(samples))
 
 
-def analyze_samples(samples: NDArray, fs: int) -> SamplesSequenceSummary:
+# samples below this are silence for the thresholded RMS
+DEFAULT_SILENCE_DBFS: float = -50.
 
-    silence_dbfs = -50.
+# per-frame levels kept for metering; 10 minutes of 125 ms frames
+DEFAULT_LEVEL_HISTORY: int = 4800
 
-    num_samples = len(samples)
 
-    # convert to float32 for further processing
-    if not np.issubdtype(samples.dtype, np.floating):
-        samples = samples.astype(np.float32) / 32768.
+class LevelAccumulator:
+    """
+    Incremental level statistics of a stream.
+
+    update() folds a frame into running sum, sum of squares, peak and
+    above-threshold totals, working from a single array of squares, so a
+    SamplesSequenceSummary is available at any point without another pass
+    over the samples. The RMS of each frame is kept in `levels` for
+    metering.
+    """
+
+    fs: int
+    silence_dbfs: float
+    levels: deque
+
+    num_samples: int
+    num_active: int
+    total: float
+    total_squares: float
+    active_squares: float
+    peak_squared: float
+
+    _silence_squared: float
+
+    def __init__(self, fs: int, silence_dbfs: float = DEFAULT_SILENCE_DBFS,
+                 history: int = DEFAULT_LEVEL_HISTORY):
+
+        self.fs = fs
+        self.silence_dbfs = silence_dbfs
+        self._silence_squared = linear(silence_dbfs) ** 2
+        self.levels = deque(maxlen=history)
+
+        self.reset()
+
+    def reset(self):
+        self.num_samples = 0
+        self.num_active = 0
+        self.total = 0.
+        self.total_squares = 0.
+        self.active_squares = 0.
+        self.peak_squared = 0.
+        self.levels.clear()
+
+    def update(self, samples: NDArray) -> float:
+        """ add a frame; returns its RMS [dBFS] """
 
-    summary = SamplesSequenceSummary(
-        fs=fs,
-        num_samples=num_samples,
-        length=num_samples / fs,
-        silence_threshold=silence_dbfs
-    )
+        if not np.issubdtype(samples.dtype, np.floating):
+            samples = samples.astype(np.float32) / 32768.
 
-    summary.amplitude_peak = dbfs(calculate_peak_amplitude(samples))
-    summary.rms = calculate_rms(samples, fs=fs)
-    summary.rms_thresholded = calculate_rms(samples, silence_dbfs, fs=fs)
-    summary.dc_bias = calculate_dc_bias(samples)
+        if samples.size == 0:
+            return -np.inf
 
+        squares = np.square(samples)
+        active = squares > self._silence_squared
+
+        frame_squares = float(squares.sum())
+        self.num_samples += samples.size
+        self.num_active += int(np.count_nonzero(active))
+        self.total += float(samples.sum())
+        self.total_squares += frame_squares
+        self.active_squares += float(squares.sum(where=active))
+        self.peak_squared = max(self.peak_squared, float(squares.max()))
+
+        level = _power_dbfs(frame_squares / samples.size)
+        self.levels.append(level)
+        return level
+
+    @property
+    def last_level(self) -> Optional[float]:
+        return self.levels[-1] if self.levels else None
+
+    def summary(self) -> SamplesSequenceSummary:
+
+        summary = SamplesSequenceSummary(
+            fs=self.fs,
+            num_samples=self.num_samples,
+            length=self.num_samples / self.fs,
+            silence_length=(self.num_samples - self.num_active) / self.fs,
+            silence_threshold=self.silence_dbfs
+        )
+
+        if self.num_samples == 0:
+            return summary
+
+        summary.rms = _power_dbfs(self.total_squares / self.num_samples)
+        summary.rms_thresholded = -np.inf
+        if self.num_active:
+            summary.rms_thresholded = _power_dbfs(self.active_squares / self.num_active)
+        summary.amplitude_peak = _power_dbfs(self.peak_squared)
+        summary.dc_bias = self.total / self.num_samples
+
+        return summary
+
+
+def _power_dbfs(power: float) -> float:
+    if power <= 0:
+        return -np.inf
+    return round(10 * np.log10(power), 2)
+
+
+def analyze_samples(samples: NDArray, fs: int) -> SamplesSequenceSummary:
 
-    return summary
\ No newline at end of file
+    levels = LevelAccumulator(fs, history=0)
+    levels.update(samples)
+    return levels.summary()
@@ -0,0 +1,124 @@
+"""
+Background archival encoding of finished captures.
+
+Captures are always streamed to disk as 16-bit PCM wav while the session
+is live. Once a capture is finalized it can be re-encoded to a compact
+archival format (lossless FLAC or low-bitrate Opus in Ogg) by a process
+pool, keeping the encoder CPU load off the event loop and off the DSP
+workers. The wav is removed once the archive copy is written.
+
+Encoding uses `soundfile` (libsndfile >= 1.0.29 for Opus).
+"""
+from .schema import StreamFormat
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Callable, Optional, Union
+import asyncio
+import logging
+import os
+
+
+logger = logging.getLogger(__name__)
+
+
+# soundfile (format, subtype) per archival format
+SOUNDFILE_FORMATS: dict[StreamFormat, tuple[str, str]] = {
+    StreamFormat.FLAC: ("FLAC", "PCM_16"),
+    StreamFormat.OGG_OPUS: ("OGG", "OPUS")
+}
+
+
+def encode_capture(wav_path: str, format_value: str) -> str:
+    """
+    encode `wav_path` to the archival format and remove the wav; runs in a
+    worker process
+    """
+    import soundfile
+
+    stream_format = StreamFormat(format_value)
+    sf_format, sf_subtype = SOUNDFILE_FORMATS[stream_format]
+
+    out_path = os.path.splitext(wav_path)[0] + stream_format.extension
+    partial_path = out_path + ".part"
+
+    samples, sample_rate = soundfile.read(wav_path, dtype='int16')
+    soundfile.write(partial_path, samples, sample_rate,
+                    format=sf_format, subtype=sf_subtype)
+
+    os.replace(partial_path, out_path)
+    os.unlink(wav_path)
+
+    return out_path
+
+
+class ArchiveEncoder:
+
+    format: StreamFormat
+    executor: Optional[ProcessPoolExecutor]
+
+    # statistics
+    pending: int
+    encoded: int
+    failed: int
+
+    def __init__(self, format: StreamFormat, workers: int = 1):
+        """ workers = 0 encodes inline (blocking the caller), eg. for replay """
+
+        if format not in SOUNDFILE_FORMATS:
+            raise ValueError(f"'{format.value}' is not an archival format!")
+
+        self.format = format
+        # the node runs threads (disk I/O, loop watchdog, catalog); forking
+        # with their locks held can deadlock the workers
+        self.executor = None
+        if workers > 0:
+            self.executor = ProcessPoolExecutor(max_workers=workers,
+                                                mp_context=get_context("spawn"))
+
+        self.pending = 0
+        self.encoded = 0
+        self.failed = 0
+
+    def submit(self, wav_path: str,
+               callback: Optional[Callable[[Optional[str]], None]] = None):
+        """
+        queue `wav_path` for encoding; `callback` receives the archive path
+        (or None on failure) on the event loop
+        """
+        if self.executor is None:
+            future = Future()
+            try:
+                future.set_result(encode_capture(wav_path, self.format.value))
+            except Exception as e:
+                future.set_exception(e)
+            self.pending += 1
+            self._on_done(future, wav_path, callback)
+            return
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, encode_capture,
+                                      wav_path, self.format.value)
+        self.pending += 1
+        future.add_done_callback(
+            lambda f: self._on_done(f, wav_path, callback))
+
+    def _on_done(self, future: Union[asyncio.Future, Future], wav_path: str,
+                 callback: Optional[Callable[[Optional[str]], None]]):
+        self.pending -= 1
+
+        out_path = None
+        try:
+            out_path = future.result()
+            self.encoded += 1
+            logger.debug(f"archived {os.path.basename(out_path)}")
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"archive encoding failed ({wav_path}): {type(e)} {e}")
+
+        if callback is not None:
+            callback(out_path)
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
@@ -0,0 +1,86 @@
+"""
+Dedicated worker pool for capture file I/O.
+
+Every StreamDiskWriter submits its file operations (open, append, close)
+to its own OrderedExecutorLane on this pool, so a slow SD card or NFS
+mount stalls only the I/O workers, never the event loop. Each lane is
+bounded; when a stream falls `max_pending` operations behind, new frames
+are dropped and counted rather than queued without limit.
+"""
+from app.common.executor import OrderedExecutorLane
+from ..literals import DEFAULT_DISK_IO_WORKERS, DEFAULT_DISK_IO_MAX_PENDING
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+import os
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class DiskIoPool:
+
+    executor: Optional[ThreadPoolExecutor]
+    max_pending: int
+    lanes: list[OrderedExecutorLane]
+
+    # directories known to exist (eg. data_store/<channel>/YYYY/M/D)
+    _dirs: set[str]
+
+    # backpressure / throughput statistics
+    frames_dropped: int
+    writes: int
+    bytes_written: int
+    write_latency_last: float
+    write_latency_max: float
+    write_latency_total: float
+
+    def __init__(self, workers: int = DEFAULT_DISK_IO_WORKERS,
+                 max_pending: int = DEFAULT_DISK_IO_MAX_PENDING):
+        """ workers = 0 performs I/O inline (blocking the caller) """
+
+        self.executor = None
+        if workers > 0:
+            self.executor = ThreadPoolExecutor(max_workers=workers,
+                                               thread_name_prefix="disk-io")
+        self.max_pending = max_pending
+        self.lanes = []
+        self._dirs = set()
+
+        self.frames_dropped = 0
+        self.writes = 0
+        self.bytes_written = 0
+        self.write_latency_last = 0.
+        self.write_latency_max = 0.
+        self.write_latency_total = 0.
+
+    def lane(self, name: str) -> OrderedExecutorLane:
+        lane = OrderedExecutorLane(self.executor, name=name)
+        self.lanes.append(lane)
+        return lane
+
+    @property
+    def pending(self) -> int:
+        """ I/O operations queued or in flight across all streams """
+        return sum(lane.depth for lane in self.lanes)
+
+    def ensure_dir(self, path: str):
+        """ runs on an I/O worker """
+        if path in self._dirs:
+            return
+        os.makedirs(path, exist_ok=True)
+        self._dirs.add(path)
+
+    def record_write(self, num_bytes: int, latency: float):
+        """ runs on the event loop (lane callback) """
+        self.writes += 1
+        self.bytes_written += num_bytes
+        self.write_latency_last = latency
+        self.write_latency_total += latency
+        if latency > self.write_latency_max:
+            self.write_latency_max = latency
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
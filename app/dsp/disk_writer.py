@@ -7,29 +7,48 @@ There will be one or more different "streams" that must be written to disk
   - folder path checks per write
   - date-based path
 
+## streaming writes
+  - files are opened at session start and pcm is appended per frame;
+    memory no longer grows with transmission length
+  - written as {name}.wav.part and renamed on finish, so readers never
+    see a partial capture
+  - all file operations run in order on a DiskIoPool lane, off the loop
+
+## segments
+  - a capture longer than `max_segment_secs` (eg. a stuck carrier) is
+    closed and continued in numbered files, {name}_001.wav, ...
+
+## catalog
+  - finished captures (after archival encoding, if any) are recorded in
+    the CaptureCatalog with their length and RMS/peak level
+
 """
 from .frame import Frame
-
-from typing import Optional, Union
-from datetime import datetime
-from asyncio import Queue
-import asyncio
-import copy
+from .disk_io import DiskIoPool
+from .schema import StreamFormat, StreamCapture
+from .archive import ArchiveEncoder
+from .analysis import LevelAccumulator
+from app.common.executor import OrderedExecutorLane
+from app.catalog import CaptureRecord, CatalogWriter
+from app.metrics import ChannelMetrics
+
+from typing import Callable, Optional, Union
+from datetime import datetime, timedelta
+from time import perf_counter, monotonic
 import os
 import logging
-from enum import Enum
+import wave
 
 import numpy as np
-from numpy import ndarray
-
-from scipy.io import wavfile
 
 
 logger = logging.getLogger(__name__)
 
 
-class StreamFormat(Enum):
-    WAV_PCM_16LE = "wav.pcm_16le"
+PARTIAL_SUFFIX: str = ".part"
+
+# at most one warning per capture in this interval while frames are dropped
+DROP_LOG_INTERVAL_SECS: float = 10.
 
 
 # Produce disk-copies of a channel at a particular point in processing/filtering
@@ -38,63 +57,203 @@ class StreamDiskWriter:
 
     write_path: str
     sampling_rate: int
-    frames: Queue[Frame]
     num_samples: int
     num_frames: int
     _id: str
     timestamp: datetime
     format: StreamFormat
+    segment: int
+    # secs of the capture before `timestamp` (pre-roll)
+    preroll_secs: float
+
+    # frame bytes queued on the I/O lane
+    pending_bytes: int
+    # frames of the current capture dropped on a full I/O lane
+    frames_dropped: int
+    channel_id: Optional[str]
+    filename: Optional[str]
+    _drop_logged: Optional[float]
+
+    io: DiskIoPool
+    lane: OrderedExecutorLane
+    metrics: Optional[ChannelMetrics]
+
+    # owned by the I/O lane
+    file_path: Optional[str]
+    _wav: Optional[wave.Wave_write]
+    _samples_written: int
+    _levels: LevelAccumulator
+    _started: Optional[datetime]
+    _preroll_secs: float
 
     def __init__(self, id: str, sample_rate: int, write_path: str,
-                 format: StreamFormat = StreamFormat.WAV_PCM_16LE):
+                 format: StreamFormat = StreamFormat.WAV_PCM_16LE,
+                 io: Optional[DiskIoPool] = None,
+                 metrics: Optional[ChannelMetrics] = None,
+                 channel_id: Optional[str] = None):
 
         self.sampling_rate = sample_rate
         self.write_path = write_path
         self._id = id
         self.format = format
 
-        self.frames = Queue()
+        self.io = io or DiskIoPool(workers=0)
+        self.lane = self.io.lane(f"disk:{os.path.basename(write_path or '')}{self.variant}")
+        self.metrics = metrics
+
+        self.num_samples = 0
+        self.num_frames = 0
+        self.segment = 0
+        self.preroll_secs = 0.
+        self.pending_bytes = 0
+        self.frames_dropped = 0
+        self.channel_id = channel_id
+        self.filename = None
+        self._drop_logged = None
+
+        self.file_path = None
+        self._wav = None
+        self._samples_written = 0
+        self._levels = LevelAccumulator(sample_rate, history=0)
+        self._started = None
+        self._preroll_secs = 0.
+
+    def start(self, timestamp: datetime, path: str, filename: str,
+              segment: int = 0, preroll_secs: float = 0.):
+        """
+        open the capture file; the RIFF header is patched on finish().
+        The first `preroll_secs` of audio precede `timestamp`
+        """
+        self.timestamp = timestamp
+        self.segment = segment
+        self.preroll_secs = preroll_secs
         self.num_samples = 0
         self.num_frames = 0
+        self.frames_dropped = 0
+        self.filename = filename
+        self._drop_logged = None
+
+        self.lane.submit(self._open, (path, filename, timestamp, preroll_secs))
 
     def add_frame(self, frame: Frame):
+
+        # bounded backlog; a stalled disk must not grow memory
+        if self.lane.depth >= self.io.max_pending:
+            self.io.frames_dropped += 1
+            self.frames_dropped += 1
+            now = monotonic()
+            if self._drop_logged is None or now - self._drop_logged >= DROP_LOG_INTERVAL_SECS:
+                self._drop_logged = now
+                logger.warning(f"channel id={self.channel_id} disk backlog full; dropping "
+                               f"frames of {self.filename} ({self.frames_dropped} so far)")
+            return
+
+        num_bytes = frame.samples.nbytes
         self.num_samples += frame.samples.size
         self.num_frames += 1
-        # create deep copy of frame
-        self.frames.put_nowait(copy.deepcopy(frame))
-        # logger.debug(f"added {frame.samples.size} frames; total = {self.num_frames}")
-
-    def start(self, timestamp: datetime):
-        self.timestamp = timestamp
+        self.pending_bytes += num_bytes
+        self.lane.submit(self._write, (frame.samples,),
+                         lambda result: self._on_written(result, num_bytes))
+
+    def finish(self, minimum_secs: float = 0.,
+               callback: Optional[Callable[[Optional[StreamCapture]], None]] = None):
+        """
+        finalize the capture; `callback` receives the StreamCapture, or None
+        if the stream was discarded (shorter than `minimum_secs`) or failed
+        """
+        if self.frames_dropped > 0:
+            logger.warning(f"channel id={self.channel_id} {self.filename} is missing "
+                           f"{self.frames_dropped} frames dropped on a full disk backlog")
+        self.lane.submit(self._finish, (minimum_secs, self.frames_dropped), callback)
+
+    def _on_written(self, result: Optional[tuple[int, float]], num_bytes: int):
+        self.pending_bytes -= num_bytes
+        if result is None:
+            return
+        self.io.record_write(*result)
+        if self.metrics is not None:
+            written, latency = result
+            self.metrics.disk_bytes_written.inc(written)
+            self.metrics.disk_write_latency.observe(latency)
+
+    # -- I/O lane; must not touch the event loop --
+
+    def _open(self, path: str, filename: str, timestamp: datetime,
+              preroll_secs: float):
+        self._samples_written = 0
+        self._levels.reset()
+        self._started = timestamp
+        self._preroll_secs = preroll_secs
+        self.file_path = os.path.join(path, filename)
+        try:
+            self.io.ensure_dir(path)
+            wav = wave.open(self.file_path + PARTIAL_SUFFIX, "wb")
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(int(self.sampling_rate))
+            self._wav = wav
+        except Exception as e:
+            logger.error(f"error opening wav ({self.file_path}): {e}")
+            self._wav = None
 
-    async def write(self, path: str, filename: str):
+    def _write(self, samples) -> Optional[tuple[int, float]]:
+        if self._wav is None:
+            return None
 
-        # Copy samples before sending off to async task
-        index = 0
-        samples = np.zeros(self.num_samples, np.float32)
-        while not self.frames.empty():
-            frame = self.frames.get_nowait()
-            next_index = index + frame.samples.size
-            samples[index:next_index] = frame.samples
-            index = next_index
+        started = perf_counter()
 
-        # reflect our clearing
-        self.num_samples = 0
-        self.num_frames = 0
+        # convert to PCM S16 LE (s16l)
+        pcm_data = np.int16(samples * 32767.).tobytes()
 
         try:
-            self.write_wav(os.path.join(path,filename), samples)
-            logger.debug(f"wrote stream [{self.variant}]: {filename}")
+            self._wav.writeframesraw(pcm_data)
         except Exception as e:
-            logger.error(f"error writing wav: {e}")
+            logger.error(f"error writing wav ({self.file_path}): {e}")
+            return None
 
-    def write_wav(self, filename: str, samples: ndarray):
+        # level statistics for the catalog
+        self._samples_written += samples.size
+        self._levels.update(samples)
 
-        # convert to PCM S16 LE (s16l)
-        pcm_data = np.int16(samples * 32767.)
+        return len(pcm_data), perf_counter() - started
 
-        out_path = os.path.join(self.write_path, filename)
-        wavfile.write(out_path, self.sampling_rate, pcm_data)
+    def _finish(self, minimum_secs: float, frames_dropped: int) -> Optional[StreamCapture]:
+        if self._wav is None:
+            return None
+
+        partial_path = self.file_path + PARTIAL_SUFFIX
+        try:
+            self._wav.close()
+        except Exception as e:
+            logger.error(f"error closing wav ({self.file_path}): {e}")
+            return None
+        finally:
+            self._wav = None
+
+        # the pre-roll (and its silent gap) is not part of the transmission
+        live_samples = self._samples_written - round(self._preroll_secs * self.sampling_rate)
+        length_secs = max(live_samples, 0) / self.sampling_rate
+        try:
+            if length_secs < minimum_secs:
+                logger.info(f"stream of {round(length_secs, 1)} secs ignored")
+                os.unlink(partial_path)
+                return None
+
+            os.replace(partial_path, self.file_path)
+        except Exception as e:
+            logger.error(f"error finishing wav ({self.file_path}): {e}")
+            return None
+
+        logger.debug(f"wrote stream [{self.variant}]: {os.path.basename(self.file_path)}")
+        return StreamCapture(
+            file_path=self.file_path,
+            start_time=self._started,
+            sample_rate=int(self.sampling_rate),
+            num_samples=self._samples_written,
+            levels=self._levels.summary(),
+            preroll_secs=self._preroll_secs,
+            frames_dropped=frames_dropped
+        )
 
     @property
     def stream_length_secs(self) -> float:
@@ -117,25 +276,51 @@ class ChannelDiskWriter:
     start_time: Union[datetime, None]
 
     minimum_record_secs: float
+    max_segment_secs: float
+
+    io: Optional[DiskIoPool]
+    archive: Optional[ArchiveEncoder]
+    catalog: Optional[CatalogWriter]
+    freq: Optional[float]
+    metrics: Optional[ChannelMetrics]
 
     # filename pattern: {channel.id}_{YYYYMMDDTHHMMSS.ZZZ}.wav
+    _folder_path: Optional[str]
+    _timestring: Optional[str]
 
     def __init__(self, channel_id: str, data_store: str,
-                 sample_rate: float, minimum_record_secs: float):
+                 sample_rate: float, minimum_record_secs: float,
+                 io: Optional[DiskIoPool] = None,
+                 archive: Optional[ArchiveEncoder] = None,
+                 catalog: Optional[CatalogWriter] = None,
+                 freq: Optional[float] = None,
+                 max_segment_secs: float = 0.,
+                 metrics: Optional[ChannelMetrics] = None):
         self.channel_id = channel_id
         self.data_store = data_store
         self.sample_rate = sample_rate
         self.minimum_record_secs = minimum_record_secs
+        self.max_segment_secs = max_segment_secs
+        self.io = io
+        self.archive = archive
+        self.catalog = catalog
+        self.freq = freq
+        self.metrics = metrics
 
         self.writers = {}
         self.start_time = None
+        self._folder_path = None
+        self._timestring = None
 
     def add_stream_writer(self, id: Optional[str] = None) -> StreamDiskWriter:
 
         stream = StreamDiskWriter(
             sample_rate=self.sample_rate,
             write_path=self.data_store,
-            id=id
+            id=id,
+            io=self.io,
+            metrics=self.metrics,
+            channel_id=self.channel_id
         )
 
         self.writers[id] = stream
@@ -147,54 +332,112 @@ class ChannelDiskWriter:
         if not writer_id in self.writers:
             raise ValueError(f"disk_writer '{writer_id}' does not exist!")
 
-        self.writers[writer_id].add_frame(frame)
+        stream = self.writers[writer_id]
+        if self.max_segment_secs > 0 and \
+                stream.stream_length_secs >= self.max_segment_secs:
+            self._roll_segment(stream)
+
+        stream.add_frame(frame)
 
-    def start_event(self, start_time: datetime):
+    def start_event(self, start_time: datetime, preroll_secs: float = 0.):
+        """ captures are named for `start_time`; `preroll_secs` of audio precede it """
         self.start_time = start_time
-        for writer in self.writers.values():
-            writer.start(start_time)
+
+        # folder path, eg. data_store/2024/03/10/; created by the I/O lane
+        folder_path = os.path.join(
+            self.data_store,
+            str(start_time.year),
+            str(start_time.month),
+            str(start_time.day)
+        )
+
+        self._folder_path = folder_path
+        self._timestring = start_time.strftime('%Y%m%dT%H%M%S')
+        for stream in self.writers.values():
+            stream.start(start_time, folder_path, self._filename(stream, 0),
+                         preroll_secs=preroll_secs)
 
     def finish_event(self):
-        asyncio.create_task(self._do_writes(self.start_time))
+        for stream in self.writers.values():
+            # the tail of a segmented capture is kept whatever its length
+            minimum_secs = self.minimum_record_secs if stream.segment == 0 else 0.
+            stream.finish(minimum_secs, self._on_stream_finished)
 
-    def build_manifest(self, start_time: datetime):
-        pass
+        logger.info(f"done writes for {self.channel_id}")
 
+    @property
+    def pending_bytes(self) -> int:
+        return sum(stream.pending_bytes for stream in self.writers.values())
 
-    # create required number of async tasks
-    # pass start_time now as we cannot guarantee lifetime
-    async def _do_writes(self, start_time: datetime):
+    def _filename(self, stream: StreamDiskWriter, segment: int) -> str:
+        if segment == 0:
+            return f"{self.channel_id}_{self._timestring}{stream.variant}.wav"
+        return f"{self.channel_id}_{self._timestring}{stream.variant}_{segment:03d}.wav"
 
-        # write streams
-        stream: StreamDiskWriter
-        for stream in self.writers.values():
+    def _roll_segment(self, stream: StreamDiskWriter):
+        """ close the current segment and continue in the next file """
+        segment = stream.segment + 1
+        timestamp = stream.timestamp + timedelta(
+            seconds=stream.stream_length_secs - stream.preroll_secs)
 
-            # determine if length of samples meets minimum for writing
-            if stream.stream_length_secs < self.minimum_record_secs:
-                logger.info(f"stream of {round(stream.stream_length_secs, 1)} secs ignored")
-                continue
-
-            # Build filename
-            timestring = start_time.strftime('%Y%m%dT%H%M%S')
-            filename = f"{self.channel_id}_{timestring}{stream.variant}.wav"
-
-            folder_path = os.path.join(
-                self.data_store,
-                str(start_time.year),
-                str(start_time.month),
-                str(start_time.day)
-            )
-
-            # check/create path
-            try:
-                if not os.path.exists(folder_path):
-                    os.makedirs(folder_path, exist_ok=True)
-            except Exception as e:
-                logger.error(f"exception ({type(e)}): {e}")
-                continue
-
-            # folder path, eg. data_store/2024/03/10/
-            await stream.write(folder_path, filename)
-
-        # write manifest
-        logger.info(f"done writes for {self.channel_id}")
+        logger.info(f"{self.channel_id} capture exceeds {self.max_segment_secs} secs;"
+                    f" continuing in segment {segment}")
+
+        stream.finish(0., self._on_stream_finished)
+        stream.start(timestamp, self._folder_path, self._filename(stream, segment),
+                     segment=segment)
+
+    @property
+    def frames_dropped(self) -> int:
+        return self.io.frames_dropped if self.io else 0
+
+    def _on_stream_finished(self, capture: Optional[StreamCapture]):
+        if capture is None:
+            return
+
+        if self.archive is None:
+            self._add_to_catalog(capture, capture.file_path,
+                                 StreamFormat.WAV_PCM_16LE)
+            return
+
+        # catalog the archived file once it replaces the wav
+        self.archive.submit(capture.file_path,
+                            lambda path: self._on_archived(capture, path))
+
+    def _on_archived(self, capture: StreamCapture, path: Optional[str]):
+        if path is None:
+            # encoding failed; the wav is left in place
+            if os.path.exists(capture.file_path):
+                self._add_to_catalog(capture, capture.file_path,
+                                     StreamFormat.WAV_PCM_16LE)
+            return
+        self._add_to_catalog(capture, path, self.archive.format)
+
+    def _add_to_catalog(self, capture: StreamCapture, path: str,
+                        format: StreamFormat):
+        if self.catalog is None:
+            return
+        self.catalog.add(self.build_manifest(capture, path, format))
+
+    def build_manifest(self, capture: StreamCapture, path: str,
+                       format: StreamFormat) -> CaptureRecord:
+
+        # silent captures have no meaningful level
+        rms, peak = capture.levels.rms, capture.levels.amplitude_peak
+        rms = rms if rms is not None and np.isfinite(rms) else None
+        peak = peak if peak is not None and np.isfinite(peak) else None
+
+        return CaptureRecord(
+            channel_id=self.channel_id,
+            freq=self.freq,
+            start_time=capture.start_time,
+            duration=capture.length_secs,
+            sample_count=capture.num_samples,
+            sample_rate=capture.sample_rate,
+            rms=rms,
+            peak=peak,
+            path=path,
+            format=format.value,
+            preroll_secs=capture.preroll_secs,
+            frames_dropped=capture.frames_dropped
+        )
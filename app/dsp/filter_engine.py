@@ -0,0 +1,164 @@
+"""
+Batched filtering across channels.
+
+Frames submitted during one event loop iteration are held until the next
+iteration and then filtered together: frames from every channel sharing
+a filter design are stacked into one 2-D array and run through a single
+sosfilt call with the stacked per-channel state of a StreamingFilterBank.
+RTLSDR-Airband emits datagrams for all channels of a device in bursts, so
+most frames of a tick end up in the same batch.
+
+With an executor, the filtering itself runs on a worker (numpy/scipy
+release the GIL); batches are processed one at a time and in order.
+"""
+from .filters import StreamingFilterBank, design_sos
+from .frame import Frame
+from app.common.executor import OrderedExecutorLane
+
+from concurrent.futures import Executor
+import asyncio
+import logging
+from typing import Callable, Optional
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+class FilterEngineChannel:
+
+    bank: StreamingFilterBank
+    slot: int
+    on_filtered: Callable[[Frame], None]
+    session_id: Optional[int]
+
+    def __init__(self, bank: StreamingFilterBank, slot: int,
+                 on_filtered: Callable[[Frame], None]):
+        self.bank = bank
+        self.slot = slot
+        self.on_filtered = on_filtered
+        self.session_id = None
+
+
+class BatchedFilterEngine:
+
+    banks: dict[tuple, StreamingFilterBank]
+    lane: OrderedExecutorLane
+
+    _pending: list[tuple[FilterEngineChannel, Frame]]
+    _flush_handle: Optional[asyncio.Handle]
+
+    # statistics
+    batches: int
+    frames_filtered: int
+
+    def __init__(self, executor: Optional[Executor] = None):
+        self.banks = {}
+        self.lane = OrderedExecutorLane(executor, name="filter_engine")
+        self._pending = []
+        self._flush_handle = None
+
+        self.batches = 0
+        self.frames_filtered = 0
+
+    def register(self, design: tuple,
+                 on_filtered: Callable[[Frame], None]) -> FilterEngineChannel:
+        """
+        add a channel using `design` (see StreamingFilter.design); filtered
+        frames are passed to `on_filtered` in submission order
+        """
+        bank = self.banks.get(design)
+        if bank is None:
+            bank = StreamingFilterBank(design_sos(*design))
+            self.banks[design] = bank
+
+        return FilterEngineChannel(bank, bank.add_channel(), on_filtered)
+
+    def submit(self, channel: FilterEngineChannel, frame: Frame):
+        self._pending.append((channel, frame))
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_soon(self.flush)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def reset(self, channel: FilterEngineChannel):
+        # frames already submitted belong to the state being reset
+        self.flush()
+        self.lane.submit(self._reset_channel, (channel,))
+
+    def _reset_channel(self, channel: FilterEngineChannel):
+        channel.bank.reset(channel.slot)
+        channel.session_id = None
+
+    def flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        if not self._pending:
+            return
+
+        pending = self._pending
+        self._pending = []
+
+        # a channel may appear more than once if it fell behind; batch in
+        # rounds so each channel's frames are filtered in order
+        rounds = []
+        while pending:
+            batch: dict[int, tuple[FilterEngineChannel, Frame]] = {}
+            deferred = []
+            for item in pending:
+                channel, frame = item
+                key = id(channel)
+                if key in batch:
+                    deferred.append(item)
+                else:
+                    batch[key] = item
+            rounds.append(self._prepare_batch(list(batch.values())))
+            pending = deferred
+
+        self.lane.submit(self._filter_rounds, (rounds,), self._deliver)
+
+    def _prepare_batch(self, items: list[tuple[FilterEngineChannel, Frame]]) -> list:
+        """
+        group by bank and frame length (only equal shapes can be stacked)
+        and stack each group; stacking copies, so the frames no longer
+        reference receive buffers once this returns
+        """
+        groups: dict[tuple, list[tuple[FilterEngineChannel, Frame]]] = {}
+        for item in items:
+            channel, frame = item
+            groups.setdefault((id(channel.bank), frame.samples.size), []).append(item)
+
+        return [(group, np.stack([frame.samples for _, frame in group]))
+                for group in groups.values()]
+
+    def _filter_rounds(self, rounds: list) -> list:
+        """ runs on the engine lane; owns all filter bank state """
+        results = []
+        for groups in rounds:
+            for group, block in groups:
+                # new session on a channel -> start from fresh filter state
+                for channel, frame in group:
+                    if frame.session_id != channel.session_id:
+                        channel.bank.reset(channel.slot)
+                        channel.session_id = frame.session_id
+
+                bank = group[0][0].bank
+                slots = [channel.slot for channel, _ in group]
+                filtered = bank.filter_many(slots, block)
+                results.extend(zip(group, filtered))
+        return results
+
+    def _deliver(self, results: list):
+        self.batches += 1
+        for (channel, frame), samples in results:
+            frame.samples = samples
+            self.frames_filtered += 1
+            try:
+                channel.on_filtered(frame)
+            except Exception as e:
+                logger.error(f"on_filtered error: {type(e)} {e}")
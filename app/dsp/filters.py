@@ -1,8 +1,10 @@
 from typing import Union, Optional
 from enum import Enum
+from functools import lru_cache
 
 from scipy.signal import iirnotch, sosfilt, sosfilt_zi, butter, filtfilt, tf2sos  # lfilter
 from scipy.signal import butter, filtfilt
+import numpy as np
 from numpy import ndarray
 
 
@@ -10,6 +12,43 @@ class FilterType(Enum):
     HIGHPASS = 0
     LOWPASS = 1
     NOTCH = 2
+    # highpass and lowpass sections fused into one cascade; freq=(low, high)
+    BANDPASS = 3
+
+
+FilterFreq = Union[float, tuple[float, float]]
+
+
+@lru_cache(maxsize=None)
+def design_sos(filter_type: FilterType, order: Optional[int],
+               freq: FilterFreq, sampling_freq: int) -> ndarray:
+    """
+    Design second-order sections once per (type, order, freq, fs) for the
+    whole process; channels with identical filters share the same
+    coefficient array, so it must not be modified in place.
+    """
+    nyquist = sampling_freq / 2
+
+    if filter_type == FilterType.HIGHPASS:
+        sos = butter(order, freq / nyquist, btype='highpass', output='sos')
+    elif filter_type == FilterType.LOWPASS:
+        sos = butter(order, freq / nyquist, btype='lowpass', output='sos')
+    elif filter_type == FilterType.BANDPASS:
+        low, high = freq
+        sos = np.vstack([
+            design_sos(FilterType.HIGHPASS, order, low, sampling_freq),
+            design_sos(FilterType.LOWPASS, order, high, sampling_freq)
+        ])
+    elif filter_type == FilterType.NOTCH:
+        Q = 30
+        # normalized scalar that must satisfy 0 < w0 < 1,
+        # with w0 = 1 corresponding to half of the sampling frequency
+        b, a = iirnotch(w0=freq / nyquist, Q=Q)
+        sos = tf2sos(b, a)
+    else:
+        raise ValueError(f"no filter design written for {filter_type}")
+
+    return sos
 
 class StreamingFilter:
 
@@ -17,46 +56,27 @@ class StreamingFilter:
     sampling_freq: int
     zi: Union[ndarray, None]
     order: Optional[int]
-    freq: Optional[float]
+    freq: Optional[FilterFreq]
     sos: Optional[ndarray]
 
     def __init__(self, filter_type: FilterType, sampling_freq: int,
                  order: Optional[int] = None,
-                 freq: Optional[float] = None):
+                 freq: Optional[FilterFreq] = None):
 
         self.filter_type = filter_type
         self.order = order
-        self.freq = freq
+        self.freq = tuple(freq) if isinstance(freq, (list, tuple)) else freq
         self.sampling_freq = sampling_freq
         self.zi = None
-        self.sos = None
 
-        if filter_type == FilterType.HIGHPASS:
-            self._init_highpass()
-        elif filter_type == FilterType.LOWPASS:
-            self._init_lowpass()
-        elif filter_type == FilterType.NOTCH:
-            self._init_notch()
-        else:
-            raise ValueError(f"no filter init method written for {filter_type}")
+        # shared across all filters of identical design
+        self.sos = design_sos(filter_type, order, self.freq, sampling_freq)
 
         self.reset()
 
-    def _init_highpass(self):
-        Wn = self.freq / (self.sampling_freq / 2)  # Normalize the frequency
-        self.sos = butter(self.order, Wn, btype='highpass', output='sos')
-
-    def _init_lowpass(self):
-        Wn = self.freq / (self.sampling_freq / 2)  # Normalize the frequency
-        self.sos = butter(self.order, Wn, btype='lowpass', output='sos')
-
-    def _init_notch(self):
-        Q = 30
-        w0 = self.freq/(self.sampling_freq/2)
-        # normalized scalar that must satisfy 0 < w0 < 1,
-        # with w0 = 1 corresponding to half of the sampling frequency
-        b, a = iirnotch(w0=w0, Q=Q)
-        self.sos = tf2sos(b, a)
+    @property
+    def design(self) -> tuple:
+        return (self.filter_type, self.order, self.freq, self.sampling_freq)
 
     def filter(self, samples: ndarray) -> ndarray:
         filtered, self.zi = sosfilt(self.sos, samples, zi=self.zi)
@@ -66,3 +86,46 @@ class StreamingFilter:
         initial_input_value = 0
         self.zi = sosfilt_zi(self.sos) * initial_input_value
 
+
+
+class StreamingFilterBank:
+    """
+    One filter design applied to many independent channel streams.
+
+    State is stacked as zi[section, channel, 2] so frames from several
+    channels can be filtered with a single 2-D sosfilt call while each
+    channel keeps (and resets) its own state.
+    """
+
+    sos: ndarray
+    zi: ndarray
+    num_channels: int
+
+    def __init__(self, sos: ndarray):
+        self.sos = sos
+        self.num_channels = 0
+        self.zi = np.zeros((sos.shape[0], 0, 2))
+
+    def add_channel(self) -> int:
+        slot = self.num_channels
+        self.zi = np.concatenate(
+            [self.zi, np.zeros((self.sos.shape[0], 1, 2))], axis=1)
+        self.num_channels += 1
+        return slot
+
+    def reset(self, slot: int):
+        self.zi[:, slot, :] = 0.
+
+    def filter(self, slot: int, samples: ndarray) -> ndarray:
+        filtered, self.zi[:, slot, :] = sosfilt(self.sos, samples,
+                                                zi=self.zi[:, slot, :])
+        return filtered
+
+    def filter_many(self, slots: list[int], block: ndarray) -> ndarray:
+        """
+        filter block[i] with the state of channel slots[i]; slots must be
+        unique and block shaped (len(slots), num_samples)
+        """
+        filtered, self.zi[:, slots, :] = sosfilt(self.sos, block, axis=-1,
+                                                 zi=self.zi[:, slots, :])
+        return filtered
@@ -1,17 +1,56 @@
 from numpy import ndarray
 
+from enum import IntEnum
+from time import perf_counter
+from typing import Optional
+import math
+
+
+class Stage(IntEnum):
+    """ points a frame passes on its way from the datagram to mumble """
+    RECEIVED = 0
+    FILTERED = 1
+    RESAMPLED = 2
+    ENCODED = 3
+    DISK = 4        # handed to the disk writer
+    QUEUED = 5      # queued for a mumble output
+    SENT = 6        # passed to pymumble (add_sound)
+
+
+class FrameTrace:
+    """ perf_counter() stamps per Stage; nan where a stage was not reached """
+
+    __slots__ = ("stamps",)
+
+    stamps: list[float]
+
+    def __init__(self, stamps: Optional[list[float]] = None):
+        self.stamps = stamps if stamps is not None else [math.nan] * len(Stage)
+
+    def mark(self, stage: Stage, when: Optional[float] = None):
+        self.stamps[stage] = perf_counter() if when is None else when
+
+    def since_received(self, stage: Stage) -> float:
+        return self.stamps[stage] - self.stamps[Stage.RECEIVED]
+
+    def copy(self) -> "FrameTrace":
+        return FrameTrace(list(self.stamps))
+
 
 class Frame:
 
     session_id: int
     samples: ndarray
     sample_rate: int
+    trace: Optional[FrameTrace]
 
-    def __init__(self, session_id: int, fs: int, samples: ndarray):
+    def __init__(self, session_id: int, fs: int, samples: ndarray,
+                 trace: Optional[FrameTrace] = None):
         self.session_id = session_id
         self.sample_rate = fs
         self.samples = samples
+        self.trace = trace
 
     @property
     def num_samples(self) -> int:
-        return len(self.samples)
\ No newline at end of file
+        return len(self.samples)
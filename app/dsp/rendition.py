@@ -0,0 +1,74 @@
+from .frame import Frame
+from .resampling import StreamResampler, ResampleQuality, DEFAULT_RESAMPLE_QUALITY
+
+from typing import Optional
+from time import perf_counter
+import logging
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+# (sample_rate, resample_quality) of a pcm s16le output
+OutputFormat = tuple[int, ResampleQuality]
+
+
+class PcmRendition:
+    """
+    One output format of a channel: resampled (if required) and encoded as
+    pcm s16le once per frame, then shared by every output using the
+    format. Resampler state follows the channel session.
+    """
+
+    sample_rate: int
+    quality: ResampleQuality
+    resampler: Optional[StreamResampler]
+    last_session_id: Optional[int]
+
+    # time spent on the last frame rendered
+    resample_secs: float
+    encode_secs: float
+
+    def __init__(self, sample_rate: int,
+                 quality: ResampleQuality = DEFAULT_RESAMPLE_QUALITY):
+        self.sample_rate = sample_rate
+        self.quality = quality
+        self.resampler = None
+        self.last_session_id = None
+        self.resample_secs = 0.
+        self.encode_secs = 0.
+
+    @property
+    def format(self) -> OutputFormat:
+        return (self.sample_rate, self.quality)
+
+    def render(self, frame: Frame) -> bytes:
+        """
+        does not modify `frame`; does not touch the event loop so it may run
+        on a DSP worker
+        """
+        samples = frame.samples
+        started = perf_counter()
+
+        if frame.sample_rate != self.sample_rate:
+            if self.resampler is None or self.resampler.rate_in != frame.sample_rate:
+                self.resampler = StreamResampler(frame.sample_rate, self.sample_rate,
+                                                 quality=self.quality)
+
+            if frame.session_id != self.last_session_id:
+                self.resampler.reset()
+                logger.debug(f"new channel session_id '{frame.session_id}' - resetting!")
+
+            samples = self.resampler.process(samples)
+
+        self.last_session_id = frame.session_id
+        resampled = perf_counter()
+
+        # ensure output is pcm s16le
+        pcm = np.int16(samples * 32767.).tobytes()
+
+        self.resample_secs = resampled - started
+        self.encode_secs = perf_counter() - resampled
+        return pcm
@@ -1,28 +1,125 @@
 from samplerate import Resampler
+from scipy.signal import firwin
+import numpy as np
 from numpy import ndarray
+from numpy.lib.stride_tricks import sliding_window_view
+
+from enum import Enum
+from math import gcd
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class ResampleQuality(Enum):
+    # vectorized polyphase FIR; rational ratios with small factors only
+    POLYPHASE = "polyphase"
+    # libsamplerate converters; sinc_best is the reference
+    SINC_FASTEST = "sinc_fastest"
+    SINC_MEDIUM = "sinc_medium"
+    SINC_BEST = "sinc_best"
+
+
+# polyphase is opt-in (mumble `resample_quality`)
+DEFAULT_RESAMPLE_QUALITY: ResampleQuality = ResampleQuality.SINC_BEST
+
+# larger up/down factors fall back to libsamplerate
+POLYPHASE_MAX_FACTOR: int = 16
+POLYPHASE_TAPS_PER_PHASE: int = 24
+POLYPHASE_KAISER_BETA: float = 8.0
+
+
+class PolyphaseResampler:
+    """
+    Streaming rational resampler (up/down) using a polyphase FIR.
+
+    Each input sample produces `up` outputs, one per filter phase, computed
+    for the whole frame with a single matrix product over a sliding window
+    of the input. The last (taps_per_phase - 1) input samples and the
+    decimation phase are carried across frames.
+    """
+
+    up: int
+    down: int
+    taps_per_phase: int
+
+    _phases: ndarray
+    _history: ndarray
+    _offset: int
+
+    def __init__(self, up: int, down: int,
+                 taps_per_phase: int = POLYPHASE_TAPS_PER_PHASE):
+
+        self.up = up
+        self.down = down
+        self.taps_per_phase = taps_per_phase
+
+        # anti-imaging/anti-aliasing lowpass at the upsampled rate
+        num_taps = up * taps_per_phase
+        cutoff = 0.9 / max(up, down)
+        h = firwin(num_taps, cutoff, window=('kaiser', POLYPHASE_KAISER_BETA)) * up
+
+        # phase p uses h[p], h[p + up], ...; reversed for the window product
+        self._phases = np.ascontiguousarray(
+            h.reshape(taps_per_phase, up).T[:, ::-1], dtype=np.float32)
+
+        self.reset()
+
+    def process(self, samples: ndarray) -> ndarray:
+        ext = np.concatenate((self._history, samples.astype(np.float32, copy=False)))
+        self._history = ext[ext.size - (self.taps_per_phase - 1):]
+
+        windows = sliding_window_view(ext, self.taps_per_phase)
+        resampled = (windows @ self._phases.T).ravel()
+
+        if self.down > 1:
+            resampled = resampled[self._offset::self.down]
+            self._offset = (self._offset - samples.size * self.up) % self.down
+
+        return resampled
+
+    def reset(self):
+        self._history = np.zeros(self.taps_per_phase - 1, dtype=np.float32)
+        self._offset = 0
+
 
 class StreamResampler:
 
     rate_in: int
     rate_out: int
     ratio: float
+    quality: ResampleQuality
 
-    _resampler: Resampler
+    _resampler: object
 
-    def __init__(self, rate_in: int, rate_out: int):
+    def __init__(self, rate_in: int, rate_out: int,
+                 quality: ResampleQuality = DEFAULT_RESAMPLE_QUALITY):
 
         self.rate_in = rate_in
         self.rate_out = rate_out
 
         self.ratio = self.rate_out / self.rate_in
 
-        converter = 'sinc_best'
-        self._resampler = Resampler(converter, channels=1)
+        if quality == ResampleQuality.POLYPHASE:
+            divisor = gcd(rate_in, rate_out)
+            up, down = rate_out // divisor, rate_in // divisor
+            if max(up, down) <= POLYPHASE_MAX_FACTOR:
+                self.quality = quality
+                self._resampler = PolyphaseResampler(up, down)
+                return
+            logger.warning(f"{rate_in} -> {rate_out} is not a small rational "
+                           f"ratio; using {ResampleQuality.SINC_BEST.value}")
+            quality = ResampleQuality.SINC_BEST
+
+        self.quality = quality
+        self._resampler = Resampler(quality.value, channels=1)
 
     def process(self, samples: ndarray) -> ndarray:
+        if self.quality == ResampleQuality.POLYPHASE:
+            return self._resampler.process(samples)
         resampled = self._resampler.process(samples, self.ratio)
         return resampled
 
     def reset(self):
         self._resampler.reset()
-
@@ -0,0 +1,119 @@
+from typing import Optional
+
+import numpy as np
+from numpy import ndarray
+
+
+class BlockRing:
+    """
+    Preallocated ring of fixed-size sample blocks.
+
+    Blocks are handed out in rotation; a block is only overwritten once
+    `num_blocks` further blocks have been written, so views returned by
+    `write()` stay valid for that long without any per-write allocation.
+    """
+
+    blocks: ndarray
+    num_blocks: int
+    block_size: int
+
+    _index: int
+
+    def __init__(self, num_blocks: int, block_size: int,
+                 dtype: np.dtype = np.float32):
+
+        self.num_blocks = num_blocks
+        self.block_size = block_size
+
+        self.blocks = np.zeros((num_blocks, block_size), dtype=dtype)
+        self._index = 0
+
+    def write(self, samples: ndarray) -> ndarray:
+        """
+        copy samples into the next block and return a view of the written
+        portion; oversized inputs fall back to a private copy
+        """
+        num_samples = samples.size
+        if num_samples > self.block_size:
+            return samples.astype(self.blocks.dtype)
+
+        block = self.blocks[self._index]
+        self._index = (self._index + 1) % self.num_blocks
+
+        view = block[:num_samples]
+        np.copyto(view, samples)
+        return view
+
+
+class SampleHistory:
+    """
+    Preallocated circular history of the most recent samples of a stream,
+    with the time the newest sample was written.
+
+    `write()` copies into the ring in place (no allocation); `recent()`
+    returns a copy of the samples that fall within a time window.
+    """
+
+    buffer: ndarray
+    capacity: int
+    sample_rate: int
+
+    _index: int
+    _valid: int
+    _last_write: Optional[float]
+
+    def __init__(self, capacity: int, sample_rate: int,
+                 dtype: np.dtype = np.float32):
+
+        self.capacity = capacity
+        self.sample_rate = sample_rate
+
+        self.buffer = np.zeros(capacity, dtype=dtype)
+        self._index = 0
+        self._valid = 0
+        self._last_write = None
+
+    def write(self, samples: ndarray, now: float):
+        """ append samples; `now` is the time of the newest sample """
+        num_samples = samples.size
+        if num_samples >= self.capacity:
+            np.copyto(self.buffer, samples[-self.capacity:])
+            self._index = 0
+            self._valid = self.capacity
+        else:
+            head = min(num_samples, self.capacity - self._index)
+            self.buffer[self._index:self._index + head] = samples[:head]
+            self.buffer[:num_samples - head] = samples[head:]
+            self._index = (self._index + num_samples) % self.capacity
+            self._valid = min(self._valid + num_samples, self.capacity)
+
+        self._last_write = now
+
+    def recent(self, window_secs: float, now: float) -> ndarray:
+        """
+        copy of the samples no older than `window_secs` before `now`,
+        oldest first; empty if the history is stale
+        """
+        if self._last_write is None:
+            return self.buffer[:0].copy()
+
+        gap = max(now - self._last_write, 0.)
+        num_samples = min(self._valid,
+                          int((window_secs - gap) * self.sample_rate))
+        if num_samples <= 0:
+            return self.buffer[:0].copy()
+
+        start = self._index - num_samples
+        if start >= 0:
+            return self.buffer[start:self._index].copy()
+        return np.concatenate((self.buffer[start:], self.buffer[:self._index]))
+
+    @property
+    def last_write(self) -> Optional[float]:
+        """ time of the newest sample; None if nothing was written """
+        return self._last_write
+
+    def clear(self):
+        self._index = 0
+        self._valid = 0
+        self._last_write = None
@@ -1,16 +1,34 @@
 from dataclasses import dataclass
+from datetime import datetime
 from typing import Optional
+from enum import Enum
 import os
 import sys
 
 from numpy import ndarray
 
 
+class StreamFormat(Enum):
+    WAV_PCM_16LE = "wav.pcm_16le"
+    # archival formats; encoded from the wav capture after the session
+    FLAC = "flac"
+    OGG_OPUS = "ogg.opus"
+
+    @property
+    def extension(self) -> str:
+        return {
+            StreamFormat.WAV_PCM_16LE: ".wav",
+            StreamFormat.FLAC: ".flac",
+            StreamFormat.OGG_OPUS: ".opus"
+        }[self]
+
+
 @dataclass
 class DiskWriterConfig:
     minimum_length_secs: float
     base_path: Optional[str] = None
     sampling_rate: Optional[int] = None
+    max_segment_secs: float = 0.
 
 
 @dataclass
@@ -50,4 +68,22 @@ class SamplesSequenceSummary:
 
     def print(self, ref_id: Optional[str] = None) -> None:
         stdout = sys.stdout.fileno()
-        os.write(stdout, self.report_string(ref_id).encode())
\ No newline at end of file
+        os.write(stdout, self.report_string(ref_id).encode())
+
+
+@dataclass
+class StreamCapture:
+    """ a finalized capture file, as reported by StreamDiskWriter """
+    file_path: str
+    start_time: datetime
+    sample_rate: int
+    num_samples: int
+    levels: SamplesSequenceSummary
+    # audio ahead of start_time at the head of the file (pre-roll)
+    preroll_secs: float = 0.
+    # frames missing from the file (full disk backlog); spliced without a gap
+    frames_dropped: int = 0
+
+    @property
+    def length_secs(self) -> float:
+        return self.num_samples / self.sample_rate
@@ -3,9 +3,38 @@ DEFAULT_UDP_LISTEN_ADDR: str = "127.0.0.1"
 DEFAULT_UDP_PORT_BASE: int = 6000
 DEFAULT_PTT_TIMEOUT_SECS: float = 0.120  # 120 mS
 
+# maximum datagrams drained from one socket per event loop wakeup
+DEFAULT_RECEIVE_BATCH_MAX: int = 64
+
+# period of the shared end-of-PTT sweep across all channels
+DEFAULT_PTT_SWEEP_INTERVAL_SECS: float = 0.050  # 50 mS
+
 DEFAULT_MINIMUM_VOICE_ACTIVE_SECS: float = 0.3
 
+# long transmissions (eg. stuck carrier) roll into numbered segment files
+DEFAULT_MAX_SEGMENT_SECS: float = 600.  # 10 minutes
+
+# per-channel cap on audio buffered for the sinks (capture writes queued
+# on the I/O lane plus pcm queued for the mumble outputs)
+DEFAULT_CHANNEL_MAX_PENDING_BYTES: int = 4 * 1024 * 1024
+
+# audio from before a session opens that is prepended to it; 0 disables
+DEFAULT_PREROLL_MS: int = 0
+
 # The default number of samples per voice frame in Mumble is 480. This is based on a sample rate of 48 kHz and a frame size of 10 ms, which is a common configuration in VoIP applications.
 SAMPLE_SECS_PER_FRAME: int = 10 / 1000  # 10 ms
 
 DEFAULT_DATA_STORE_PATH: str = "/opt/data/radio_channels"
+
+# prometheus /metrics endpoint; port 0 disables
+DEFAULT_METRICS_LISTEN_ADDR: str = "0.0.0.0"
+DEFAULT_METRICS_PORT: int = 0
+
+# event loop lag heartbeat; loop stalls beyond the slow callback
+# threshold are sampled and attributed; interval 0 disables
+DEFAULT_LOOP_MONITOR_INTERVAL_MS: int = 100
+DEFAULT_LOOP_SLOW_CALLBACK_MS: int = 50
+
+# capture file I/O workers and per-stream backlog (frames @ 125 ms)
+DEFAULT_DISK_IO_WORKERS: int = 2
+DEFAULT_DISK_IO_MAX_PENDING: int = 80  # 10 seconds
@@ -0,0 +1,221 @@
+"""
+Event loop lag monitor and slow-callback detector.
+
+Every channel shares the one asyncio loop, so anything that blocks it (a
+synchronous file write, certificate generation, a slow filter run inline)
+stalls audio on all channels. A task sleeps `interval` at a time and
+measures how late it wakes (scheduling lag). A watchdog thread watches
+that heartbeat; once the loop is `slow_callback` overdue it samples the
+loop thread's stack (and the running task, if any), so the code blocking
+the loop is named while it is still running. The block is recorded once
+the loop comes back.
+
+Lag and blocks are exported as metrics, attributed by the innermost
+frame in this package (eg. `disk_writer.py:StreamDiskWriter._write`), and
+logged at most once per `log_interval`.
+"""
+from .literals import (
+    DEFAULT_LOOP_MONITOR_INTERVAL_MS,
+    DEFAULT_LOOP_SLOW_CALLBACK_MS
+)
+from .metrics import REGISTRY
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import traceback
+from time import monotonic
+from typing import Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+# seconds
+LAG_BUCKETS: tuple[float, ...] = (
+    .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1., 2.5, 5.)
+
+# frames of the blocking stack kept for the log
+STACK_DEPTH: int = 8
+
+PACKAGE_DIR: str = os.path.dirname(os.path.abspath(__file__))
+
+
+def _blocking_site(frame) -> str:
+    """
+    innermost frame within this package, eg. 'disk_writer.py:_write';
+    otherwise the innermost frame
+    """
+    innermost = frame
+    while frame is not None:
+        if frame.f_code.co_filename.startswith(PACKAGE_DIR) and \
+                frame.f_code.co_filename != __file__:
+            break
+        frame = frame.f_back
+
+    code = (frame or innermost).f_code
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f"{os.path.basename(code.co_filename)}:{name}"
+
+
+class LoopBlock:
+
+    site: str
+    task: Optional[str]
+    stack: list[str]
+    duration: float
+
+    def __init__(self, site: str, task: Optional[str], stack: list[str]):
+        self.site = site
+        self.task = task
+        self.stack = stack
+        self.duration = 0.
+
+
+class LoopLagMonitor:
+
+    interval: float
+    slow_callback: float
+    log_interval: float
+
+    # statistics
+    lag_last: float
+    lag_max: float
+    blocks: int
+
+    _loop: Optional[asyncio.AbstractEventLoop]
+    _loop_thread_id: Optional[int]
+
+    # heartbeat; written by the loop, read by the watchdog. The handoff
+    # of a block is under _lock, so a block sampled as the loop came back
+    # is never kept for the next heartbeat
+    _expected_wake: Optional[float]
+    _block: Optional[LoopBlock]
+    _lock: threading.Lock
+
+    _last_log: float
+    _suppressed: int
+
+    def __init__(self,
+                 interval: float = DEFAULT_LOOP_MONITOR_INTERVAL_MS / 1000.,
+                 slow_callback: float = DEFAULT_LOOP_SLOW_CALLBACK_MS / 1000.,
+                 log_interval: float = 10.):
+        self.interval = interval
+        self.slow_callback = slow_callback
+        self.log_interval = log_interval
+
+        self.lag_last = 0.
+        self.lag_max = 0.
+        self.blocks = 0
+
+        self._loop = None
+        self._loop_thread_id = None
+        self._expected_wake = None
+        self._block = None
+        self._lock = threading.Lock()
+        self._last_log = -log_interval
+        self._suppressed = 0
+
+        self._lag = REGISTRY.histogram(
+            "radio_event_loop_lag_seconds",
+            "event loop scheduling lag", buckets=LAG_BUCKETS).labels()
+        self._blocked = REGISTRY.counter(
+            "radio_event_loop_blocked_total",
+            "callbacks that blocked the event loop past the threshold", ("site",))
+        self._blocked_secs = REGISTRY.counter(
+            "radio_event_loop_blocked_seconds_total",
+            "time the event loop was blocked, by site", ("site",))
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+
+        stop = threading.Event()
+        watchdog = threading.Thread(target=self._watch, args=(stop,),
+                                    name="loop-watchdog", daemon=True)
+        watchdog.start()
+
+        try:
+            while True:
+                started = monotonic()
+                self._expected_wake = started + self.interval
+                await asyncio.sleep(self.interval)
+                self._on_wake(monotonic() - started - self.interval)
+        finally:
+            stop.set()
+
+    def _on_wake(self, lag: float):
+        lag = max(lag, 0.)
+        self.lag_last = lag
+        if lag > self.lag_max:
+            self.lag_max = lag
+        self._lag.observe(lag)
+
+        # the watchdog cannot sample this (finished) stall again
+        with self._lock:
+            self._expected_wake = None
+            block, self._block = self._block, None
+        if block is None:
+            return
+
+        block.duration = lag
+        self.blocks += 1
+        self._blocked.labels(block.site).inc()
+        self._blocked_secs.labels(block.site).inc(lag)
+        self._log_block(block)
+
+    def _log_block(self, block: LoopBlock):
+        now = monotonic()
+        if now - self._last_log < self.log_interval:
+            self._suppressed += 1
+            return
+
+        suppressed = ""
+        if self._suppressed:
+            suppressed = f" ({self._suppressed} more since last report)"
+        self._last_log = now
+        self._suppressed = 0
+
+        task = f" in task {block.task}" if block.task else ""
+        logger.warning(f"event loop blocked {block.duration * 1000:.0f} ms by "
+                       f"{block.site}{task}{suppressed}\n" + "".join(block.stack))
+
+    # -- watchdog thread --
+
+    def _watch(self, stop: threading.Event):
+        poll = max(self.slow_callback / 4., 0.001)
+        while not stop.wait(poll):
+            expected = self._expected_wake
+            if expected is None or self._block is not None:
+                continue
+            if monotonic() - expected < self.slow_callback:
+                continue
+
+            block = self._sample()
+            if block is None:
+                continue
+            # the loop may have come back meanwhile
+            with self._lock:
+                if self._expected_wake == expected and self._block is None:
+                    self._block = block
+
+    def _sample(self) -> Optional[LoopBlock]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+
+        task = None
+        try:
+            current = asyncio.current_task(self._loop)
+            if current is not None:
+                task = current.get_name()
+                coro = current.get_coro()
+                if coro is not None:
+                    task += f" ({getattr(coro, '__qualname__', coro)})"
+        except Exception:
+            pass
+
+        stack = traceback.format_stack(frame, limit=STACK_DEPTH)
+        return LoopBlock(_blocking_site(frame), task, stack)
@@ -100,7 +100,9 @@ async def main():
     except Exception as e:
         logger.error(e)
 
-try:
-    asyncio.run(main())
-except KeyboardInterrupt:
-    print("Server stopped manually")
+# spawned worker processes (archive encoding) import this module again
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("Server stopped manually")
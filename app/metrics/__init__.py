@@ -0,0 +1,12 @@
+from .metrics import (
+    MetricsRegistry,
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+    LATENCY_BUCKETS,
+    DURATION_BUCKETS
+)
+from .channel import ChannelMetrics
+from .server import MetricsServer
+from .latency import LatencyTracker
@@ -0,0 +1,83 @@
+"""
+Metrics of one radio channel, bound to its `channel` label up front so
+the receive and DSP paths only touch pre-built children.
+"""
+from .metrics import (
+    MetricsRegistry,
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+    DURATION_BUCKETS
+)
+
+from typing import Callable
+
+
+class ChannelMetrics:
+
+    channel_id: str
+
+    # event loop
+    datagrams: Counter
+    datagrams_malformed: Counter
+    sessions: Counter
+    session_duration: Histogram
+
+    # DSP lane; seconds per frame
+    filter_time: Histogram
+    resample_time: Histogram
+    encode_time: Histogram
+
+    # event loop (disk writer callbacks)
+    disk_write_latency: Histogram
+    disk_bytes_written: Counter
+
+    _registry: MetricsRegistry
+
+    def __init__(self, channel_id: str, registry: MetricsRegistry = REGISTRY):
+        self.channel_id = channel_id
+        self._registry = registry
+
+        labels = ("channel",)
+        r = registry
+
+        self.datagrams = r.counter(
+            "radio_channel_datagrams_total",
+            "audio datagrams received", labels).labels(channel_id)
+        self.datagrams_malformed = r.counter(
+            "radio_channel_datagrams_malformed_total",
+            "datagrams of an unexpected size", labels).labels(channel_id)
+        self.sessions = r.counter(
+            "radio_channel_sessions_total",
+            "PTT sessions opened", labels).labels(channel_id)
+        self.session_duration = r.histogram(
+            "radio_channel_session_duration_seconds",
+            "length of closed PTT sessions", labels,
+            buckets=DURATION_BUCKETS).labels(channel_id)
+
+        stage_time = r.histogram(
+            "radio_channel_frame_processing_seconds",
+            "per-frame processing time by stage", ("channel", "stage"))
+        self.filter_time = stage_time.labels(channel_id, "filter")
+        self.resample_time = stage_time.labels(channel_id, "resample")
+        self.encode_time = stage_time.labels(channel_id, "encode")
+
+        self.disk_write_latency = r.histogram(
+            "radio_channel_disk_write_seconds",
+            "capture write latency per frame", labels).labels(channel_id)
+        self.disk_bytes_written = r.counter(
+            "radio_channel_disk_written_bytes_total",
+            "capture bytes written", labels).labels(channel_id)
+
+    def gauge(self, name: str, help: str, function: Callable[[], float]) -> Gauge:
+        """ channel gauge read from `function` at scrape time """
+        gauge = self._registry.gauge(name, help, ("channel",)).labels(self.channel_id)
+        gauge.set_function(function)
+        return gauge
+
+    def counter(self, name: str, help: str, function: Callable[[], float]) -> Counter:
+        """ channel counter read from `function` at scrape time """
+        counter = self._registry.counter(name, help, ("channel",)).labels(self.channel_id)
+        counter.set_function(function)
+        return counter
@@ -0,0 +1,102 @@
+"""
+Per-channel frame latency, from datagram receipt to each pipeline stage.
+
+The latest `window` completed frames are kept per stage in ring buffers
+(seconds since Stage.RECEIVED); percentiles are computed on demand, eg.
+on a /metrics scrape. One frame in `trace_interval` can be logged with
+its full trace.
+"""
+from .metrics import MetricsRegistry, REGISTRY
+from app.dsp.frame import FrameTrace, Stage
+
+from typing import Optional
+import logging
+import math
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_LATENCY_WINDOW: int = 1024
+
+# reported as the `quantile` label
+QUANTILES: tuple[float, ...] = (0.5, 0.9, 0.99)
+
+
+class LatencyTracker:
+
+    channel_id: str
+    window: int
+    trace_interval: int
+
+    # seconds since receipt; (window, stages), nan where a stage was skipped
+    _latencies: np.ndarray
+    _next: int
+    frames: int
+
+    def __init__(self, channel_id: str, window: int = DEFAULT_LATENCY_WINDOW,
+                 trace_interval: int = 0):
+        self.channel_id = channel_id
+        self.window = window
+        self.trace_interval = trace_interval
+
+        self._latencies = np.full((window, len(Stage)), np.nan)
+        self._next = 0
+        self.frames = 0
+
+    def record(self, trace: FrameTrace):
+        """ a frame has left the pipeline; runs on the event loop """
+        row = self._latencies[self._next]
+        row[:] = trace.stamps
+        row -= row[Stage.RECEIVED]
+
+        self._next = (self._next + 1) % self.window
+        self.frames += 1
+
+        if self.trace_interval and self.frames % self.trace_interval == 0:
+            logger.info(f"channel id={self.channel_id} frame trace (ms): "
+                        + self._format_trace(row))
+
+    def percentiles(self, stage: Stage,
+                    quantiles: tuple[float, ...] = QUANTILES) -> list[float]:
+        """ latency (seconds) from receipt to `stage` over the window """
+        values = self.latencies(stage)
+        if values.size == 0:
+            return [math.nan] * len(quantiles)
+        return list(np.quantile(values, quantiles))
+
+    def latencies(self, stage: Stage) -> np.ndarray:
+        """ latencies (seconds) to `stage` of the frames in the window """
+        values = self._latencies[:min(self.frames, self.window), stage]
+        return values[~np.isnan(values)]
+
+    def summary(self) -> str:
+        parts = []
+        for stage in Stage:
+            if stage == Stage.RECEIVED:
+                continue
+            p50, _, p99 = self.percentiles(stage, (0.5, 0.9, 0.99))
+            if not math.isnan(p50):
+                parts.append(f"{stage.name.lower()} {p50 * 1000:.1f}/{p99 * 1000:.1f}")
+        return ", ".join(parts)
+
+    def register(self, registry: MetricsRegistry = REGISTRY):
+        """ expose the percentiles as a gauge per stage and quantile """
+        family = registry.gauge("radio_channel_frame_latency_seconds",
+                                "time from datagram receipt to a pipeline stage",
+                                ("channel", "stage", "quantile"))
+        for stage in Stage:
+            if stage == Stage.RECEIVED:
+                continue
+            for i, quantile in enumerate(QUANTILES):
+                child = family.labels(self.channel_id, stage.name.lower(), quantile)
+                child.set_function(
+                    lambda stage=stage, i=i: self.percentiles(stage)[i])
+
+    @staticmethod
+    def _format_trace(row: np.ndarray) -> str:
+        return " ".join(f"{stage.name.lower()}={row[stage] * 1000:.2f}"
+                        for stage in Stage
+                        if stage != Stage.RECEIVED and not np.isnan(row[stage]))
@@ -0,0 +1,205 @@
+"""
+Minimal Prometheus-style metrics.
+
+Counters, gauges and histograms are declared once as families with label
+names; `family.labels(...)` returns a child bound to one set of label
+values, which the hot path keeps and updates directly (an add, or a
+bisect and an add for a histogram) -- no string formatting and no dict
+lookups per packet. Text is only produced when the registry is scraped.
+
+Each child is expected to be updated from one thread at a time (the event
+loop, or the lane that owns the stream); a scrape may read a histogram
+mid-update, which Prometheus tolerates.
+"""
+from bisect import bisect_left
+from typing import Callable, Iterable, Optional
+import logging
+import math
+
+
+logger = logging.getLogger(__name__)
+
+
+# seconds; per-frame processing (a frame is 125 ms of audio)
+LATENCY_BUCKETS: tuple[float, ...] = (
+    .0001, .00025, .0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1.)
+
+# seconds; length of a transmission
+DURATION_BUCKETS: tuple[float, ...] = (
+    .5, 1., 2., 5., 10., 20., 30., 60., 120., 300., 600.)
+
+
+def _format_value(value: Optional[float]) -> str:
+    if value is None or math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+
+    value: float
+    _function: Optional[Callable[[], float]]
+
+    def __init__(self):
+        self.value = 0.
+        self._function = None
+
+    def inc(self, amount: float = 1.):
+        self.value += amount
+
+    def set_function(self, function: Callable[[], float]):
+        """ read the value from `function` at scrape time """
+        self._function = function
+
+    def get(self) -> float:
+        if self._function is not None:
+            return self._function()
+        return self.value
+
+
+class Gauge(Counter):
+
+    def set(self, value: float):
+        self.value = value
+
+    def dec(self, amount: float = 1.):
+        self.value -= amount
+
+
+class Histogram:
+
+    bounds: tuple[float, ...]
+    counts: list[int]
+    sum: float
+
+    def __init__(self, bounds: tuple[float, ...]):
+        self.bounds = bounds
+        # the last bucket is +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class MetricFamily:
+
+    name: str
+    help: str
+    type: str
+    label_names: tuple[str, ...]
+    children: dict[tuple[str, ...], object]
+
+    _new_child: Callable[[], object]
+
+    def __init__(self, name: str, help: str, type: str,
+                 label_names: Iterable[str], new_child: Callable[[], object]):
+        self.name = name
+        self.help = help
+        self.type = type
+        self.label_names = tuple(label_names)
+        self.children = {}
+        self._new_child = new_child
+
+    def labels(self, *values) -> object:
+        """ child for these label values; keep it, do not call per update """
+        if len(values) != len(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}")
+
+        key = tuple(str(value) for value in values)
+        child = self.children.get(key)
+        if child is None:
+            child = self.children[key] = self._new_child()
+        return child
+
+    def remove(self, *values):
+        self.children.pop(tuple(str(value) for value in values), None)
+
+    def _label_text(self, key: tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"'
+                 for name, value in zip(self.label_names, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}",
+                 f"# TYPE {self.name} {self.type}"]
+
+        for key, child in list(self.children.items()):
+            if isinstance(child, Histogram):
+                cumulative = 0
+                counts = list(child.counts)
+                for bound, count in zip(child.bounds + (math.inf,), counts):
+                    cumulative += count
+                    labels = self._label_text(key, f'le="{_format_value(bound)}"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = self._label_text(key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+                continue
+
+            try:
+                value = child.get()
+            except Exception as e:
+                logger.error(f"metric {self.name} unavailable: {type(e)} {e}")
+                continue
+            lines.append(f"{self.name}{self._label_text(key)} {_format_value(value)}")
+
+        return lines
+
+
+class MetricsRegistry:
+
+    families: dict[str, MetricFamily]
+
+    def __init__(self):
+        self.families = {}
+
+    def _register(self, name: str, help: str, type: str,
+                  label_names: Iterable[str],
+                  new_child: Callable[[], object]) -> MetricFamily:
+        family = self.families.get(name)
+        if family is not None:
+            if family.type != type:
+                raise ValueError(f"metric {name} already registered as {family.type}")
+            return family
+
+        family = MetricFamily(name, help, type, label_names, new_child)
+        self.families[name] = family
+        return family
+
+    def counter(self, name: str, help: str,
+                label_names: Iterable[str] = ()) -> MetricFamily:
+        return self._register(name, help, "counter", label_names, Counter)
+
+    def gauge(self, name: str, help: str,
+              label_names: Iterable[str] = ()) -> MetricFamily:
+        return self._register(name, help, "gauge", label_names, Gauge)
+
+    def histogram(self, name: str, help: str,
+                  label_names: Iterable[str] = (),
+                  buckets: tuple[float, ...] = LATENCY_BUCKETS) -> MetricFamily:
+        buckets = tuple(sorted(buckets))
+        return self._register(name, help, "histogram", label_names,
+                              lambda: Histogram(buckets))
+
+    def render(self) -> str:
+        """ Prometheus text exposition format (0.0.4) """
+        lines = []
+        for family in list(self.families.values()):
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+
+# process-wide registry served on /metrics
+REGISTRY = MetricsRegistry()
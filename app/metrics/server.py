@@ -0,0 +1,82 @@
+"""
+/metrics HTTP endpoint on the event loop.
+
+Just enough HTTP/1.0 for a Prometheus scrape: one GET per connection,
+the registry rendered on request, connection closed after the response.
+"""
+from .metrics import MetricsRegistry, REGISTRY
+
+from typing import Optional
+import asyncio
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+CONTENT_TYPE: str = "text/plain; version=0.0.4; charset=utf-8"
+
+# a scraper that does not send its request line promptly is dropped
+REQUEST_TIMEOUT_SECS: float = 5.
+
+
+class MetricsServer:
+
+    host: str
+    port: int
+    registry: MetricsRegistry
+
+    # statistics
+    scrapes: int
+
+    _server: Optional[asyncio.AbstractServer]
+
+    def __init__(self, host: str, port: int,
+                 registry: MetricsRegistry = REGISTRY):
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self.scrapes = 0
+        self._server = None
+
+    async def run(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info(f"serving metrics on http://{self.host}:{self.port}/metrics")
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def _handle(self, reader: asyncio.StreamReader,
+                      writer: asyncio.StreamWriter):
+        try:
+            request = await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT_SECS)
+            # headers are not used; drain them
+            while True:
+                line = await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT_SECS)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+
+            parts = request.decode("latin-1").split()
+            if len(parts) < 2 or parts[0] not in ("GET", "HEAD"):
+                self._respond(writer, 405, "Method Not Allowed", b"")
+            elif parts[1].split("?")[0] != "/metrics":
+                self._respond(writer, 404, "Not Found", b"")
+            else:
+                body = self.registry.render().encode()
+                self.scrapes += 1
+                self._respond(writer, 200, "OK",
+                              body if parts[0] == "GET" else b"", len(body))
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.error(f"metrics request failed: {type(e)} {e}")
+        finally:
+            writer.close()
+
+    def _respond(self, writer: asyncio.StreamWriter, status: int, reason: str,
+                 body: bytes, length: Optional[int] = None):
+        headers = (f"HTTP/1.0 {status} {reason}\r\n"
+                   f"Content-Type: {CONTENT_TYPE}\r\n"
+                   f"Content-Length: {len(body) if length is None else length}\r\n"
+                   f"Connection: close\r\n\r\n")
+        writer.write(headers.encode() + body)
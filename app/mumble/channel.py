@@ -1,11 +1,13 @@
-from ..dsp.resampling import StreamResampler
-from ..dsp.frame import Frame
+from ..dsp.resampling import ResampleQuality, DEFAULT_RESAMPLE_QUALITY
+from ..dsp.rendition import OutputFormat
+from ..dsp.frame import FrameTrace, Stage
 from .certificate import get_certificate, Certificate
+from ..literals import DEFAULT_CHANNEL_MAX_PENDING_BYTES
 
 import asyncio
 import time
 import logging
-from typing import Optional, Union
+from typing import Callable, Optional, Union
 
 
 # third-party libs
@@ -29,15 +31,23 @@ DEFAULT_SAMPLE_RATE: int = 48000
 class MumbleChannel:
 
     mumble: Union[Mumble, None]
-    resampler: Union[StreamResampler, None]
+    resample_quality: ResampleQuality
     sample_rate: int
 
-    last_channel_session_id: Union[int, None]
-
     username: str
     channel: Optional[str]
+
+    # pcm queued in audio_buffer; grows while disconnected, up to
+    # max_pending_bytes, beyond which the oldest pcm is dropped
+    pending_bytes: int
+    max_pending_bytes: int
+    frames_dropped: int
+    _capped: bool
     password: Optional[str]
 
+    # called with the trace of each frame passed to pymumble
+    on_sent: Optional[Callable[[FrameTrace], None]]
+
     # Certificate
     certs_store: str
     cert_cn: str
@@ -63,14 +73,18 @@ class MumbleChannel:
         # defaults/inits
         self.mumble = None
         self.sample_rate = DEFAULT_SAMPLE_RATE
-        self.resampler = None  # not initialized until required
+        self.resample_quality = kwargs.get('resample_quality', DEFAULT_RESAMPLE_QUALITY)
         self.audio_buffer = asyncio.Queue()
+        self.pending_bytes = 0
+        self.max_pending_bytes = kwargs.get('max_pending_bytes',
+                                            DEFAULT_CHANNEL_MAX_PENDING_BYTES)
+        self.frames_dropped = 0
+        self._capped = False
+        self.on_sent = None
         self.running = False
         self.stop_requested = False
         self.transmitting = False
 
-        self.last_channel_session_id = None
-
     async def start(self):
 
         if self.certs_store is None and self.cert_cn is None:
@@ -130,39 +144,56 @@ class MumbleChannel:
 
     async def stream_audio(self):
         while not self.stop_requested:
-            data = await self.audio_buffer.get()
+            item = await self.audio_buffer.get()
+            # (pcm, trace); empty pcm ends a transmission, None stops
+            data, trace = item if item is not None else (None, None)
             if data:
+                self.pending_bytes -= len(data)
                 self.transmitting = True
                 self.mumble.sound_output.add_sound(data)
+                if trace is not None and self.on_sent is not None:
+                    trace.mark(Stage.SENT)
+                    self.on_sent(trace)
             else:
                 self.transmitting = False
                 await asyncio.sleep(0.01)
 
-    def init_resampler(self, sample_rate_in: int):
-        if not self.resampler or self.resampler.rate_in != sample_rate_in:
-            self.resampler = StreamResampler(sample_rate_in, self.sample_rate)
-
-    def add_frame(self, frame: Frame):
-
-        # resample if necessary
-        if frame.sample_rate != self.sample_rate:
-            self.init_resampler(frame.sample_rate)
-            frame.samples = self.resampler.process(frame.samples)
-
-        if frame.session_id != self.last_channel_session_id:
-            self.resampler.reset()
-            self.last_channel_session_id = frame.session_id
-            logger.debug(f"new channel session_id '{frame.session_id}' - resetting!")
-
-        # ensure output is pcm s16le
-        pcm_data = np.int16(frame.samples * 32767.)
-        self.add_samples(pcm_data.tobytes())
-
-    def add_samples(self, pcm_samples: bytearray):
-        asyncio.run_coroutine_threadsafe(
-            self.audio_buffer.put(pcm_samples),
-            asyncio.get_event_loop()
-        )
+    @property
+    def output_format(self) -> OutputFormat:
+        """ pcm s16le rendition this output consumes """
+        return (self.sample_rate, self.resample_quality)
+
+    def add_samples(self, pcm_samples: bytearray,
+                    trace: Optional[FrameTrace] = None):
+        """
+        queue pcm for sending; runs on the event loop. A stalled or
+        disconnected output drops its own oldest audio, so it never holds
+        back the other sinks of the channel
+        """
+        self.pending_bytes += len(pcm_samples)
+        self.audio_buffer.put_nowait((pcm_samples, trace))
+
+        dropped = 0
+        while self.pending_bytes > self.max_pending_bytes and not self.audio_buffer.empty():
+            item = self.audio_buffer.get_nowait()
+            if item is not None and item[0]:
+                self.pending_bytes -= len(item[0])
+                dropped += 1
+
+        if dropped == 0:
+            self._capped = False
+            return
+
+        self.frames_dropped += dropped
+        if not self._capped:
+            logger.warning(f"mumble output '{self.username}' buffered over "
+                           f"{self.max_pending_bytes:,} bytes; dropping oldest audio "
+                           f"({self.frames_dropped} total)")
+        self._capped = True
+
+    def end_transmission(self):
+        """ the channel's session closed; queued behind its last pcm """
+        self.audio_buffer.put_nowait((b"", None))
 
     # Callbacks
     def on_connected(self):
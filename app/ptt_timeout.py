@@ -0,0 +1,111 @@
+"""
+End-of-transmission (PTT release) detection for all channels.
+
+RTLSDR-Airband simply stops sending datagrams when a channel squelches
+closed, so a transmission is over once no datagram has arrived for
+`DEFAULT_STREAM_TIMEOUT_SECS`. Rather than re-arming an asyncio timer on
+every datagram, each channel only records the time of its last datagram
+and a single periodic sweep closes streams that have gone quiet.
+
+Detection happens between `timeout` and `timeout + sweep_interval` after
+the last datagram; the measured latency is kept per stream.
+"""
+from .literals import DEFAULT_PTT_SWEEP_INTERVAL_SECS
+from .rtlsdr_airband.literals import DEFAULT_STREAM_TIMEOUT_SECS
+
+import asyncio
+import logging
+from time import monotonic
+from typing import Callable, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class PttStream:
+
+    name: Optional[str]
+    on_done: Callable
+    timeout: float
+
+    last_packet: Optional[float]
+
+    # end-of-PTT detection latency (last datagram -> detection) [secs]
+    detections: int
+    detection_latency_last: Optional[float]
+    detection_latency_max: float
+    detection_latency_total: float
+
+    def __init__(self, on_done: Callable, timeout: float,
+                 name: Optional[str] = None):
+
+        self.name = name
+        self.on_done = on_done
+        self.timeout = timeout
+
+        self.last_packet = None
+
+        self.detections = 0
+        self.detection_latency_last = None
+        self.detection_latency_max = 0.
+        self.detection_latency_total = 0.
+
+    def touch(self, now: Optional[float] = None):
+        """ record datagram arrival; called per datagram so keep it cheap """
+        self.last_packet = monotonic() if now is None else now
+
+    @property
+    def active(self) -> bool:
+        return self.last_packet is not None
+
+    @property
+    def detection_latency_mean(self) -> Optional[float]:
+        if self.detections == 0:
+            return None
+        return self.detection_latency_total / self.detections
+
+
+class PttTimeoutMonitor:
+
+    sweep_interval: float
+    streams: list[PttStream]
+
+    def __init__(self, sweep_interval: float = DEFAULT_PTT_SWEEP_INTERVAL_SECS):
+        self.sweep_interval = sweep_interval
+        self.streams = []
+
+    def register(self, on_done: Callable,
+                 timeout: float = DEFAULT_STREAM_TIMEOUT_SECS,
+                 name: Optional[str] = None) -> PttStream:
+        stream = PttStream(on_done, timeout, name=name)
+        self.streams.append(stream)
+        return stream
+
+    def sweep(self, now: Optional[float] = None):
+        """ close every stream whose last datagram is older than its timeout """
+        if now is None:
+            now = monotonic()
+
+        for stream in self.streams:
+            if stream.last_packet is None:
+                continue
+            latency = now - stream.last_packet
+            if latency < stream.timeout:
+                continue
+
+            stream.last_packet = None
+            stream.detections += 1
+            stream.detection_latency_last = latency
+            stream.detection_latency_total += latency
+            if latency > stream.detection_latency_max:
+                stream.detection_latency_max = latency
+
+            try:
+                stream.on_done()
+            except Exception as e:
+                logger.error(f"ptt on_done error ({stream.name}): {type(e)} {e}")
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self.sweep()
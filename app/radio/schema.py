@@ -1,4 +1,5 @@
 from .designators import Designator, decode_emissions_designator
+from app.dsp.schema import SamplesSequenceSummary
 
 from dataclasses import dataclass, field
 from typing import Optional
@@ -89,11 +90,15 @@ class RadioChannelSession:
     id: int
     start_time: float
 
+    # levels of the filtered audio, set once the session has closed
+    summary: Optional[SamplesSequenceSummary]
+
     _active: bool
 
     def __init__(self, id: int, time_start: Optional[float] = None):
         self.id = id
         self.start_time = time_start or datetime.now()
+        self.summary = None
 
         self._active = True
 
@@ -11,6 +11,9 @@ from dataclasses import dataclass
 import logging
 from enum import Enum
 
+import numpy as np
+from numpy.typing import ArrayLike
+
 
 logger = logging.getLogger('radio.tone_coding.twotone')
 
@@ -139,6 +142,107 @@ for group in REED_GROUPS:
 for code in codes:
     grouped_codes[code.reed_group][code.tone_num] = code
 
+# Reed group code frequencies as a table for vectorized lookup; each row is
+# one group in ascending frequency. Rows are offset so the whole table is
+# one ascending array and a single searchsorted serves every group.
+TABLE_GROUPS: np.ndarray = np.array(REED_GROUPS)
+_table_codes: list[list[TwoToneDiscreteTone]] = [
+    sorted(grouped_codes[group].values(), key=lambda code: code.freq)
+    for group in REED_GROUPS
+]
+FREQ_TABLE: np.ndarray = np.array(
+    [[code.freq for code in row] for row in _table_codes])
+TONE_NUM_TABLE: np.ndarray = np.array(
+    [[code.tone_num for code in row] for row in _table_codes])
+
+_TABLE_ROW_OFFSET: float = 10000.
+_table_offsets = np.arange(len(REED_GROUPS))[:, None] * _TABLE_ROW_OFFSET
+_table_flat = (FREQ_TABLE + _table_offsets).ravel()
+_table_rows = np.arange(len(REED_GROUPS))[:, None]
+_table_row_start = _table_rows * FREQ_TABLE.shape[1]
+
+
+@dataclass
+class TwoToneMatches:
+    """ columnar result of codes_from_freqs(); one entry per tone pair """
+    group: np.ndarray
+    id: np.ndarray
+    # (row, column) of each tone in FREQ_TABLE
+    row: np.ndarray
+    col_1: np.ndarray
+    col_2: np.ndarray
+    tone_1_diff: np.ndarray
+    tone_2_diff: np.ndarray
+    # both tones within Quick Call 2 range
+    valid: np.ndarray
+
+    def __len__(self) -> int:
+        return self.group.size
+
+    def sequence(self, i: int) -> TwoToneSequence:
+        row = self.row[i]
+        return TwoToneSequence(
+            group=int(self.group[i]),
+            id=int(self.id[i]),
+            tone_1=_table_codes[row][self.col_1[i]],
+            tone_1_diff=round(float(self.tone_1_diff[i]), 1),
+            tone_2=_table_codes[row][self.col_2[i]],
+            tone_2_diff=round(float(self.tone_2_diff[i]), 1)
+        )
+
+
+def _nearest_in_groups(freqs: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """ (groups, n) column of the closest code in each group, and distance """
+    num_codes = FREQ_TABLE.shape[1]
+
+    queries = freqs + _table_offsets
+    upper = np.searchsorted(_table_flat, queries) - _table_row_start
+
+    # candidates either side, kept within the group's row
+    upper = np.minimum(np.maximum(upper, 1), num_codes - 1)
+
+    dist_lower = np.abs(freqs - FREQ_TABLE[_table_rows, upper - 1])
+    dist_upper = np.abs(freqs - FREQ_TABLE[_table_rows, upper])
+    use_lower = dist_lower <= dist_upper
+
+    col = np.where(use_lower, upper - 1, upper)
+    dist = np.where(use_lower, dist_lower, dist_upper)
+    return col, dist
+
+
+def codes_from_freqs(tones_a: ArrayLike, tones_b: ArrayLike) -> TwoToneMatches:
+    """
+    batch version of code_from_freqs(): the closest code pair from a single
+    Reed group for every (tone_a, tone_b) pair
+    """
+    tones_a = np.atleast_1d(np.asarray(tones_a, dtype=np.float64))
+    tones_b = np.atleast_1d(np.asarray(tones_b, dtype=np.float64))
+
+    col_a, dist_a = _nearest_in_groups(tones_a)
+    col_b, dist_b = _nearest_in_groups(tones_b)
+
+    # group with the smallest combined distance
+    row = np.argmin(dist_a + dist_b, axis=0)
+    pairs = np.arange(row.size)
+    col_1 = col_a[row, pairs]
+    col_2 = col_b[row, pairs]
+
+    tol = 60.  # temporary placeholder
+    valid = (tones_a >= TWOTONE_MIN - tol) & (tones_a <= TWOTONE_MAX + tol) & \
+            (tones_b >= TWOTONE_MIN - tol) & (tones_b <= TWOTONE_MAX + tol)
+
+    return TwoToneMatches(
+        group=TABLE_GROUPS[row],
+        id=TONE_NUM_TABLE[row, col_1] * 10 + TONE_NUM_TABLE[row, col_2],
+        row=row,
+        col_1=col_1,
+        col_2=col_2,
+        tone_1_diff=dist_a[row, pairs],
+        tone_2_diff=dist_b[row, pairs],
+        valid=valid
+    )
+
+
 # Find the pair of frequencies which most closely fit the supplied
 # tone frequencies from the same Reed Group
 def code_from_freqs(tone_a: float, tone_b: float) -> TwoToneSequence:
@@ -152,62 +256,9 @@ def code_from_freqs(tone_a: float, tone_b: float) -> TwoToneSequence:
     if tone_b > (TWOTONE_MAX + tol) or tone_b < (TWOTONE_MIN - tol):
         raise ValueError(f"tone B ({tone_b}) is out of spec for Quick Call 2!")
 
-    matches = {}
-
-    # match closest code for each group first
-    for group in REED_GROUPS:
-
-        matches[group] = {}
-
-        matches[group]['dist_a'] = None
-        matches[group]['code_a'] = None
-
-        matches[group]['dist_b'] = None
-        matches[group]['code_b'] = None
-
-        for code in grouped_codes[group].values():
-
-            dist_a = abs(tone_a - code.freq)
-            if matches[group]['dist_a'] is None or dist_a < matches[group]['dist_a']:
-                matches[group]['dist_a'] = dist_a
-                matches[group]['code_a'] = code
-
-            dist_b = abs(tone_b - code.freq)
-            if matches[group]['dist_b'] is None or dist_a < matches[group]['dist_b']:
-                matches[group]['dist_b'] = dist_b
-                matches[group]['code_b'] = code
-
-
-    # smallest sum?
-    closest_sum_dist = matches[REED_GROUPS[0]]['dist_a']
-    closest_sum_group = REED_GROUPS[0]
-
-    for group, match in matches.items():
-
-        code_a: TwoToneDiscreteTone = match['code_a']
-        code_b: TwoToneDiscreteTone = match['code_b']
-        dist_a = match['dist_a']
-        dist_b = match['dist_b']
-
-        if (dist_a + dist_b) < closest_sum_dist:
-            closest_sum_dist = dist_a + dist_b
-            closest_sum_group = group
-
-        # print(f"{group:>5} {code_a.reed_code} {code_a.freq} d={round(dist_a,1)} ")
-        # print(f"      {code_b.reed_code} {code_b.freq} d={round(dist_b,1)}")
-
-    # Check closest match
-    code_a = matches[closest_sum_group]['code_a']
-    code_b = matches[closest_sum_group]['code_b']
-    dist_a = round(abs(code_a.freq - tone_a), 1)
-    dist_b = round(abs(code_b.freq - tone_b), 1)
-
-    closest_match = TwoToneSequence(
-        group=closest_sum_group,
-        id=int(code_a.tone_num) * 10 + int(code_b.tone_num),
-        tone_1=code_a,tone_2=code_b,
-        tone_1_diff=dist_a, tone_2_diff=dist_b
-    )
+    closest_match = codes_from_freqs(tone_a, tone_b).sequence(0)
+    dist_a = closest_match.tone_1_diff
+    dist_b = closest_match.tone_2_diff
 
     min_spacing_group = min(freq_spacing_grouped[closest_match.group])
 
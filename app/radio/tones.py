@@ -47,26 +47,33 @@ Time Resolution (capture)   = Window Length / Sampling Rate
 from app.dsp.schema import SamplesSequenceSummary
 from app.dsp.analysis import analyze_samples
 from app.dsp.utils import dbfs, linear
+from app.dsp.goertzel import GoertzelBank
 
-from app.radio.tone_coding.two_tone_sequential import code_from_freqs, TwoToneSequence
+from app.radio.tone_coding.two_tone_sequential import (
+    code_from_freqs,
+    TwoToneSequence,
+    codes as two_tone_codes,
+    TWOTONE_TONE_1_MIN,
+    TWOTONE_TONE_1_MAX,
+    TWOTONE_TONE_2_MIN,
+    TWOTONE_TONE_2_MAX
+)
 
 
 import numpy as np
+from numpy.typing import NDArray
+from numpy.lib.stride_tricks import sliding_window_view
 import scipy.fft
 from scipy.fft import rfft, rfftfreq
 import scipy.io.wavfile
-from scipy.signal import stft, find_peaks
-import matplotlib.pyplot as plt
-
-import numpy as np
-from numpy.typing import NDArray
-import scipy.fft
+from scipy.signal import get_window
 
 from pathlib import Path
 import os
 from dataclasses import dataclass, field
+from datetime import datetime, timedelta
 import logging
-from typing import Union, Any, Optional
+from typing import Union, Any, Optional, Iterable
 
 
 logger = logging.getLogger(__name__)
@@ -127,6 +134,17 @@ class ToneDetection:
     duration: Optional[float] = None
 
 class ToneDetector:
+    """
+    STFT tone tracker.
+
+    Streaming: blocks of any size may be fed in turn. The tail of the
+    previous block is carried over, so windows straddling block boundaries
+    are analyzed and every position is absolute within the stream; feeding
+    125 ms frames gives the same detections as feeding the whole file.
+    As with scipy's stft(boundary='zeros'), window k is centred on sample
+    k * hop, with zero padding before the first sample and, on finalize(),
+    after the last.
+    """
 
     fs: float
 
@@ -139,11 +157,17 @@ class ToneDetector:
     samples_processed: int
 
     tones: list[ToneDetection]
-    active_tones: dict[str, ToneDetection]
+    active_tones: list[ToneDetection]
 
     window_length: int
     overlap: int
 
+    _window: np.ndarray
+    _window_sum: float
+    _freqs: np.ndarray
+    _carry: np.ndarray
+    _next_centre: int
+
     def __init__(self, sampling_rate: int, tone_min_dbfs: float,
                  tone_min_length: float, **kwargs: dict):
 
@@ -156,12 +180,32 @@ class ToneDetector:
 
         # defaults
         self.tones = []
-        self.active_tones = {}
-        self.samples_processed = 0
+        self.active_tones = []
 
         # SFFT
-        self.window_length = 4096
-        self.overlap = self.window_length * 0.5
+        self.window_length = kwargs.get('window_length', 4096)
+        self.overlap = kwargs.get('overlap', self.window_length // 2)
+
+        self.reset()
+
+    @property
+    def hop_length(self) -> int:
+        return self.window_length - self.overlap
+
+    def reset(self):
+        """ start of a new stream """
+        self.tones.clear()
+        self.active_tones.clear()
+        self.samples_processed = 0
+
+        # amplitude scaling as scipy's stft: |rfft| / sum(window)
+        self._window = get_window('hann', self.window_length).astype(np.float32)
+        self._window_sum = float(self._window.sum())
+        self._freqs = rfftfreq(self.window_length, 1 / self.fs)
+
+        # the first window is centred on sample 0
+        self._carry = np.zeros(self.window_length // 2, dtype=np.float32)
+        self._next_centre = 0
 
     def print_parameters(self):
 
@@ -183,13 +227,6 @@ class ToneDetector:
         if length_samples > self.tone_min_samples:
             self.tones.append(detection)
 
-        # was experimenting whether I could get multiple frequency bin centers
-        # print(detection.freq_centers)
-
-    # Detect Peaks in Each Segment: In each STFT segment, detect the peaks as
-    # you would in the full FFT. This will give you the frequencies and their
-    # amplitudes for each time segment.
-
     """
     Window Length (window_length): Determines the frequency resolution.
      - A longer window provides better frequency resolution (narrower
@@ -204,173 +241,342 @@ class ToneDetector:
        are 25%, 50%, or 75%).
 """
 
-    # Track Tone Occurrences Over Time: For each detected frequency, track its
-    # presence over consecutive segments. You can start a ToneDetection instance
-    # when a frequency first appears and end it (set stop_sample) when it
-    # disappears.
+    def process_block(self, samples: NDArray[np.float32]) -> None:
+
+        # convert to float32 if int16/int32
+        if not np.issubdtype(samples.dtype, np.floating):
+            samples = samples.astype(np.float32) / 32768.
+
+        self.samples_processed += samples.size
+        self._analyze(samples.astype(np.float32, copy=False))
 
-    # Handle Overlap and Windows in STFT: STFT involves windowing and
-    # overlapping segments. You'll need to consider these factors to accurately
-    # calculate sample_start and stop_sample.
+    def _analyze(self, samples: np.ndarray):
 
-    def process_block(self, samples: NDArray[np.float32]) -> None:
+        hop_length = self.hop_length
+        ext = np.concatenate((self._carry, samples))
+
+        num_segments = 0
+        if ext.size >= self.window_length:
+            num_segments = (ext.size - self.window_length) // hop_length + 1
+
+        if num_segments:
+            windows = sliding_window_view(ext, self.window_length)[::hop_length]
+            windows = windows[:num_segments]
+            amplitudes = np.abs(rfft(windows * self._window, axis=1)) / self._window_sum
+
+            # local maxima above the threshold, every segment at once
+            inner = amplitudes[:, 1:-1]
+            peak_mask = (inner > amplitudes[:, :-2]) & (inner >= amplitudes[:, 2:]) & \
+                        (inner >= self.tone_min_amplitude)
+
+            for idx in range(num_segments):
+                peaks = np.flatnonzero(peak_mask[idx]) + 1
+                segment_start = self._next_centre + idx * hop_length
+                self._track(segment_start, self._freqs[peaks], amplitudes[idx, peaks])
+
+            self._next_centre += num_segments * hop_length
+            ext = ext[num_segments * hop_length:]
+
+        self._carry = ext
+
+    def _track(self, segment_start: int, frequencies: np.ndarray,
+               amplitudes: np.ndarray):
+        """ associate one segment's peaks with the active tones """
 
         tone_tol = 5  # hz
         time_tol = 0.005  # 5 ms to permit glitching?
         self.tone_end_tolerance = self.fs * time_tol
 
-        # convert to float32 if int16/int32
-        if not np.issubdtype(samples.dtype, np.floating):
-            samples = samples.astype(np.float32) / 32768.
+        active_freqs = np.array([tone.frequency for tone in self.active_tones])
 
-        # Perform Short-Time Fourier Transform (STFT): Instead of using FFT on
-        # the entire signal, use STFT. STFT divides the signal into shorter
-        # segments and performs FFT on each segment. This gives you frequency
-        # information localized in time.
+        # (peaks, active tones) within tolerance
+        matches = np.abs(frequencies[:, None] - active_freqs[None, :]) < tone_tol
+        peak_known = matches.any(axis=1)
+        tone_present = matches.any(axis=0)
 
-        hop_length = self.window_length - self.overlap
+        # peaks of known tones extend them
+        for peak, tone_idx in zip(*np.nonzero(matches)):
+            self.active_tones[tone_idx].freq_centers.append(float(frequencies[peak]))
 
-        # Perform STFT
-        f, t, Zxx = stft(samples, fs=self.fs, nperseg=self.window_length,
-                         noverlap=self.overlap)
+        # establish if any tones have ended
+        still_active = []
+        for tone, present in zip(self.active_tones, tone_present.tolist()):
+            if present:
+                tone.sample_soft_end = None
+                still_active.append(tone)
+                continue
 
-        amplitudes = np.abs(Zxx)
+            # Mark a tone for ended but filtered
+            if tone.sample_soft_end is None:
+                tone.sample_soft_end = segment_start
+                still_active.append(tone)
 
-        for idx, time in enumerate(t):
-            segment_start = int(idx * hop_length)
+            elif (segment_start - tone.sample_soft_end) > self.tone_end_tolerance:
+                tone.sample_end = tone.sample_soft_end
+                self._register_detection(tone)
 
-            freq_bin = amplitudes[:, idx]
-            peaks, _ = find_peaks(freq_bin, height=self.tone_min_amplitude)
+            else:
+                still_active.append(tone)
 
-            for peak in peaks:
-                frequency = f[peak]
-                amplitude = freq_bin[peak]
+        # these tones are new
+        for frequency, amplitude in zip(frequencies[~peak_known].tolist(),
+                                        amplitudes[~peak_known].tolist()):
+            still_active.append(ToneDetection(
+                frequency=frequency,
+                amplitude=amplitude,
+                sample_start=segment_start
+            ))
 
-                # determine if known
-                active_tone_id: Union[int, None] = None
-                for tone_id in self.active_tones:
-                    if abs(frequency - tone_id) < tone_tol:
-                        active_tone_id = tone_id
+        self.active_tones = still_active
 
-                # append freq if known
-                if active_tone_id:
-                    self.active_tones[active_tone_id].freq_centers.append(frequency)
+    def finalize(self):
+        """ end of stream; flush the last windows and end remaining tones """
 
-                # this tone is new
-                if active_tone_id is None:
-                    tone = ToneDetection(
-                            frequency=frequency,
-                            amplitude=amplitude,
-                            sample_start=segment_start
-                        )
-                    self.active_tones[round(frequency)] = tone
+        self._analyze(np.zeros(self.window_length // 2, dtype=np.float32))
 
+        for tone in self.active_tones:
+            tone.sample_end = tone.sample_soft_end
+            if tone.sample_end is None:
+                tone.sample_end = self.samples_processed
+            self._register_detection(tone)
 
-                # print(f"peak {frequency} @ {dbfs(amplitude):.1f} dBFS")
+        self.active_tones = []
 
-                # # match whether tone is active
-                # matched_tone: Union[int, None] = None
-                # for active_tone in range(self.active_tones):
-                #     pass
 
-                # if matched_tone is None:
-                #     tone = ToneDetection(frequency, amplitude, segment_start)
-                #     self.active_tones.append()
+# a pure tone reads ~1.0; voice and noise spread their energy
+DEFAULT_TONE_MIN_PURITY: float = 0.6
 
-                # else:
-                #     # Update existing tone
-                #     ongoing_tones[frequency].amplitude = amplitude  # Update amplitude
+# hops a tone may drop out for (fading, glitches) before it ends
+DEFAULT_TONE_MAX_GAP_HOPS: int = 1
 
-            # establish if any tones have ended
-            tones_ended = []
-            for tone_id, active_tone in self.active_tones.items():
 
-                active: bool = False  # assume tone ended until proven otherwise
+class StreamingToneDetector:
+    """
+    Tone detection for live streams.
+
+    Frames are fed as they arrive to a GoertzelBank tuned to the Quick Call
+    II frequencies (or `freqs`). A hop counts towards a tone when its
+    strongest frequency is above `tone_min_dbfs` and carries most of the
+    window's energy (purity); consecutive hops on the same frequency make
+    up a ToneDetection. Sample positions are absolute within the stream
+    and accurate to about half a hop.
+    """
 
-                for peak in peaks:
-                    frequency = f[peak]
+    fs: float
+    bank: GoertzelBank
 
-                    if abs(frequency - active_tone.frequency) < tone_tol:
-                        active = True
+    tone_min_dbfs: float
+    tone_min_amplitude: float
+    tone_min_samples: int
+    tone_min_purity: float
+    tone_max_gap_hops: int
+
+    tones: list[ToneDetection]
+
+    _active: Optional[ToneDetection]
+    _active_index: Optional[int]
+    _active_last: int
+    _missed: int
+
+    def __init__(self, sampling_rate: int, tone_min_dbfs: float,
+                 tone_min_length: float,
+                 freqs: Optional[Iterable[float]] = None,
+                 tone_min_purity: float = DEFAULT_TONE_MIN_PURITY,
+                 tone_max_gap_hops: int = DEFAULT_TONE_MAX_GAP_HOPS,
+                 **kwargs: dict):
+
+        self.fs = sampling_rate
+
+        self.tone_min_dbfs = tone_min_dbfs
+        self.tone_min_amplitude = linear(tone_min_dbfs)
+        self.tone_min_samples = int(sampling_rate * tone_min_length)
+        self.tone_min_purity = tone_min_purity
+        self.tone_max_gap_hops = tone_max_gap_hops
+
+        if freqs is None:
+            freqs = sorted({code.freq for code in two_tone_codes})
+        self.bank = GoertzelBank(freqs, sampling_rate, **kwargs)
+
+        self.tones = []
+        self.reset()
 
-                # Mark a tone for ended but filtered
-                if not active:
+    @property
+    def samples_processed(self) -> int:
+        return self.bank.samples_processed
 
-                    if active_tone.sample_soft_end is None:
-                        active_tone.sample_soft_end = segment_start
+    def process_block(self, samples: NDArray[np.float32]) -> list[ToneDetection]:
+        """ feed the next samples; returns the tones that ended """
 
-                    elif (segment_start - active_tone.sample_soft_end) > self.tone_end_tolerance:
-                        active_tone.sample_end = active_tone.sample_soft_end
-                        self._register_detection(active_tone)
-                        tones_ended.append(tone_id)
+        ends, amplitudes, rms = self.bank.process(samples)
+        if ends.size == 0:
+            return []
 
-            for tone_id in tones_ended:
-                del self.active_tones[tone_id]
+        best = np.argmax(amplitudes, axis=1)
+        best_amplitude = amplitudes[np.arange(best.size), best]
+        purity = best_amplitude / np.maximum(rms * np.sqrt(2), 1e-12)
+        present = (best_amplitude >= self.tone_min_amplitude) & \
+                  (purity >= self.tone_min_purity)
 
+        # hop position at the centre of its window
+        centres = ends - self.bank.window_length // 2
 
-                # if active_tone.frequency not in f[peaks]:
-                #
-                #     self.tones.append(active_tone)
-                # del active_tone
+        ended = []
+        for centre, index, amplitude, is_present in zip(
+                centres.tolist(), best.tolist(), best_amplitude.tolist(),
+                present.tolist()):
 
-        #     # Remove ended tones from ongoing tracking
-        #     for freq in ended_tones:
-        #         del ongoing_tones[freq]
+            if is_present and self._active is not None and index == self._active_index:
+                self._active_last = centre
+                self._active.amplitude = max(self._active.amplitude, amplitude)
+                self._missed = 0
+                continue
 
-        # # Add any remaining ongoing tones as they did not end within the signal
-        # for tone in ongoing_tones.values():
-        #     tone.stop_sample = len(samples)
-        #     self.tones.append(tone)
+            if is_present:
+                self._end_active(ended)
+                self._active = ToneDetection(
+                    frequency=float(self.bank.freqs[index]),
+                    amplitude=amplitude,
+                    sample_start=centre - self.bank.hop_length // 2
+                )
+                self._active_index = index
+                self._active_last = centre
+                self._missed = 0
+                continue
 
+            if self._active is not None:
+                self._missed += 1
+                if self._missed > self.tone_max_gap_hops:
+                    self._end_active(ended)
 
-        # Perform Fourier Transform
-        freq_amplitudes = np.abs(rfft(samples))
-        freqs = rfftfreq(samples.size, 1 / self.fs)
+        return ended
 
-        # Find peaks above the noise threshold
-        # peaks = np.where(freq_amplitudes > self.noise_threshold)[0]
+    def finalize(self) -> list[ToneDetection]:
+        """ end of stream; close a tone still in progress """
+        ended = []
+        self._end_active(ended)
+        return ended
 
-        # Find peaks
-        peaks, _ = find_peaks(freq_amplitudes, height=self.tone_min_amplitude)
+    def reset(self):
+        self.bank.reset()
+        self._active = None
+        self._active_index = None
+        self._active_last = 0
+        self._missed = 0
 
-        # Filter peaks based on bandwidth (if needed)
-        # Example: peaks = [p for p in peaks if lower_bound <= freqs[p] <= upper_bound]
+    def _end_active(self, ended: list[ToneDetection]):
+        tone = self._active
+        if tone is None:
+            return
 
-        # Extract frequency and amplitude of peaks
-        peak_freqs = freqs[peaks]
-        peak_amps = freq_amplitudes[peaks]
+        self._active = None
+        self._active_index = None
 
+        tone.sample_end = self._active_last + self.bank.hop_length // 2
+        tone.duration = (tone.sample_end - tone.sample_start) / self.fs
+        if tone.sample_end - tone.sample_start >= self.tone_min_samples:
+            self.tones.append(tone)
+            ended.append(tone)
 
 
-        # current_tones = set()
-        # for peak in peaks:
-        #     frequency = freqs[peak]
-        #     current_tones.add(frequency)
+# paging tones are sent well above voice level
+DEFAULT_PAGING_MIN_DBFS: float = -30.
 
-        #     if frequency not in self.active_tones:
-        #         self.active_tones[frequency] = self.samples_processed - len(samples)
+# B follows A directly; allow for a hop of disagreement at the boundary
+PAGING_MAX_TONE_GAP_SECS: float = 0.25
 
-        # # End tones that are no longer present
-        # for tone, start_sample in list(self.active_tones.items()):
-        #     if tone not in current_tones:
-        #         tone_duration_samples = self.samples_processed - start_sample
-        #         tone_duration_seconds = tone_duration_samples / self.fs
-        #         print(f"Tone: {tone:.2f} Hz, Duration: {tone_duration_seconds:.2f} seconds")
-        #         del self.active_tones[tone]
 
-        # record our work
-        self.samples_processed += len(samples)
+@dataclass
+class TwoTonePage:
+    sequence: TwoToneSequence
+    tone_a: ToneDetection
+    tone_b: ToneDetection
 
+    # wall-clock time of tone A, when the stream start time is known
+    start_time: Optional[datetime] = None
+    channel_id: Optional[str] = None
 
-    def finalize(self):
-        pass
-        # End any remaining active tones
-        # for tone, start_sample in self.active_tones.items():
-        #     tone_duration_samples = self.samples_processed - start_sample
-        #     tone_duration_seconds = tone_duration_samples / self.fs
-        #     print(f"Tone: {tone:.2f} Hz, Duration: {tone_duration_seconds:.2f} seconds")
-
-        # self.active_tones.clear()
+    @property
+    def sample_start(self) -> int:
+        return self.tone_a.sample_start
+
+    @property
+    def sample_end(self) -> int:
+        return self.tone_b.sample_end
+
+
+class TwoTonePagingDetector:
+    """
+    Decode Quick Call II two-tone sequential pages from a live stream: an
+    A tone (~1 sec) directly followed by a B tone (~3 sec) of the same
+    Reed group. A page is reported as soon as its B tone ends.
+    """
+
+    fs: float
+    detector: StreamingToneDetector
+
+    # wall-clock time of sample 0 of the stream
+    stream_start: Optional[datetime]
+
+    _previous: Optional[ToneDetection]
+
+    def __init__(self, sampling_rate: int,
+                 tone_min_dbfs: float = DEFAULT_PAGING_MIN_DBFS,
+                 **kwargs: dict):
+
+        self.fs = sampling_rate
+        self.detector = StreamingToneDetector(
+            sampling_rate, tone_min_dbfs, TWOTONE_TONE_1_MIN, **kwargs)
+        self.stream_start = None
+        self._previous = None
+
+    def process_block(self, samples: NDArray[np.float32]) -> list[TwoTonePage]:
+        return self._match(self.detector.process_block(samples))
+
+    def finalize(self) -> list[TwoTonePage]:
+        """ end of transmission; tone-only pages end with the carrier """
+        pages = self._match(self.detector.finalize())
+        self._previous = None
+        return pages
+
+    def reset(self, stream_start: Optional[datetime] = None):
+        """ start of a new stream; positions count from its first sample """
+        self.detector.reset()
+        self.detector.tones.clear()
+        self.stream_start = stream_start
+        self._previous = None
+
+    def _match(self, tones: list[ToneDetection]) -> list[TwoTonePage]:
+
+        pages = []
+        for tone in tones:
+            tone_a = self._previous
+            self._previous = tone
+
+            if tone_a is None:
+                continue
+            if not TWOTONE_TONE_1_MIN <= tone_a.duration <= TWOTONE_TONE_1_MAX:
+                continue
+            if not TWOTONE_TONE_2_MIN <= tone.duration <= TWOTONE_TONE_2_MAX:
+                continue
+            if (tone.sample_start - tone_a.sample_end) / self.fs > PAGING_MAX_TONE_GAP_SECS:
+                continue
+
+            try:
+                sequence = code_from_freqs(tone_a.frequency, tone.frequency)
+            except ValueError as e:
+                logger.debug(f"no two-tone code for {tone_a.frequency}/{tone.frequency}: {e}")
+                continue
+
+            page = TwoTonePage(sequence, tone_a, tone)
+            if self.stream_start is not None:
+                page.start_time = self.stream_start + \
+                    timedelta(seconds=tone_a.sample_start / self.fs)
+            pages.append(page)
+            self._previous = None
+
+        # tones are only kept until the next one is seen
+        self.detector.tones.clear()
+        return pages
 
 
 # sample_rate = 44100  # Standard sample rate
@@ -0,0 +1 @@
+from .reanalysis import reanalyze, analyze_capture, CaptureAnalysis, ShardWriter
@@ -0,0 +1,41 @@
+from .reanalysis import (
+    reanalyze,
+    DEFAULT_SHARD_SIZE,
+    DEFAULT_TONE_MIN_DBFS,
+    DEFAULT_TONE_MIN_LENGTH
+)
+
+import argparse
+import logging
+import sys
+import os
+
+
+if __name__ == "__main__":
+
+    logging.basicConfig()
+    logging.getLogger().setLevel(logging.INFO)
+
+    parser = argparse.ArgumentParser(
+        description="re-analyze archived captures (levels, tones, two-tone "
+                    "pages) in parallel into columnar .npz shards; re-running "
+                    "resumes an interrupted run")
+    parser.add_argument('root', help='capture folder, eg. data_path/<channel>')
+    parser.add_argument('out', help='output folder for the shards')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='worker processes (default: all cpus)')
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE)
+    parser.add_argument('--tone-min-dbfs', type=float, default=DEFAULT_TONE_MIN_DBFS)
+    parser.add_argument('--tone-min-length', type=float, default=DEFAULT_TONE_MIN_LENGTH)
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.root):
+        print(f"'{args.root}' is not a folder!", file=sys.stderr)
+        sys.exit(1)
+
+    writer = reanalyze(args.root, args.out, workers=args.workers,
+                       shard_size=args.shard_size,
+                       tone_min_dbfs=args.tone_min_dbfs,
+                       tone_min_length=args.tone_min_length)
+
+    print(f"analyzed {writer.files_written:,} files into {writer.shards_written} shards")
@@ -0,0 +1,313 @@
+"""
+Batch re-analysis of archived captures.
+
+Files are discovered lazily under a root folder and fanned out across a
+process pool, a bounded number at a time. Wav files are read memory-mapped;
+FLAC/Opus archives through soundfile. Each worker returns the level
+summary (analyze_samples) and the tones found by ToneDetector.
+
+Results are written as compressed, columnar .npz shards of `shard_size`
+files each (files, tones and decoded two-tone pages as parallel arrays).
+Shards are written atomically, and a re-run skips every file already in a
+shard, so an interrupted run resumes where it stopped. Files are matched
+by their path without the extension, so a capture re-archived in another
+format (eg. wav -> flac) is not analyzed again; only an 8-byte key per
+analyzed file is held in memory.
+"""
+from app.dsp.analysis import analyze_samples
+from app.radio.tones import ToneDetector
+from app.radio.tone_coding.two_tone_sequential import (
+    codes_from_freqs,
+    TWOTONE_TONE_1_MIN,
+    TWOTONE_TONE_1_MAX,
+    TWOTONE_TONE_2_MIN,
+    TWOTONE_TONE_2_MAX
+)
+
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
+from multiprocessing import get_context
+from typing import Iterable, Iterator, Optional
+import hashlib
+import logging
+import os
+import re
+
+import numpy as np
+import scipy.io.wavfile
+
+
+logger = logging.getLogger(__name__)
+
+
+CAPTURE_EXTENSIONS: tuple[str, ...] = (".wav", ".flac", ".opus")
+
+DEFAULT_SHARD_SIZE: int = 1000
+DEFAULT_TONE_MIN_DBFS: float = -25.
+DEFAULT_TONE_MIN_LENGTH: float = 0.1
+
+# STFT of the ToneDetector; tone durations are measured in whole hops
+TONE_WINDOW_LENGTH: int = 4096
+TONE_HOP_LENGTH: int = TONE_WINDOW_LENGTH // 2
+
+# files queued per worker; keeps memory flat for any archive size
+PENDING_PER_WORKER: int = 4
+
+SHARD_PATTERN = re.compile(r"shard_(\d+)\.npz$")
+
+
+@dataclass
+class CaptureAnalysis:
+    path: str
+    fs: int = 0
+    num_samples: int = 0
+
+    rms: float = np.nan
+    rms_thresholded: float = np.nan
+    peak: float = np.nan
+    dc_bias: float = np.nan
+
+    # (frequency, sample_start, sample_end, amplitude)
+    tones: list[tuple[float, int, int, float]] = field(default_factory=list)
+
+    error: Optional[str] = None
+
+
+def find_captures(root: str) -> Iterator[str]:
+    """ capture paths relative to `root`, in a stable order """
+    for dir_path, dir_names, file_names in os.walk(root):
+        dir_names.sort()
+        for file_name in sorted(file_names):
+            if file_name.endswith(CAPTURE_EXTENSIONS):
+                yield os.path.relpath(os.path.join(dir_path, file_name), root)
+
+
+def read_capture(path: str) -> tuple[int, np.ndarray]:
+    if path.endswith(".wav"):
+        fs, samples = scipy.io.wavfile.read(path, mmap=True)
+    else:
+        import soundfile
+        samples, fs = soundfile.read(path, dtype='int16')
+
+    if samples.ndim > 1:
+        samples = samples[:, 0]
+    return fs, samples
+
+
+def analyze_capture(root: str, path: str, tone_min_dbfs: float,
+                    tone_min_length: float) -> CaptureAnalysis:
+    """ runs in a worker process """
+
+    result = CaptureAnalysis(path)
+    try:
+        fs, samples = read_capture(os.path.join(root, path))
+        result.fs = fs
+        result.num_samples = samples.size
+        if samples.size == 0:
+            return result
+
+        summary = analyze_samples(samples, fs)
+        result.rms = summary.rms
+        result.rms_thresholded = summary.rms_thresholded
+        result.peak = summary.amplitude_peak
+        result.dc_bias = float(summary.dc_bias)
+
+        detector = ToneDetector(fs, tone_min_dbfs, tone_min_length,
+                                window_length=TONE_WINDOW_LENGTH)
+        detector.process_block(samples)
+        detector.finalize()
+        result.tones = [(tone.frequency, tone.sample_start, tone.sample_end,
+                         tone.amplitude) for tone in detector.tones]
+
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+
+    return result
+
+
+def capture_key(path: str) -> np.uint64:
+    """ resumption key of a capture: a 64-bit hash of its path without the extension """
+    digest = hashlib.blake2b(os.path.splitext(path)[0].encode(), digest_size=8).digest()
+    return np.uint64(int.from_bytes(digest, 'little'))
+
+
+def capture_keys(paths: Iterable[str]) -> np.ndarray:
+    return np.array([capture_key(path) for path in paths], dtype=np.uint64)
+
+
+class CompletedCaptures:
+    """ captures already recorded in the shards of a folder, as sorted keys """
+
+    keys: np.ndarray
+
+    def __init__(self, out_dir: str):
+        keys = []
+        for file_name in os.listdir(out_dir):
+            if SHARD_PATTERN.match(file_name):
+                # one column of one shard at a time
+                with np.load(os.path.join(out_dir, file_name)) as shard:
+                    if 'key' in shard.files:
+                        keys.append(shard['key'])
+                    else:
+                        # shards written before the key column
+                        keys.append(capture_keys(shard['path'].tolist()))
+
+        self.keys = np.unique(np.concatenate(keys)) if keys else np.zeros(0, dtype=np.uint64)
+
+    def __len__(self) -> int:
+        return self.keys.size
+
+    def __contains__(self, path: str) -> bool:
+        key = capture_key(path)
+        index = np.searchsorted(self.keys, key)
+        return index < self.keys.size and self.keys[index] == key
+
+
+class ShardWriter:
+
+    out_dir: str
+    shard_size: int
+    shard_index: int
+
+    results: list[CaptureAnalysis]
+
+    # statistics
+    files_written: int
+    shards_written: int
+
+    def __init__(self, out_dir: str, shard_size: int = DEFAULT_SHARD_SIZE):
+
+        self.out_dir = out_dir
+        self.shard_size = shard_size
+        self.results = []
+
+        indexes = [int(match.group(1)) for match in
+                   map(SHARD_PATTERN.match, os.listdir(out_dir)) if match]
+        self.shard_index = max(indexes, default=-1) + 1
+
+        self.files_written = 0
+        self.shards_written = 0
+
+    def add(self, result: CaptureAnalysis):
+        self.results.append(result)
+        if len(self.results) >= self.shard_size:
+            self.flush()
+
+    def flush(self):
+        if not self.results:
+            return
+
+        columns = self._columns(self.results)
+        shard_path = os.path.join(self.out_dir, f"shard_{self.shard_index:05d}.npz")
+        partial_path = shard_path + ".part"
+        with open(partial_path, "wb") as f:
+            np.savez_compressed(f, **columns)
+        os.replace(partial_path, shard_path)
+
+        logger.info(f"wrote {os.path.basename(shard_path)} ({len(self.results):,} files)")
+
+        self.files_written += len(self.results)
+        self.shards_written += 1
+        self.shard_index += 1
+        self.results = []
+
+    def _columns(self, results: list[CaptureAnalysis]) -> dict[str, np.ndarray]:
+
+        columns = {
+            'path': np.array([r.path for r in results], dtype=str),
+            'key': capture_keys(r.path for r in results),
+            'fs': np.array([r.fs for r in results], dtype=np.int32),
+            'num_samples': np.array([r.num_samples for r in results], dtype=np.int64),
+            'rms': np.array([r.rms for r in results], dtype=np.float32),
+            'rms_thresholded': np.array([r.rms_thresholded for r in results], dtype=np.float32),
+            'peak': np.array([r.peak for r in results], dtype=np.float32),
+            'dc_bias': np.array([r.dc_bias for r in results], dtype=np.float32),
+            'error': np.array([r.error or "" for r in results], dtype=str),
+        }
+
+        # tones, flattened; tone_file indexes the file columns
+        counts = [len(r.tones) for r in results]
+        tones = np.array([tone for r in results for tone in r.tones],
+                         dtype=np.float64).reshape(-1, 4)
+        tone_file = np.repeat(np.arange(len(results), dtype=np.int32), counts)
+        columns['tone_file'] = tone_file
+        columns['tone_freq'] = tones[:, 0].astype(np.float32)
+        columns['tone_start'] = tones[:, 1].astype(np.int64)
+        columns['tone_end'] = tones[:, 2].astype(np.int64)
+        columns['tone_amplitude'] = tones[:, 3].astype(np.float32)
+
+        columns.update(self._pages(columns, columns['fs']))
+        return columns
+
+    def _pages(self, columns: dict[str, np.ndarray],
+               fs: np.ndarray) -> dict[str, np.ndarray]:
+        """ two-tone pages: consecutive A/B tones of a file, decoded in one batch """
+
+        tone_file = columns['tone_file']
+        start = columns['tone_start']
+        end = columns['tone_end']
+
+        rate = fs[tone_file].astype(np.float64)
+        duration = np.divide(end - start, rate, out=np.zeros(rate.size), where=rate > 0)
+
+        # durations are rounded to the hop grid; a nominal 1 s tone measures
+        # up to a hop longer (or shorter) depending on where it falls
+        hop = np.divide(TONE_HOP_LENGTH, rate, out=np.zeros(rate.size), where=rate > 0)
+
+        a = np.arange(tone_file.size - 1)
+        b = a + 1
+        pairs = (tone_file[a] == tone_file[b]) & \
+                (duration[a] >= TWOTONE_TONE_1_MIN - hop[a]) & \
+                (duration[a] <= TWOTONE_TONE_1_MAX + hop[a]) & \
+                (duration[b] >= TWOTONE_TONE_2_MIN - hop[b]) & \
+                (duration[b] <= TWOTONE_TONE_2_MAX + hop[b])
+        a, b = a[pairs], b[pairs]
+
+        matches = codes_from_freqs(columns['tone_freq'][a], columns['tone_freq'][b])
+        valid = matches.valid
+        return {
+            'page_file': tone_file[a][valid],
+            'page_start': start[a][valid],
+            'page_group': matches.group[valid].astype(np.int16),
+            'page_id': matches.id[valid].astype(np.int16),
+            'page_tone_1_diff': matches.tone_1_diff[valid].astype(np.float32),
+            'page_tone_2_diff': matches.tone_2_diff[valid].astype(np.float32)
+        }
+
+
+def reanalyze(root: str, out_dir: str, workers: Optional[int] = None,
+              shard_size: int = DEFAULT_SHARD_SIZE,
+              tone_min_dbfs: float = DEFAULT_TONE_MIN_DBFS,
+              tone_min_length: float = DEFAULT_TONE_MIN_LENGTH) -> ShardWriter:
+
+    os.makedirs(out_dir, exist_ok=True)
+
+    done = CompletedCaptures(out_dir)
+    if done:
+        logger.info(f"resuming; {len(done):,} files already analyzed")
+
+    writer = ShardWriter(out_dir, shard_size)
+    workers = workers or os.cpu_count() or 1
+
+    # spawn; forking a process that runs threads can deadlock the workers
+    with ProcessPoolExecutor(max_workers=workers,
+                             mp_context=get_context("spawn")) as executor:
+        pending = set()
+
+        for path in find_captures(root):
+            if path in done:
+                continue
+
+            pending.add(executor.submit(analyze_capture, root, path,
+                                        tone_min_dbfs, tone_min_length))
+
+            if len(pending) >= workers * PENDING_PER_WORKER:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    writer.add(future.result())
+
+        for future in wait(pending).done:
+            writer.add(future.result())
+
+    writer.flush()
+    return writer
@@ -0,0 +1,2 @@
+from .replay import Replay, ReplayStats, capture_events, dump_events, replay_config
+from .dump import DatagramDumpWriter, read_dump, record
@@ -0,0 +1,86 @@
+from .replay import Replay, capture_events, dump_events, replay_config
+from .dump import record
+from app.channel_manager import RadioChannelManager
+from app.config import ConfigManager
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+
+async def replay(args):
+    config = replay_config(args.config, args.out)
+    runner = Replay(config, events_path=os.path.join(args.out, "events.jsonl"))
+
+    if args.command == "captures":
+        events = capture_events(args.source)
+    else:
+        events = dump_events(args.source, runner.ports)
+
+    started = time.perf_counter()
+    stats = await runner.run(events)
+    elapsed = time.perf_counter() - started
+
+    print(f"replayed {stats.datagrams:,} datagrams ({stats.span_secs / 3600:.2f} h) "
+          f"in {elapsed:.1f} secs: {stats.sessions} sessions, {stats.pages} pages"
+          + (f", {stats.skipped:,} datagrams of unknown channels skipped"
+             if stats.skipped else ""))
+
+
+async def record_dump(args):
+    config_manager = ConfigManager()
+    config_manager.add_yaml(args.config)
+    config = config_manager.process_config()
+
+    # the ports the node would listen on
+    manager = RadioChannelManager(config)
+    manager.configure_channels()
+    ports = sorted(channel.listen_port for channel in manager.channels)
+
+    count = await record(args.dump, config.listen_address, ports, args.duration)
+    print(f"recorded {count:,} datagrams")
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="replay recorded traffic through the channel pipeline on "
+                    "virtual time; output is deterministic")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for name, help in (("captures", "replay the captures below a folder"),
+                       ("dump", "replay a datagram dump")):
+        command = commands.add_parser(name, help=help)
+        command.add_argument('config', help='node config file (channels, filters, ...)')
+        command.add_argument('source', help='capture folder or dump file')
+        command.add_argument('out', help='output folder (must be new or empty)')
+
+    command = commands.add_parser("record", help="record a datagram dump "
+                                  "on the channel ports, in place of the node")
+    command.add_argument('config', help='node config file')
+    command.add_argument('dump', help='dump file to write')
+    command.add_argument('-d', '--duration', type=float, default=None,
+                         help='seconds to record (default: until interrupted)')
+
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig()
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    if args.command == "record":
+        try:
+            asyncio.run(record_dump(args))
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+
+    if os.path.exists(args.out) and os.listdir(args.out):
+        print(f"'{args.out}' is not empty!", file=sys.stderr)
+        sys.exit(1)
+    os.makedirs(args.out, exist_ok=True)
+
+    asyncio.run(replay(args))
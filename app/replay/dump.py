@@ -0,0 +1,101 @@
+"""
+Datagram dumps: raw RTLSDR-Airband datagrams as they arrived, for replay.
+
+An 8-byte magic followed by little-endian records of
+    float64 arrival (POSIX time), uint16 destination port, uint32 length
+and the payload. `record()` captures one by listening on the channel ports
+in place of the node.
+"""
+from typing import BinaryIO, Iterator, Optional
+import asyncio
+import logging
+import struct
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+MAGIC: bytes = b"RCDGRAM1"
+RECORD_HEADER = struct.Struct("<dHI")
+
+
+class DatagramDumpWriter:
+
+    path: str
+    datagrams: int
+
+    _file: BinaryIO
+
+    def __init__(self, path: str):
+        self.path = path
+        self.datagrams = 0
+        self._file = open(path, "wb")
+        self._file.write(MAGIC)
+
+    def write(self, arrival: float, port: int, data: bytes):
+        self._file.write(RECORD_HEADER.pack(arrival, port, len(data)))
+        self._file.write(data)
+        self.datagrams += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_dump(path: str) -> Iterator[tuple[float, int, bytes]]:
+    """ (arrival, port, datagram) in recorded order """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"'{path}' is not a datagram dump")
+
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            arrival, port, length = RECORD_HEADER.unpack(header)
+            data = f.read(length)
+            if len(data) < length:
+                logger.warning(f"truncated record at the end of {path}")
+                return
+            yield arrival, port, data
+
+
+class _DumpProtocol(asyncio.DatagramProtocol):
+
+    def __init__(self, writer: DatagramDumpWriter, port: int):
+        self.writer = writer
+        self.port = port
+
+    def datagram_received(self, data, addr):
+        self.writer.write(time.time(), self.port, data)
+
+
+async def record(path: str, host: str, ports: list[int],
+                 duration: Optional[float] = None) -> int:
+    """ dump datagrams arriving on `ports`; returns the number recorded """
+    loop = asyncio.get_running_loop()
+    transports = []
+    with DatagramDumpWriter(path) as writer:
+        try:
+            for port in ports:
+                transport, _ = await loop.create_datagram_endpoint(
+                    lambda port=port: _DumpProtocol(writer, port),
+                    local_addr=(host, port))
+                transports.append(transport)
+
+            logger.info(f"recording udp/{ports[0]}-{ports[-1]} to {path}")
+            if duration is None:
+                await asyncio.Future()
+            else:
+                await asyncio.sleep(duration)
+        finally:
+            for transport in transports:
+                transport.close()
+
+    return writer.datagrams
@@ -0,0 +1,301 @@
+"""
+Faster-than-real-time replay through the full channel pipeline.
+
+Recorded captures, or datagram dumps, are fed straight into each
+channel's `_on_data` as RTLSDR-Airband datagrams, with a VirtualClock
+set to the time each datagram was (or would have been) received. End of
+PTT is detected by sweeping the PttTimeoutMonitor at its usual interval
+of replay time, and idle stretches are skipped, so hours of traffic run
+as fast as the DSP allows.
+
+Every stage runs inline (no DSP, I/O or archive workers, no Mumble), and
+catalog paths are relative to the output folder, so capture files, the
+catalog and the events file (closed sessions and decoded
+pages, one JSON object per line) are the same on every run and can be
+diffed between versions.
+"""
+from .dump import read_dump
+from app.channel_manager import RadioChannelManager
+from app.channel_processor import RadioChannelProcessor
+from app.common.clock import VirtualClock
+from app.config import ConfigManager, AppConfig
+from app.radio.schema import RadioChannelSession
+from app.radio.tones import TwoTonePage
+from app.reanalysis.reanalysis import find_captures, read_capture
+from app.rtlsdr_airband.literals import UDP_DATAGRAM_SAMPLES
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, Iterator, Optional, TextIO
+import asyncio
+import heapq
+import json
+import logging
+import os
+import re
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+SAMPLE_RATE: int = 16000
+FRAME_SECS: float = UDP_DATAGRAM_SAMPLES / SAMPLE_RATE
+
+# {channel.id}_{YYYYMMDDTHHMMSS}[_{segment:03d}].{ext}
+CAPTURE_NAME = re.compile(
+    r"^(?P<channel>.+)_(?P<time>\d{8}T\d{6})(?:_(?P<segment>\d{3}))?\.\w+$")
+
+# datagrams between event loop yields (catalog and archive callbacks)
+YIELD_INTERVAL: int = 256
+
+# (arrival POSIX time, channel id, datagram)
+ReplayEvent = tuple[float, str, bytes]
+
+
+@dataclass
+class ReplayStats:
+    datagrams: int = 0
+    skipped: int = 0
+    sessions: int = 0
+    pages: int = 0
+    first: Optional[float] = None
+    last: Optional[float] = None
+
+    @property
+    def span_secs(self) -> float:
+        if self.first is None:
+            return 0.
+        return self.last - self.first
+
+
+class _Capture:
+
+    channel_id: str
+    start: float
+    paths: list[str]
+
+    def __init__(self, channel_id: str, start: float):
+        self.channel_id = channel_id
+        self.start = start
+        self.paths = []
+
+    def events(self) -> Iterator[ReplayEvent]:
+        """ the capture as datagrams at real-time spacing; segments follow on """
+        arrival = self.start
+        for path in self.paths:
+            fs, samples = read_capture(path)
+            if fs != SAMPLE_RATE:
+                logger.warning(f"skipping {path}: {fs} Hz")
+                continue
+
+            if np.issubdtype(samples.dtype, np.integer):
+                samples = samples.astype(np.float32) / 32768.
+
+            for start in range(0, samples.size, UDP_DATAGRAM_SAMPLES):
+                # rtl_airband datagrams are always full; the tail is zero padded
+                block = np.zeros(UDP_DATAGRAM_SAMPLES, dtype='<f4')
+                chunk = samples[start:start + UDP_DATAGRAM_SAMPLES]
+                block[:chunk.size] = chunk
+                yield arrival, self.channel_id, block.tobytes()
+                arrival += FRAME_SECS
+
+
+def capture_events(root: str) -> Iterator[ReplayEvent]:
+    """
+    captures below `root` as datagrams in arrival order; a capture is only
+    read once replay reaches its start time
+    """
+    captures: dict[tuple[str, str], _Capture] = {}
+    for path in find_captures(root):
+        match = CAPTURE_NAME.match(os.path.basename(path))
+        if match is None:
+            logger.warning(f"skipping {path}: not a capture name")
+            continue
+
+        key = (match['channel'], match['time'])
+        if key not in captures:
+            start = datetime.strptime(match['time'], '%Y%m%dT%H%M%S').timestamp()
+            captures[key] = _Capture(match['channel'], start)
+        captures[key].paths.append(os.path.join(root, path))
+
+    # segment files sort after the first file of their session
+    ordered = sorted(captures.values(), key=lambda c: (c.start, c.channel_id))
+    for capture in ordered:
+        capture.paths.sort()
+
+    heap = []
+    admitted = 0
+    while heap or admitted < len(ordered):
+        while admitted < len(ordered) and \
+                (not heap or ordered[admitted].start <= heap[0][0]):
+            events = ordered[admitted].events()
+            first = next(events, None)
+            if first is not None:
+                heapq.heappush(heap, (first[0], admitted, first, events))
+            admitted += 1
+
+        if not heap:
+            continue
+        _, index, event, events = heapq.heappop(heap)
+        yield event
+        following = next(events, None)
+        if following is not None:
+            heapq.heappush(heap, (following[0], index, following, events))
+
+
+def dump_events(path: str, ports: dict[int, str]) -> Iterator[ReplayEvent]:
+    """ a datagram dump; `ports` maps udp port -> channel id """
+    for arrival, port, data in read_dump(path):
+        yield arrival, ports.get(port, f"udp/{port}"), data
+
+
+def replay_config(config_file: str, out_dir: str) -> AppConfig:
+    """ the node's config, made inline and deterministic, writing to `out_dir` """
+    config_manager = ConfigManager()
+    config_manager.add_yaml(config_file)
+    config_manager.config_dict.update({
+        'data_path': out_dir,
+        'cache_path': None,
+        'catalog_path': os.path.join(out_dir, "catalog.sqlite3"),
+        'mumble': None,
+        'dsp_workers': 0,
+        'disk_io_workers': 0,
+        'archive_encoder_workers': 0,
+        'batched_filtering': False,
+        'shared_receiver': False,
+        'metrics_port': 0,
+        'loop_monitor_interval_ms': 0
+    })
+    return config_manager.process_config()
+
+
+class Replay:
+
+    manager: RadioChannelManager
+    clock: VirtualClock
+    channels: dict[str, RadioChannelProcessor]
+    stats: ReplayStats
+
+    _events_file: Optional[TextIO]
+    _next_sweep: Optional[float]
+
+    def __init__(self, config: AppConfig, events_path: Optional[str] = None):
+        self.clock = VirtualClock()
+        self.manager = RadioChannelManager(config, clock=self.clock)
+        self.manager.configure_channels()
+        self.stats = ReplayStats()
+
+        self.channels = {}
+        for channel in self.manager.channels:
+            channel.attach_ptt(self.manager.ptt_monitor)
+            channel.add_session_listener(
+                lambda session, channel=channel: self._on_session(channel, session))
+            channel.add_tone_listener(self._on_page)
+            self.channels[channel.id] = channel
+
+        self._events_file = open(events_path, "w") if events_path else None
+        self._next_sweep = None
+
+    @property
+    def ports(self) -> dict[int, str]:
+        return {channel.listen_port: channel.id for channel in self.manager.channels}
+
+    async def run(self, events: Iterable[ReplayEvent]) -> ReplayStats:
+        catalog_task = None
+        if self.manager.catalog is not None:
+            catalog_task = asyncio.create_task(self.manager.catalog.run())
+
+        try:
+            for arrival, channel_id, data in events:
+                channel = self.channels.get(channel_id)
+                if channel is None:
+                    self.stats.skipped += 1
+                    continue
+
+                self._advance(arrival)
+                channel._on_data(data, None)
+                channel.ptt.touch(arrival)
+
+                self.stats.datagrams += 1
+                if self.stats.first is None:
+                    self.stats.first = arrival
+                self.stats.last = arrival
+                if self.stats.datagrams % YIELD_INTERVAL == 0:
+                    await asyncio.sleep(0)
+
+            # let the last sessions time out
+            timeout = max((stream.timeout for stream in self.manager.ptt_monitor.streams),
+                          default=0.)
+            self._advance(self.clock.time + timeout + 2 * self.manager.ptt_monitor.sweep_interval)
+
+            await self._drain()
+        finally:
+            if catalog_task is not None:
+                catalog_task.cancel()
+            if self._events_file is not None:
+                self._events_file.close()
+            self.manager.disk_io.shutdown()
+
+        return self.stats
+
+    def _advance(self, time: float):
+        """ move replay time forward, sweeping for ended transmissions """
+        monitor = self.manager.ptt_monitor
+        interval = monitor.sweep_interval
+        if self._next_sweep is None:
+            self._next_sweep = time + interval
+
+        while self._next_sweep <= time:
+            if not any(stream.active for stream in monitor.streams):
+                # nothing can time out before the next datagram
+                self._next_sweep += ((time - self._next_sweep) // interval + 1) * interval
+                break
+            self.clock.set(self._next_sweep)
+            monitor.sweep(self._next_sweep)
+            self._next_sweep += interval
+
+        self.clock.set(time)
+
+    async def _drain(self):
+        """ wait for archival encoding and catalog inserts """
+        archive = self.manager.archive_encoder
+        while archive is not None and archive.pending > 0:
+            await asyncio.sleep(0.05)
+        if archive is not None:
+            archive.shutdown()
+
+        if self.manager.catalog is not None:
+            await self.manager.catalog.join()
+
+    def _on_session(self, channel: RadioChannelProcessor, session: RadioChannelSession):
+        self.stats.sessions += 1
+        summary = session.summary
+        rms = summary.rms if summary is not None else None
+        self._write_event({
+            'event': "session",
+            'channel': channel.id,
+            'session': session.id,
+            'start': session.start_time.isoformat(timespec='milliseconds'),
+            'length': round(summary.length, 4) if summary is not None else None,
+            'rms': round(float(rms), 2) if rms is not None and np.isfinite(rms) else None
+        })
+
+    def _on_page(self, page: TwoTonePage):
+        self.stats.pages += 1
+        sequence = page.sequence
+        self._write_event({
+            'event': "page",
+            'channel': page.channel_id,
+            'group': sequence.group,
+            'id': sequence.id,
+            'tone_a': sequence.tone_1.freq,
+            'tone_b': sequence.tone_2.freq,
+            'start': page.start_time.isoformat(timespec='milliseconds')
+            if page.start_time else None
+        })
+
+    def _write_event(self, event: dict):
+        if self._events_file is not None:
+            self._events_file.write(json.dumps(event) + "\n")
@@ -6,4 +6,7 @@ DEFAULT_SAMPLE_RATE: int = 16000
 # 125 milliseconds per frame
 DEFAULT_STREAM_TIMEOUT_SECS: float = 0.250  # double
 
+UDP_DATAGRAM_BYTES: int = 8000
+UDP_DATAGRAM_SAMPLES: int = UDP_DATAGRAM_BYTES // 4
+
 RTLSDR_MAX_BANDWIDTH = int(2.56e6)
@@ -0,0 +1,172 @@
+from app.channel_processor import RadioChannelProcessor
+from app.common.clock import VirtualClock
+from app.config import RadioChannelConfig
+from app.dsp.schema import DiskWriterConfig
+from app.mumble.channel import MumbleChannel
+from app.rtlsdr_airband.literals import UDP_DATAGRAM_SAMPLES
+
+import asyncio
+import glob
+import os
+import wave
+
+import numpy as np
+
+
+SAMPLE_RATE: int = 16000
+
+# 48 kHz s16 pcm per 125 ms frame (the resampler may vary it slightly)
+OUTPUT_FRAME_BYTES: int = 12000
+
+
+def make_processor(data_path: str, max_pending_bytes: int = 4 * 1024 * 1024,
+                   minimum_length_secs: float = 0., **kwargs) -> RadioChannelProcessor:
+    config = RadioChannelConfig(freq=150., id="test", label="test",
+                                designator="11K0F3E")
+    processor = RadioChannelProcessor(
+        config, "127.0.0.1", 0,
+        disk_writer_config=DiskWriterConfig(minimum_length_secs=minimum_length_secs,
+                                            base_path=data_path),
+        max_pending_bytes=max_pending_bytes, **kwargs)
+    processor.add_disk_writer(None)
+    return processor
+
+
+def carrier(secs: float) -> list[bytes]:
+    """ a steady 1 kHz tone as RTLSDR-Airband datagrams """
+    t = np.arange(int(secs * SAMPLE_RATE)) / SAMPLE_RATE
+    samples = (0.3 * np.sin(2 * np.pi * 1000 * t)).astype('<f4')
+    return [samples[i:i + UDP_DATAGRAM_SAMPLES].tobytes()
+            for i in range(0, samples.size, UDP_DATAGRAM_SAMPLES)]
+
+
+def captured_secs(data_path: str) -> float:
+    total = 0.
+    for path in glob.glob(os.path.join(data_path, "**", "*.wav"), recursive=True):
+        with wave.open(path) as wav:
+            total += wav.getnframes() / wav.getframerate()
+    return total
+
+
+def test_stalled_output_keeps_capture(tmp_path):
+    """ an output that never connects drops its own oldest pcm, not the capture """
+    max_pending_bytes = 40 * OUTPUT_FRAME_BYTES
+    processor = make_processor(str(tmp_path), max_pending_bytes)
+    stalled = MumbleChannel("localhost", 0, "stalled")
+    processor.add_output(stalled)
+
+    datagrams = carrier(60.)
+    for data in datagrams:
+        processor._on_data(data, None)
+    processor._on_done()
+
+    assert captured_secs(str(tmp_path)) == 60.
+    assert stalled.pending_bytes <= max_pending_bytes
+    assert stalled.frames_dropped > 0
+    # queued pcm plus the end of transmission marker
+    assert stalled.frames_dropped + stalled.audio_buffer.qsize() == len(datagrams) + 1
+    assert processor.memory_cap_drops == stalled.frames_dropped
+
+
+def test_slow_output_does_not_hold_back_others(tmp_path):
+    """ outputs sharing a rendition are bounded separately """
+    max_pending_bytes = 40 * OUTPUT_FRAME_BYTES
+    processor = make_processor(str(tmp_path), max_pending_bytes)
+    slow = MumbleChannel("localhost", 0, "slow")
+    live = MumbleChannel("localhost", 0, "live")
+    processor.add_output(slow)
+    processor.add_output(live)
+    assert len(processor.renditions) == 1
+
+    # the live output keeps up; its queue is drained after every frame
+    sent = 0
+    datagrams = carrier(60.)
+    for data in datagrams:
+        processor._on_data(data, None)
+        while not live.audio_buffer.empty():
+            pcm, _ = live.audio_buffer.get_nowait()
+            live.pending_bytes -= len(pcm)
+            sent += 1
+    processor._on_done()
+
+    assert sent == len(datagrams)
+    assert live.frames_dropped == 0
+    assert slow.pending_bytes <= max_pending_bytes
+    assert slow.frames_dropped + slow.audio_buffer.qsize() == len(datagrams) + 1
+    assert captured_secs(str(tmp_path)) == 60.
+
+
+def test_preroll_does_not_count_toward_minimum_length(tmp_path):
+    """ a kerchunk shorter than the minimum is discarded, pre-roll or not """
+    clock = VirtualClock(1_700_000_000.)
+    processor = make_processor(str(tmp_path), minimum_length_secs=0.3,
+                               preroll_ms=1000, clock=clock)
+
+    def transmit(datagrams: list[bytes]):
+        for data in datagrams:
+            clock.set(clock.time + 0.125)
+            processor._on_data(data, None)
+        processor._on_done()
+
+    transmit(carrier(1.))
+    clock.set(clock.time + 0.4)
+    # 125 ms; the capture would be 1 s long with its pre-roll
+    transmit(carrier(0.125))
+
+    assert len(processor.sessions) == 2
+    paths = glob.glob(os.path.join(str(tmp_path), "**", "*.wav"), recursive=True)
+    assert len(paths) == 1
+    assert captured_secs(str(tmp_path)) == 1.
+
+
+def test_failed_lane_jobs_still_open_and_close_sessions(tmp_path):
+    """ a failing pre-roll or levels job falls back; the capture is still written """
+    processor = make_processor(str(tmp_path), preroll_ms=1000)
+
+    def fail(*args):
+        raise RuntimeError("boom")
+
+    processor.preroll.recent = fail
+    processor.levels.summary = fail
+
+    for data in carrier(1.):
+        processor._on_data(data, None)
+    processor._on_done()
+
+    session = processor.sessions[-1]
+    assert session.summary is not None
+    assert session.summary.num_samples == 0
+    assert captured_secs(str(tmp_path)) == 1.
+
+
+class _SoundOutput:
+
+    def __init__(self):
+        self.chunks = []
+
+    def add_sound(self, pcm: bytes):
+        self.chunks.append(pcm)
+
+
+def test_output_ends_transmission_with_session(tmp_path):
+    """ an output stops transmitting once the session's last pcm is sent """
+    processor = make_processor(str(tmp_path))
+    output = MumbleChannel("localhost", 0, "live")
+    processor.add_output(output)
+
+    async def run():
+        output.mumble = type("Mumble", (), {"sound_output": _SoundOutput()})()
+        task = asyncio.create_task(output.stream_audio())
+
+        processor._on_data(carrier(0.125)[0], None)
+        await asyncio.sleep(0.01)
+        assert output.transmitting
+
+        processor._on_done()
+        await asyncio.sleep(0.01)
+        assert not output.transmitting
+        assert output.pending_bytes == 0
+        assert len(output.mumble.sound_output.chunks) == 1
+        task.cancel()
+
+    asyncio.run(run())
@@ -0,0 +1,45 @@
+from app.reanalysis.reanalysis import analyze_capture, ShardWriter, TONE_HOP_LENGTH
+from app.radio.tone_coding.two_tone_sequential import FREQ_TABLE, code_from_freqs
+
+import os
+
+import numpy as np
+import scipy.io.wavfile
+
+
+SAMPLE_RATE: int = 16000
+
+
+def page(offset: int, tone_a: float, tone_b: float) -> np.ndarray:
+    """ a 1 s / 3 s two-tone page `offset` samples into a capture """
+    parts = [np.zeros(SAMPLE_RATE // 2 + offset)]
+    for freq, length in ((tone_a, 1.), (tone_b, 3.)):
+        t = np.arange(int(length * SAMPLE_RATE)) / SAMPLE_RATE
+        parts.append(0.3 * np.sin(2 * np.pi * freq * t))
+    parts.append(np.zeros(SAMPLE_RATE))
+    return (np.concatenate(parts) * 32767).astype(np.int16)
+
+
+def test_pages_decoded_at_any_hop_offset(tmp_path):
+    """ tone durations rounded to the hop grid must not lose pages """
+    tone_a, tone_b = float(FREQ_TABLE[0][2]), float(FREQ_TABLE[0][7])
+    sequence = code_from_freqs(tone_a, tone_b)
+
+    root = tmp_path / "captures"
+    out = tmp_path / "out"
+    root.mkdir()
+    out.mkdir()
+
+    offsets = range(0, TONE_HOP_LENGTH, TONE_HOP_LENGTH // 16)
+    writer = ShardWriter(str(out))
+    for offset in offsets:
+        path = f"page_{offset:04d}.wav"
+        scipy.io.wavfile.write(os.path.join(root, path), SAMPLE_RATE,
+                               page(offset, tone_a, tone_b))
+        writer.add(analyze_capture(str(root), path, -25., 0.1))
+    writer.flush()
+
+    with np.load(os.path.join(out, "shard_00000.npz")) as shard:
+        assert sorted(shard['page_file'].tolist()) == list(range(len(offsets)))
+        assert (shard['page_group'] == sequence.group).all()
+        assert (shard['page_id'] == sequence.id).all()